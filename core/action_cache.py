@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Hashable, Iterable
+
+
+class ActionCache:
+    """
+    TTL-кэш результатов read-only действий.
+    Каждая запись помечена тегами (например "volume"), побочные действия сбрасывают записи по тегу.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple[str, Hashable], tuple[float, Any, tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+        self._tag_versions: dict[str, int] = {}
+
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]:
+        """Снимок версий тегов: put() с устаревшим снимком не кэширует (чтение обогнало запись)."""
+        with self._lock:
+            return tuple(self._tag_versions.get(t, 0) for t in tags)
+
+    def get(self, action: str, key: Hashable) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((action, key))
+            if entry is not None and entry[0] > now:
+                self._hits[action] = self._hits.get(action, 0) + 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[(action, key)]
+            self._misses[action] = self._misses.get(action, 0) + 1
+            return False, None
+
+    def put(
+            self,
+            action: str,
+            key: Hashable,
+            value: Any,
+            ttl: float,
+            tags: Iterable[str] = (),
+            versions: tuple[int, ...] | None = None,
+    ) -> None:
+        if ttl <= 0:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if versions is not None and versions != tuple(self._tag_versions.get(t, 0) for t in tags):
+                return
+            self._entries[(action, key)] = (time.monotonic() + ttl, value, tags)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        tags = set(tags)
+        if not tags:
+            return 0
+        with self._lock:
+            for t in tags:
+                self._tag_versions[t] = self._tag_versions.get(t, 0) + 1
+            stale = [k for k, (_, _, t) in self._entries.items() if tags.intersection(t)]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            out = {}
+            for action in set(self._hits) | set(self._misses):
+                hits = self._hits.get(action, 0)
+                misses = self._misses.get(action, 0)
+                out[action] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+            return out
@@ -1,11 +1,19 @@
-from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
 
+from core.action_cache import ActionCache
+from core.executor import ActionTimeout, default_executor
+from core.planner import plan_turn
 from tools.system import (
     add_remind,
+    add_reminds,
     change_volume,
     get_degrees,
     get_local_weather,
     get_mac_state,
+    get_volume,
     get_weather,
     list_running_apps,
     mac_power,
@@ -20,62 +28,245 @@ from tools.system import (
     set_volume,
     stopwatch, get_events,
 )
+from tools.utilits import POWER_TIMEOUT, SHORTCUT_TIMEOUT
 
-ACTION_MAP = {
-    "open_app": lambda a: open_app(a["name"]),
-    "play_media": lambda a: play_media(),
-    "pause_media": lambda a: pause_media(),
-    "next_media": lambda a: next_media(),
-    "previous_media": lambda a: previous_media(),
-    "set_volume": lambda a: set_volume(a["level"]),
-    "change_volume": lambda a: change_volume(a["delta"]),
-    "mute": lambda a: mute_system(True),
-    "un_mute": lambda a: mute_system(False),
-    "get_date": lambda a: mute_system(False),
-    "get_time": lambda a: mute_system(False),
-    "get_weather": lambda a: get_weather(a["city"], a["when"]),
-    "get_local_weather": lambda a: get_local_weather(a["when"]),
-    "get_degrees": lambda a: get_degrees(a["city"]),
-    "add_remind": lambda a: add_remind(a["title"], a["notes"], a["due_date"]),
-    "set_timer": lambda a: set_timer(a["seconds"]),
-    "stopwatch": lambda a: stopwatch(a["cmd"]),
-    "send_message": lambda a: send_message(a["platform"], a["to"], a["text"]),
-    "get_mac_state": lambda a: get_mac_state(a.get("section", "all")),
-    "list_running_apps": lambda a: list_running_apps(a.get("app_name")),
-    "mac_power": lambda a: mac_power(a["action"]),
-    "get_events": lambda a: get_events(a["day_start"], a["end_date"], a["calendars_allowlist"]),
+DEFAULT_ACTION_TIMEOUT = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def _args_key(args: dict) -> Hashable:
+    return json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    """
+    Описание действия:
+    - action_class: общий лимит параллельности в ActionExecutor (osascript / network / shell / eventkit);
+    - read_only + ttl: результат можно кэшировать на ttl секунд по key(args);
+    - tags: к каким «чтениям» относится закэшированный результат;
+    - invalidates: какие теги сбрасывает побочное действие.
+    """
+    handler: Callable[[dict], Any]
+    action_class: str = "osascript"
+    timeout: float = DEFAULT_ACTION_TIMEOUT
+    read_only: bool = False
+    ttl: float = 0.0
+    key: Callable[[dict], Hashable] = _args_key
+    tags: tuple[str, ...] = ()
+    invalidates: tuple[str, ...] = ()
+
+
+ACTION_REGISTRY: dict[str, ActionSpec] = {
+    "open_app": ActionSpec(lambda a: open_app(a["name"]), invalidates=("apps",)),
+    "play_media": ActionSpec(lambda a: play_media()),
+    "pause_media": ActionSpec(lambda a: pause_media()),
+    "next_media": ActionSpec(lambda a: next_media()),
+    "previous_media": ActionSpec(lambda a: previous_media()),
+    # громкость меняют и аппаратные клавиши в обход set_volume — кэш лишь сглаживает повторы внутри хода
+    "get_volume": ActionSpec(
+        lambda a: get_volume(),
+        read_only=True, ttl=3.0, key=lambda a: None, tags=("volume",),
+    ),
+    "set_volume": ActionSpec(lambda a: set_volume(a["level"]), invalidates=("volume",)),
+    "change_volume": ActionSpec(lambda a: change_volume(a["delta"]), invalidates=("volume",)),
+    "mute": ActionSpec(lambda a: mute_system(True), invalidates=("volume",)),
+    "un_mute": ActionSpec(lambda a: mute_system(False), invalidates=("volume",)),
+    "get_date": ActionSpec(lambda a: mute_system(False)),
+    "get_time": ActionSpec(lambda a: mute_system(False)),
+    "get_weather": ActionSpec(
+        lambda a: get_weather(a["city"], a["when"]),
+        action_class="network", timeout=8.0, read_only=True, ttl=600.0,
+        key=lambda a: (str(a.get("city", "")).strip().lower(), str(a.get("when", ""))),
+        tags=("weather",),
+    ),
+    "get_local_weather": ActionSpec(
+        lambda a: get_local_weather(a["when"]),
+        action_class="network", timeout=12.0, read_only=True, ttl=300.0,
+        key=lambda a: str(a.get("when", "")), tags=("weather",),
+    ),
+    "get_degrees": ActionSpec(
+        lambda a: get_degrees(a["city"]),
+        action_class="network", timeout=8.0, read_only=True, ttl=600.0,
+        key=lambda a: str(a.get("city", "")).strip().lower(), tags=("weather",),
+    ),
+    "add_remind": ActionSpec(lambda a: add_remind(a["title"], a["notes"], a["due_date"]), timeout=8.0),
+    # внутреннее: несколько add_remind за ход, собранные планировщиком
+    "add_reminds": ActionSpec(lambda a: add_reminds(a["items"]), timeout=12.0),
+    # дедлайн действия = бюджет подпроцесса: иначе time_left() урежет shortcuts/pmset до 5 с
+    "set_timer": ActionSpec(lambda a: set_timer(a["seconds"]), action_class="shell", timeout=SHORTCUT_TIMEOUT),
+    "stopwatch": ActionSpec(lambda a: stopwatch(a["cmd"]), action_class="shell", timeout=SHORTCUT_TIMEOUT),
+    "send_message": ActionSpec(lambda a: send_message(a["platform"], a["to"], a["text"]), timeout=10.0),
+    "get_mac_state": ActionSpec(
+        lambda a: get_mac_state(a.get("section", "all")),
+        action_class="shell", timeout=25.0, read_only=True, ttl=5.0,
+        key=lambda a: a.get("section", "all"), tags=("mac_state",),
+    ),
+    "list_running_apps": ActionSpec(
+        lambda a: list_running_apps(a.get("app_name")),
+        read_only=True, ttl=3.0, key=lambda a: a.get("app_name"), tags=("apps",),
+    ),
+    "mac_power": ActionSpec(lambda a: mac_power(a["action"]), action_class="shell", timeout=POWER_TIMEOUT),
+    "get_events": ActionSpec(
+        lambda a: get_events(a["day_start"], a["end_date"], a["calendars_allowlist"]),
+        action_class="eventkit", timeout=8.0, read_only=True, ttl=10.0, tags=("events",),
+    ),
 }
 
+_cache = ActionCache()
 
-def execute_actions(intents):
-    def _run(action, args):
-        handler = ACTION_MAP.get(action)
-        if not handler:
-            return {
+
+def action_cache_stats() -> dict[str, dict[str, float]]:
+    """Хиты/промахи кэша по действиям."""
+    return _cache.stats()
+
+
+def _store_result(action: str, cache_key: Hashable, spec: ActionSpec, versions: tuple[int, ...]):
+    def _done(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        _cache.put(action, cache_key, future.result(), spec.ttl, spec.tags, versions=versions)
+
+    return _done
+
+
+def _execute_steps(steps):
+    executor = default_executor()
+
+    def _call(spec, args):
+        def _run():
+            try:
+                return spec.handler(args)
+            finally:
+                if spec.invalidates:
+                    _cache.invalidate(spec.invalidates)
+
+        return _run
+
+    def _submit(action, spec, args, cache_key, cacheable):
+        versions = _cache.versions(spec.tags) if cacheable else None
+        future, deadline = executor.submit(_call(spec, args), spec.action_class, spec.timeout)
+        if cacheable:
+            future.add_done_callback(_store_result(action, cache_key, spec, versions))
+        return future, deadline
+
+    pending = []
+    in_flight: dict[tuple[str, Hashable], tuple] = {}
+    dirty: set[str] = set()  # теги, которые сбрасывает какое-то из предыдущих действий хода
+    for action, args in steps:
+        spec = ACTION_REGISTRY.get(action)
+        if spec is None:
+            pending.append((action, args, None, None, None, None))
+            continue
+        args = args or {}
+
+        cacheable = spec.read_only and spec.ttl > 0
+        cache_key = None
+        if cacheable:
+            try:
+                cache_key = spec.key(args)
+                hash(cache_key)
+            except Exception:
+                cacheable = False
+        after_write = not dirty.isdisjoint(spec.tags)
+        dirty.update(spec.invalidates)
+        if after_write:
+            # «поставь 50 и скажи громкость»: чтение не из кэша и не вместе с более ранним чтением —
+            # запускается, когда предыдущие шаги хода отработали
+            pending.append((action, args, None, None, None, (spec, cache_key, cacheable)))
+            continue
+        if cacheable:
+            hit, value = _cache.get(action, cache_key)
+            if hit:
+                pending.append((action, args, None, None, (value,), None))
+                continue
+            if (action, cache_key) in in_flight:
+                # тот же read-only запрос дважды за ход — выполняем один раз
+                future, deadline = in_flight[(action, cache_key)]
+                pending.append((action, args, future, deadline, None, None))
+                continue
+
+        future, deadline = _submit(action, spec, args, cache_key, cacheable)
+        if cacheable:
+            in_flight[(action, cache_key)] = (future, deadline)
+        pending.append((action, args, future, deadline, None, None))
+
+    results = []
+    for action, args, future, deadline, cached, deferred in pending:
+        if deferred is not None:
+            # все предыдущие шаги уже дождались (или вышли по дедлайну) выше в этом цикле
+            spec, cache_key, cacheable = deferred
+            future, deadline = _submit(action, spec, args, cache_key, cacheable)
+        if cached is not None:
+            results.append({
+                "action": action,
+                "args": args,
+                "result": cached[0],
+                "success": True
+            })
+            continue
+        if future is None:
+            results.append({
                 "action": action,
                 "args": args,
                 "result": None,
                 "success": False
-            }
+            })
+            continue
         try:
-            value = handler(args or {})
-            return {
+            value = executor.wait(future, deadline)
+            results.append({
                 "action": action,
                 "args": args,
                 "result": value,
                 "success": True
-            }
+            })
+        except ActionTimeout as e:
+            logger.warning("Action %s timed out: %s", action, e)
+            results.append({
+                "action": action,
+                "args": args,
+                "result": f"Не успела выполнить: {e}",
+                "success": False,
+                "timed_out": True,
+            })
         except Exception as e:
-            return {
+            results.append({
                 "action": action,
                 "args": args,
                 "result": str(e),
                 "success": False
-            }
+            })
+    return results
+
+
+def execute_actions(intents):
+    """
+    Выполняет интенты одного хода. План (core.planner) сворачивает однотипные действия,
+    но результат по-прежнему возвращается на каждый исходный интент, в исходном порядке.
+    """
+    intents = list(intents)
+    plan = plan_turn(intents)
+    step_results = _execute_steps([(step.action, step.args) for step in plan.steps])
 
-    if len(intents) <= 1:
-        return [_run(action, args) for action, args in intents]
+    results: list[dict | None] = [None] * len(intents)
+    for step, res in zip(plan.steps, step_results):
+        coalesced = len(step.origins) > 1
+        for i in step.origins:
+            action, args = intents[i]
+            item = dict(res, action=action, args=args)
+            if coalesced:
+                item["coalesced_into"] = step.action
+            results[i] = item
 
-    with ThreadPoolExecutor(max_workers=min(4, len(intents))) as pool:
-        futures = [pool.submit(_run, action, args) for action, args in intents]
-        return [f.result() for f in futures]
+    for i, by in plan.overridden.items():
+        action, args = intents[i]
+        results[i] = {
+            "action": action,
+            "args": args,
+            "result": f"Перекрыто действием {by}",
+            "success": True,
+            "skipped": True,
+        }
+    return results
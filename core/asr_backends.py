@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import torch
+
+from core.compute import Workload, default_governor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ASR_ARTIFACT_DIR = "models/asr"
+
+# фиксированный русский набор для бенчмарка: короткие команды, как их говорят ассистенту
+ASR_BENCH_PHRASES = (
+    "поставь таймер на пять минут",
+    "какая погода сегодня в москве",
+    "открой телеграм",
+    "сделай громкость потише",
+    "напомни завтра в девять утра позвонить маме",
+    "что у меня в календаре на пятницу",
+    "запусти секундомер",
+    "расскажи какие новости на сегодня",
+)
+
+
+def artifact_path(artifact_dir: str | Path, model_id: str, suffix: str) -> Path:
+    """models/asr/ai-sage--GigaAM-v3-<suffix>."""
+    return Path(artifact_dir) / f"{model_id.replace('/', '--')}-{suffix}"
+
+
+def normalize_words(text: str) -> list[str]:
+    text = text.lower().replace("ё", "е")
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+
+def word_error_rate(references: Iterable[str], hypotheses: Iterable[str]) -> float:
+    """WER по всему набору: сумма правок (Левенштейн по словам) / число слов в эталонах."""
+    edits = words = 0
+    for ref, hyp in zip(references, hypotheses):
+        r, h = normalize_words(ref), normalize_words(hyp)
+        row = list(range(len(h) + 1))
+        for i, rw in enumerate(r, 1):
+            prev, row[0] = row[0], i
+            for j, hw in enumerate(h, 1):
+                prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (rw != hw))
+        edits += row[-1]
+        words += len(r)
+    return edits / words if words else 0.0
+
+
+class ASRBackend:
+    """
+    Режим инференса ASR. prepare() получает загруженный HFWhisperRecognizer и подменяет
+    в нём модель (или её энкодер) — transcribe() дальше работает как обычно.
+    Возвращает имя режима, который реально включился (при откатах он может отличаться).
+    """
+
+    name = "torch"
+
+    def __init__(self, artifact_dir: str | Path = DEFAULT_ASR_ARTIFACT_DIR):
+        self.artifact_dir = Path(artifact_dir)
+
+    def prepare(self, recognizer) -> str:
+        return self.name
+
+
+class QuantizedASRBackend(ASRBackend):
+    """
+    Динамическая int8-квантизация Linear (torch.ao.quantization.quantize_dynamic), только CPU.
+    Готовая модель сохраняется целиком в models/asr — при следующем старте квантизация не идёт.
+    Артефакт привязан к версии torch: pickle модулей между версиями не переносим.
+    """
+
+    name = "int8"
+
+    def _path(self, recognizer) -> Path:
+        version = torch.__version__.split("+")[0]
+        return artifact_path(self.artifact_dir, recognizer.model_id, f"int8-torch{version}.pt")
+
+    def prepare(self, recognizer) -> str:
+        if recognizer.device != "cpu":
+            logger.warning("ASR int8 backend is CPU-only, keeping float model on %s", recognizer.device)
+            return ASRBackend.name
+        path = self._path(recognizer)
+        t0 = time.perf_counter()
+        if path.exists():
+            try:
+                recognizer.model = torch.load(path, map_location="cpu", weights_only=False).eval()
+                logger.info("ASR int8 model loaded from %s in %.2f s", path, time.perf_counter() - t0)
+                return self.name
+            except Exception as e:
+                logger.warning("ASR int8 artifact %s is unusable, re-quantizing: %s", path, e)
+        try:
+            model = torch.ao.quantization.quantize_dynamic(recognizer.model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning("ASR quantization failed, using float model: %s", e)
+            return ASRBackend.name
+        recognizer.model = model.eval()
+        logger.info("ASR model quantized in %.2f s", time.perf_counter() - t0)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".part")
+            torch.save(model, tmp)
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning("ASR int8 artifact was not saved: %s", e)
+        return self.name
+
+
+class _OnnxEncoder(torch.nn.Module):
+    """Энкодер GigaAM в ONNX Runtime с тем же интерфейсом (features, lengths) -> (encoded, lengths)."""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def forward(self, features: torch.Tensor, lengths: torch.Tensor):
+        encoded, encoded_len = self.session.run(None, {
+            "features": features.detach().cpu().numpy().astype(np.float32, copy=False),
+            "lengths": lengths.detach().cpu().numpy().astype(np.int64, copy=False),
+        })
+        return torch.from_numpy(encoded), torch.from_numpy(encoded_len)
+
+
+class OnnxASRBackend(ASRBackend):
+    """
+    Энкодер GigaAM (основная часть вычислений) экспортируется в ONNX и крутится в ONNX Runtime на CPU;
+    препроцессинг и декодер остаются в torch. Экспорт — один раз, в models/asr.
+    Нет onnxruntime или модель не GigaAM — откат на int8.
+    """
+
+    name = "onnx"
+
+    def prepare(self, recognizer) -> str:
+        core = recognizer._gigaam_core() if recognizer.is_gigaam else None
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            ort = None
+        if core is None or ort is None:
+            logger.warning("ASR onnx backend needs onnxruntime and a GigaAM model, falling back to int8")
+            return QuantizedASRBackend(self.artifact_dir).prepare(recognizer)
+
+        path = artifact_path(self.artifact_dir, recognizer.model_id, "encoder.onnx")
+        try:
+            if not path.exists():
+                self._export(core, path)
+            options = ort.SessionOptions()
+            # ORT держит свой пул потоков — размер как у бюджета командного ASR в ComputeGovernor
+            options.intra_op_num_threads = default_governor().budgets[Workload.COMMAND_ASR]
+            t0 = time.perf_counter()
+            session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+            logger.info("ASR onnx encoder loaded from %s in %.2f s", path, time.perf_counter() - t0)
+        except Exception as e:
+            logger.warning("ASR onnx encoder unavailable, falling back to int8: %s", e)
+            return QuantizedASRBackend(self.artifact_dir).prepare(recognizer)
+        core.encoder = _OnnxEncoder(session)
+        return self.name
+
+    @staticmethod
+    def _export(core, path: Path) -> None:
+        t0 = time.perf_counter()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        param = next(core.parameters())
+        wav = torch.zeros(1, 16000, dtype=param.dtype, device=param.device)
+        with torch.no_grad():
+            features, lengths = core.preprocessor(wav, torch.tensor([16000], device=param.device))
+        tmp = path.with_suffix(".part")
+        torch.onnx.export(
+            core.encoder,
+            (features, lengths),
+            str(tmp),
+            input_names=["features", "lengths"],
+            output_names=["encoded", "encoded_len"],
+            dynamic_axes={
+                "features": {0: "batch", 2: "frames"},
+                "lengths": {0: "batch"},
+                "encoded": {0: "batch", 2: "steps"},
+                "encoded_len": {0: "batch"},
+            },
+            opset_version=17,
+        )
+        tmp.replace(path)
+        logger.info("ASR encoder exported to %s in %.1f s", path, time.perf_counter() - t0)
+
+
+ASR_BACKENDS: dict[str, type[ASRBackend]] = {
+    ASRBackend.name: ASRBackend,
+    QuantizedASRBackend.name: QuantizedASRBackend,
+    OnnxASRBackend.name: OnnxASRBackend,
+}
+
+
+def make_asr_backend(name: str, artifact_dir: str | Path = DEFAULT_ASR_ARTIFACT_DIR) -> ASRBackend:
+    cls = ASR_BACKENDS.get((name or "").strip().lower())
+    if cls is None:
+        logger.warning("Unknown ASR backend %r, falling back to torch", name)
+        cls = ASRBackend
+    return cls(artifact_dir)
+
+
+def benchmark(recognizer, samples: list[tuple[np.ndarray, int, str]]) -> dict:
+    """RTF (время распознавания / длительность аудио) и WER на наборе (аудио, частота, эталон)."""
+    recognizer.transcribe(samples[0][0], samples[0][1])  # прогрев
+    hyps = []
+    asr_sec = audio_sec = 0.0
+    for audio, sr, _ in samples:
+        t0 = time.perf_counter()
+        hyps.append(recognizer.transcribe(audio, sr))
+        asr_sec += time.perf_counter() - t0
+        audio_sec += len(audio) / sr
+    return {
+        "backend": recognizer.backend,
+        "threads": torch.get_num_threads(),
+        "utterances": len(samples),
+        "asr_sec": asr_sec,
+        "audio_sec": audio_sec,
+        "rtf": asr_sec / audio_sec if audio_sec else 0.0,
+        "wer": word_error_rate([ref for _, _, ref in samples], hyps),
+    }
+
+
+def _synthetic_set(env: dict[str, str], out_dir: Path) -> Path:
+    """Озвучивает ASR_BENCH_PHRASES локальным Silero (один раз) — набор без ручной записи."""
+    import json
+
+    from core.audio_io import float_to_wav
+    from core.tts_backends import TorchTTSBackend
+    from core.tts_model import TTSModelLoader
+    from core.voice import resample_linear
+
+    labels_path = out_dir / "labels.json"
+    if labels_path.exists():
+        return out_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tts = TorchTTSBackend(TTSModelLoader.from_env(env)).start()
+    labels = {}
+    for i, phrase in enumerate(ASR_BENCH_PHRASES):
+        audio = resample_linear(tts.synthesize(phrase, "kseniya", 24000), 24000, 16000)
+        name = f"{i:02d}.wav"
+        (out_dir / name).write_bytes(float_to_wav(audio, 16000))
+        labels[name] = phrase
+    labels_path.write_text(json.dumps(labels, ensure_ascii=False, indent=1), encoding="utf-8")
+    return out_dir
+
+
+def _main() -> None:
+    """
+    python -m core.asr_backends [папка]: RTF и WER каждого режима ASR.
+    Папка — WAV + labels.json {"файл.wav": "эталонный текст"}; без неё набор озвучивается
+    из ASR_BENCH_PHRASES в models/asr/bench.
+    """
+    import json
+    import sys
+
+    from core.audio_io import wav_to_float
+    from core.voice import HFWhisperRecognizer
+    from tools.env_tools import read_env
+
+    logging.basicConfig(level=logging.INFO)
+    env = read_env(".env")
+    artifact_dir = env.get("HF_ASR_ARTIFACT_DIR", "").strip() or DEFAULT_ASR_ARTIFACT_DIR
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else _synthetic_set(env, Path(artifact_dir) / "bench")
+    labels = json.loads((root / "labels.json").read_text(encoding="utf-8"))
+    samples = [(*wav_to_float((root / name).read_bytes()), ref) for name, ref in labels.items()]
+    for name in ASR_BACKENDS:
+        recognizer = HFWhisperRecognizer.from_env(dict(env, HF_ASR_BACKEND=name, HF_ASR_DEVICE="cpu"))
+        r = benchmark(recognizer, samples)
+        print(f"{r['backend']:>6} threads={r['threads']} audio={r['audio_sec']:.1f}s "
+              f"asr={r['asr_sec']:.2f}s rtf={r['rtf']:.3f} wer={r['wer'] * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    _main()
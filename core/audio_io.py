@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import io
+import wave
+
+import numpy as np
+
+
+def wav_to_float(wav_bytes: bytes) -> tuple[np.ndarray, int]:
+    """WAV (int16) -> float32 [-1, 1] моно + частота."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+        sr = wf.getframerate()
+        channels = wf.getnchannels()
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    return pcm.astype(np.float32) / 32768.0, sr
+
+
+def float_to_wav(audio: np.ndarray, sample_rate: int) -> bytes:
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+    buff = io.BytesIO()
+    with wave.open(buff, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+    return buff.getvalue()
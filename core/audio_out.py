@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import numpy as np
+import sounddevice as sd
+
+from core.vad import BandMeter
+
+logger = logging.getLogger(__name__)
+
+
+def as_float32(audio) -> np.ndarray:
+    """Tensor/ndarray -> одномерный float32 без копии, если данные уже float32 на CPU."""
+    if hasattr(audio, "detach"):
+        audio = audio.detach().cpu().numpy()
+    return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+
+class RingBufferOutput:
+    """
+    Один постоянно открытый OutputStream, который читает из заранее выделенного float32-кольца.
+    write() копирует сэмплы прямо в кольцо (без промежуточных массивов), clear() обнуляет
+    очередь с точностью до сэмпла: следующий колбэк уже отдаёт тишину.
+    """
+
+    def __init__(self, sample_rate: int, capacity_sec: float = 30.0, blocksize: int = 512):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.capacity = int(sample_rate * capacity_sec)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._r = 0  # абсолютные позиции чтения/записи (сэмплы)
+        self._w = 0
+        self._lock = threading.Lock()
+        self._space = threading.Event()
+        self._stream: sd.OutputStream | None = None
+
+        # (позиция первого сэмпла, время write) — для time-to-first-sample
+        self._mark: tuple[int, float] | None = None
+        self.drained_at: float | None = None
+        self._ttfs: deque[float] = deque(maxlen=200)
+        # (время колбэка, мощность блока в речевой полосе) — опорный сигнал для подавления эха
+        # при barge-in; та же шкала (BandMeter), что у кадров микрофона в BargeInDetector
+        self._meter = BandMeter(sample_rate)
+        self._levels: deque[tuple[float, float]] = deque(maxlen=max(16, int(2.0 * sample_rate / blocksize)))
+        # clear() во время звука: когда колбэк впервые отдал тишину — задержка до тишины
+        self._cleared_at: float | None = None
+        self._silence_latency: deque[float] = deque(maxlen=200)
+
+    def start(self):
+        if self._stream is not None:
+            return
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.blocksize,
+            latency="low",
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def close(self):
+        self.clear()
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        try:
+            stream.stop()
+            stream.close()
+        except Exception as e:
+            logger.warning("Output stream close failed: %s", e)
+
+    @property
+    def buffered(self) -> int:
+        with self._lock:
+            return self._w - self._r
+
+    @property
+    def position(self) -> int:
+        """Сколько сэмплов уже отдано в устройство."""
+        return self._r
+
+    def _callback(self, outdata, frames, time_info, status):  # noqa: ARG002
+        out = outdata[:, 0]
+        cap = self.capacity
+        with self._lock:
+            n = min(self._w - self._r, frames)
+            start = self._r % cap
+            first = min(n, cap - start)
+            out[:first] = self._buf[start:start + first]
+            if n > first:
+                out[first:n] = self._buf[:n - first]
+            r0 = self._r
+            self._r += n
+            mark = self._mark
+            if mark is not None and r0 <= mark[0] < self._r:
+                self._ttfs.append(time.time() - mark[1])
+                self._mark = None
+            if n and self._r == self._w:
+                self.drained_at = time.time()
+        if n < frames:
+            out[n:] = 0.0
+        now = time.time()
+        self._levels.append((now, self._meter.power(out)))
+        cleared = self._cleared_at
+        if cleared is not None and n == 0:
+            self._cleared_at = None
+            self._silence_latency.append(now - cleared + self.output_latency)
+        if n:
+            self._space.set()
+
+    def write(self, audio, keep_going: Callable[[], bool] | None = None) -> bool:
+        """
+        Дописывает аудио в кольцо, при нехватке места ждёт колбэк.
+        Возвращает False, если keep_going() сказал прекратить (например, был interrupt).
+        """
+        data = as_float32(audio)
+        self.start()
+        cap = self.capacity
+        pos = 0
+        while pos < len(data):
+            if keep_going is not None and not keep_going():
+                return False
+            with self._lock:
+                free = cap - (self._w - self._r)
+                n = min(free, len(data) - pos)
+                if n > 0:
+                    if self._w == self._r:
+                        self._mark = (self._w, time.time())
+                    start = self._w % cap
+                    first = min(n, cap - start)
+                    self._buf[start:start + first] = data[pos:pos + first]
+                    if n > first:
+                        self._buf[:n - first] = data[pos + first:pos + n]
+                    self._w += n
+                    self.drained_at = None
+            if n > 0:
+                pos += n
+                continue
+            self._space.clear()
+            self._space.wait(0.05)
+        return True
+
+    @property
+    def output_latency(self) -> float:
+        """Задержка устройства (сек) — от колбэка до звука из динамика."""
+        try:
+            return float(getattr(self._stream, "latency", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def recent_level_db(self, window_sec: float) -> float:
+        """Самый громкий блок, отданный в устройство за последние window_sec (дБ, полоса 300–3400 Гц)."""
+        since = time.time() - window_sec
+        energy = max((e for t, e in list(self._levels) if t >= since), default=0.0)
+        return float(10 * np.log10(energy + 1e-10))
+
+    def clear(self):
+        with self._lock:
+            if self._w > self._r:
+                self._cleared_at = time.time()
+            self._r = self._w
+            self._mark = None
+            self.drained_at = None
+        self._space.set()
+
+    def wait_drained(self, timeout: float | None = None, keep_going: Callable[[], bool] | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.buffered > 0:
+            if keep_going is not None and not keep_going():
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> dict:
+        """
+        Время от write() в пустое кольцо до выдачи первого сэмпла в устройство и от clear()
+        посреди звука до тишины на выходе (с задержкой устройства), сек.
+        """
+        ttfs = list(self._ttfs)
+        silence = list(self._silence_latency)
+        return {
+            "ttfs_avg": sum(ttfs) / len(ttfs) if ttfs else 0.0,
+            "ttfs_max": max(ttfs) if ttfs else 0.0,
+            "samples": len(ttfs),
+            "clear_to_silence_avg": sum(silence) / len(silence) if silence else 0.0,
+            "clear_to_silence_max": max(silence) if silence else 0.0,
+        }
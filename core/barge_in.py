@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from core.vad import BandMeter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BargeInEvent:
+    # абсолютная позиция в потоке CaptureHub, где началась речь пользователя
+    speech_pos: int
+    # от первого речевого кадра до срабатывания, по времени потока (сек)
+    detect_delay: float
+    wall_time: float
+
+
+class BargeInDetector:
+    """
+    Перебивание озвучки: пока TTS говорит, смотрит на микрофон (подписчик CaptureHub) и ищет речь
+    пользователя поверх эха собственного голоса.
+
+    Подавление эха простое, по энергии: выход TTS известен (RingBufferOutput хранит уровень
+    каждого отданного блока), эхо в микрофоне не громче «самого громкого блока за последние
+    echo_window_sec + coupling_db». Уровни выхода и микрофона меряются одним BandMeter
+    (полоса 300–3400 Гц, средний квадрат сэмпла) — иначе связь не сойдётся. coupling_db — связь динамик->микрофон, подстраивается на кадрах,
+    где пользователь молчит. Речь — кадр в полосе 300–3400 Гц громче и эха, и шумового пола
+    на margin_db, с неплоским спектром; start_ms таких кадров подряд — срабатывание.
+
+    По срабатыванию сразу (в потоке микрофона) глушится звук TTS (tts.silence(): смена поколения
+    и очистка кольца) — это и есть задержка до тишины. Всё, что может блокировать (очереди TTS,
+    восстановление громкости через osascript, отмена LLM, запись команды), делает on_barge_in
+    вне аудиопотока.
+    """
+
+    def __init__(
+            self,
+            tts_provider: Callable[[], object | None],
+            on_barge_in: Callable[[BargeInEvent], None] | None = None,
+            sample_rate: int = 16000,
+            frame_ms: int = 20,
+            margin_db: float = 10.0,
+            start_ms: int = 60,
+            echo_window_sec: float = 0.35,
+            coupling_db: float = -10.0,
+            max_flatness: float = 0.45,
+            min_level_db: float = -65.0,
+    ):
+        self.tts_provider = tts_provider
+        self.on_barge_in = on_barge_in
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.echo_window_sec = echo_window_sec
+        self.coupling_db = coupling_db
+        self.max_flatness = max_flatness
+        self.min_level_db = min_level_db
+
+        self._meter = BandMeter(sample_rate)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pending_pos = 0
+        self._floor_db: float | None = None
+        self._run = 0
+        self._run_start = 0
+        self._armed = False
+        self._fired = False
+        self._last_tts = None
+        self._lock = threading.Lock()
+
+        self.triggers = 0
+        self.detect_delays: deque[float] = deque(maxlen=200)
+        self.callback_sec: deque[float] = deque(maxlen=200)
+
+    def _frame_level(self, frame: np.ndarray) -> tuple[float, float]:
+        band = self._meter.band(frame) + 1e-12
+        level = float(10 * np.log10(band.sum()))
+        flatness = float(np.exp(np.log(band).mean()) / band.mean())
+        return level, flatness
+
+    def _reset(self):
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._run = 0
+
+    def on_audio(self, chunk: np.ndarray, pos: int):
+        """Подписчик CaptureHub: вызывается в потоке микрофона."""
+        tts = self.tts_provider()
+        if tts is None or not getattr(tts, "is_speaking", False):
+            if self._armed:
+                self._armed = False
+                self._reset()
+            self._fired = False
+            return
+        if self._fired:
+            # уже перебили эту реплику — ждём, пока выход замолчит
+            return
+        if not self._armed:
+            self._armed = True
+            self._reset()
+            self._pending_pos = pos
+
+        t0 = time.perf_counter()
+        with self._lock:
+            event = self._process(tts, chunk)
+        if event is None:
+            return
+        # глушим звук прямо здесь — не ждём GUI-поток; колбэк микрофона держит замок hub,
+        # поэтому только silence(), полный interrupt() — в on_barge_in
+        try:
+            tts.silence()
+        except Exception as e:
+            logger.warning("Barge-in: TTS silence failed: %s", e)
+        self.callback_sec.append(time.perf_counter() - t0)
+        self.triggers += 1
+        self._last_tts = tts
+        self.detect_delays.append(event.detect_delay)
+        logger.info("Barge-in at stream %.2f s (detected after %.0f ms of speech)",
+                    event.speech_pos / self.sample_rate, event.detect_delay * 1000)
+        self._armed = False
+        self._fired = True
+        self._reset()
+        if self.on_barge_in:
+            self.on_barge_in(event)
+
+    def _process(self, tts, chunk: np.ndarray) -> BargeInEvent | None:
+        data = np.concatenate([self._pending, np.asarray(chunk, dtype=np.float32).reshape(-1)])
+        n = len(data) // self.frame
+        base = self._pending_pos
+        self._pending = data[n * self.frame:]
+        self._pending_pos = base + n * self.frame
+
+        echo_db = tts.output.recent_level_db(self.echo_window_sec) + self.coupling_db
+        for i in range(n):
+            level, flatness = self._frame_level(data[i * self.frame:(i + 1) * self.frame])
+            if self._floor_db is None:
+                self._floor_db = level
+            threshold = max(self._floor_db, echo_db) + self.margin_db
+            speech = level > threshold and level > self.min_level_db and flatness < self.max_flatness
+            if speech:
+                if self._run == 0:
+                    self._run_start = base + i * self.frame
+                self._run += 1
+                if self._run >= self.start_frames:
+                    end = base + (i + 1) * self.frame
+                    return BargeInEvent(self._run_start, (end - self._run_start) / self.sample_rate, time.time())
+                continue
+            self._run = 0
+            # пользователь молчит: кадр — эхо или шум, подстраиваем связь и пол
+            if echo_db > self._floor_db + self.margin_db:
+                observed = level - (echo_db - self.coupling_db)
+                rate = 0.2 if observed > self.coupling_db else 0.02
+                self.coupling_db = min(0.0, self.coupling_db + rate * (observed - self.coupling_db))
+                if level < self._floor_db:
+                    # кадр тише пола — пол завышен (например, первым кадром было эхо)
+                    self._floor_db += 0.3 * (level - self._floor_db)
+            else:
+                rate = 0.3 if level < self._floor_db else 0.02
+                self._floor_db += rate * (level - self._floor_db)
+        return None
+
+    def stats(self) -> dict:
+        """
+        Срабатывания; задержка от начала речи до срабатывания (время потока) и от срабатывания
+        до тишины на выходе (clear() -> первый пустой блок + задержка устройства). Цель — сумма < 100 мс.
+        """
+        delays = list(self.detect_delays)
+        cb = list(self.callback_sec)
+        out = {
+            "triggers": self.triggers,
+            "detect_delay_avg": sum(delays) / len(delays) if delays else 0.0,
+            "detect_delay_max": max(delays) if delays else 0.0,
+            "interrupt_sec_max": max(cb) if cb else 0.0,
+            "coupling_db": self.coupling_db,
+        }
+        output = getattr(self._last_tts, "output", None)
+        if output is not None:
+            st = output.stats()
+            out["to_silence_avg"] = st["clear_to_silence_avg"]
+            out["to_silence_max"] = st["clear_to_silence_max"]
+        return out
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+from typing import Callable
+
+import numpy as np
+import sounddevice as sd
+
+logger = logging.getLogger(__name__)
+
+# подписчик получает кусок моно float32 (срез общего буфера — копировать, если нужен дольше вызова)
+# и абсолютную позицию его первого сэмпла в потоке
+AudioSubscriber = Callable[[np.ndarray, int], None]
+
+
+class AudioRing:
+    """
+    Заранее выделенное кольцо моно float32. samples — сколько всего записано с reset();
+    позиции везде абсолютные, в кольце живут последние capacity сэмплов.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.samples = 0
+        self.copies = 0
+        self.overwritten = 0
+        # сколько отданных наружу записей/читателей ещё читают буфер (берёт и отпускает VoiceRecorder)
+        self.leases = 0
+
+    def reset(self):
+        self.samples = 0
+
+    @property
+    def in_use(self) -> bool:
+        return self.leases > 0
+
+    def write(self, mono: np.ndarray) -> list[np.ndarray]:
+        """Кладёт блок в кольцо; возвращает записанные куски (срезы буфера)."""
+        n = len(mono)
+        if n > self.capacity:
+            mono, n = mono[-self.capacity:], self.capacity
+        pos = self.samples % self.capacity
+        first = min(n, self.capacity - pos)
+        # int16 -> float32 прямо в буфер, без промежуточного массива
+        scale = 1.0 / 32768.0 if mono.dtype == np.int16 else 1.0
+        np.multiply(mono[:first], scale, out=self.buffer[pos:pos + first], casting="unsafe")
+        parts = [self.buffer[pos:pos + first]]
+        if first < n:
+            np.multiply(mono[first:], scale, out=self.buffer[:n - first], casting="unsafe")
+            parts.append(self.buffer[:n - first])
+        self.overwritten += max(0, self.samples + n - self.capacity) - max(0, self.samples - self.capacity)
+        self.samples += n
+        return parts
+
+    def since(self, pos: int, end: int | None = None) -> np.ndarray:
+        """
+        Сэмплы [pos, end) (end — текущий конец). Пока кольцо не провернулось через этот отрезок,
+        это срез без копирования; иначе — склейка двух кусков.
+        """
+        end = self.samples if end is None else min(end, self.samples)
+        start = max(pos, end - self.capacity, self.samples - self.capacity, 0)
+        if start >= end:
+            return np.zeros(0, dtype=np.float32)
+        a, b = start % self.capacity, end % self.capacity or self.capacity
+        if a < b:
+            return self.buffer[a:b]
+        self.copies += 1
+        return np.concatenate((self.buffer[a:], self.buffer[:b]))
+
+
+class CaptureHub:
+    """
+    Один открытый InputStream на всё приложение. Каждый блок микрофона пишется в историю
+    (кольцо history_sec) и раздаётся подписчикам: рекордерам hotword и команды, VAD, индикатору уровня.
+    Подписчик может начать с позиции в прошлом — история проигрывается ему под той же блокировкой,
+    что и живые блоки, поэтому между pre-roll и потоком нет ни дыры, ни повтора.
+    """
+
+    def __init__(
+            self,
+            sample_rate: int = 16000,
+            channels: int = 1,
+            dtype: str = "float32",
+            history_sec: float = 30.0,
+            device: str | int | None = None,
+    ):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.device = device
+        self.history = AudioRing(int(sample_rate * history_sec))
+        self.level_db = -100.0
+        self._subscribers: dict[int, AudioSubscriber] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stream: sd.InputStream | None = None
+        self._callbacks = 0
+        self._opens = 0
+
+    @classmethod
+    def from_env(cls, env: dict[str, str]) -> "CaptureHub":
+        history = env.get("CAPTURE_HISTORY_SEC", "").strip()
+        device = env.get("MIC_DEVICE", "").strip()
+        return cls(
+            history_sec=float(history) if history else 30.0,
+            device=int(device) if device.isdigit() else (device or None),
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self._stream is not None
+
+    @property
+    def position(self) -> int:
+        """Сколько сэмплов захвачено с открытия потока (абсолютная позиция конца)."""
+        return self.history.samples
+
+    def start(self) -> "CaptureHub":
+        """Открывает поток, если он ещё не открыт; дальше он не закрывается до close()."""
+        with self._lock:
+            if self._stream is not None:
+                return self
+            stream = sd.InputStream(
+                samplerate=self.sample_rate,
+                channels=self.channels,
+                dtype=self.dtype,
+                device=self.device,
+                callback=self._callback,
+            )
+            stream.start()
+            self._stream = stream
+            self._opens += 1
+        logger.info("Capture hub: input stream opened (%d Hz)", self.sample_rate)
+        return self
+
+    def close(self):
+        with self._lock:
+            stream, self._stream = self._stream, None
+            self._subscribers.clear()
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def subscribe(self, fn: AudioSubscriber, from_pos: int | None = None) -> int:
+        """
+        Подписка на поток. from_pos — абсолютная позиция, с которой начать (pre-roll из истории);
+        None — только новые блоки. Возвращает id для unsubscribe().
+        """
+        with self._lock:
+            if from_pos is not None and from_pos < self.history.samples:
+                start = max(from_pos, self.history.samples - self.history.capacity)
+                fn(self.history.since(start), start)
+            sub_id = next(self._ids)
+            self._subscribers[sub_id] = fn
+            return sub_id
+
+    def unsubscribe(self, sub_id: int | None):
+        """После возврата подписчик гарантированно больше не вызывается."""
+        if sub_id is None:
+            return
+        with self._lock:
+            self._subscribers.pop(sub_id, None)
+
+    def audio_since(self, pos: int, end: int | None = None) -> np.ndarray:
+        with self._lock:
+            return self.history.since(pos, end).copy()
+
+    def _callback(self, indata, frames, _time, status):  # noqa: ARG002
+        with self._lock:
+            self._callbacks += 1
+            pos = self.history.samples
+            parts = self.history.write(indata[:, 0])
+            energy = sum(float(np.dot(p, p)) for p in parts)
+            self.level_db = 10 * np.log10(energy / max(1, frames) + 1e-10)
+            for fn in list(self._subscribers.values()):
+                offset = pos
+                for part in parts:
+                    try:
+                        fn(part, offset)
+                    except Exception as e:
+                        logger.warning("Capture subscriber failed: %s", e)
+                    offset += len(part)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._stream is not None,
+                "stream_opens": self._opens,
+                "callbacks": self._callbacks,
+                "subscribers": len(self._subscribers),
+                "captured_sec": self.history.samples / self.sample_rate,
+                "history_sec": self.history.capacity / self.sample_rate,
+            }
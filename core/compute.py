@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Iterator
+
+import torch
+
+
+class Workload(IntEnum):
+    """Меньше значение — выше приоритет."""
+    COMMAND_ASR = 0
+    TTS = 1
+    HOTWORD_ASR = 2
+
+
+# доля ядер на нагрузку: рядом всегда крутится Ollama, отдавать torch все ядра нельзя
+DEFAULT_SHARES = {
+    Workload.COMMAND_ASR: 0.75,
+    Workload.TTS: 0.5,
+    Workload.HOTWORD_ASR: 0.125,
+}
+
+_local = threading.local()
+
+
+def current_threads() -> int | None:
+    """Бюджет потоков слота, в котором сейчас работает этот поток (для передачи в хост инференса)."""
+    return getattr(_local, "threads", None)
+
+
+@dataclass
+class _WorkloadStats:
+    runs: int = 0
+    wait_sec: float = 0.0
+    wait_max: float = 0.0
+    busy_sec: float = 0.0
+    cpu_sec: float = 0.0
+
+
+class ComputeGovernor:
+    """
+    Диспетчер torch-инференса в процессе.
+    - одновременно идёт не больше max_concurrent инференсов, ожидающие получают слот по приоритету
+      (командный ASR > TTS > hotword ASR), при равном — по очереди;
+    - на время слота torch получает бюджет потоков своей нагрузки;
+    - вытеснение кооперативное: длинные задачи спрашивают pending_higher() и дробят работу.
+    """
+
+    def __init__(
+            self,
+            total_threads: int | None = None,
+            budgets: dict[Workload, int] | None = None,
+            max_concurrent: int = 1,
+    ):
+        self.total_threads = total_threads or os.cpu_count() or 4
+        self.budgets = {w: max(1, int(self.total_threads * share)) for w, share in DEFAULT_SHARES.items()}
+        self.budgets.update(budgets or {})
+        self.max_concurrent = max_concurrent
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._stats = {w: _WorkloadStats() for w in Workload}
+
+    @classmethod
+    def from_env(cls, env: dict[str, str]) -> "ComputeGovernor":
+        total = env.get("COMPUTE_THREADS", "").strip()
+        budgets = {}
+        # TTS_THREADS — прежняя настройка потоков TTS; действует, если не задан COMPUTE_THREADS_TTS
+        tts_threads = env.get("TTS_THREADS", "").strip()
+        if tts_threads.isdigit() and int(tts_threads) > 0:
+            budgets[Workload.TTS] = int(tts_threads)
+        for w in Workload:
+            raw = env.get(f"COMPUTE_THREADS_{w.name}", "").strip()
+            if raw.isdigit():
+                budgets[w] = int(raw)
+        return cls(total_threads=int(total) if total.isdigit() else None, budgets=budgets)
+
+    def pending_higher(self, workload: Workload) -> bool:
+        """Ждёт ли слота кто-то важнее workload."""
+        with self._cond:
+            return bool(self._waiting) and self._waiting[0][0] < workload
+
+    @contextmanager
+    def slot(self, workload: Workload) -> Iterator[int]:
+        """Держит слот на время инференса; отдаёт бюджет потоков."""
+        t0 = time.perf_counter()
+        ticket = (int(workload), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while self._running >= self.max_concurrent or self._waiting[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._running += 1
+        waited = time.perf_counter() - t0
+
+        threads = self.budgets[workload]
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+        _local.threads = threads
+        cpu0, busy0 = time.process_time(), time.perf_counter()
+        try:
+            yield threads
+        finally:
+            _local.threads = None
+            busy = time.perf_counter() - busy0
+            cpu = time.process_time() - cpu0
+            with self._cond:
+                st = self._stats[workload]
+                st.runs += 1
+                st.wait_sec += waited
+                st.wait_max = max(st.wait_max, waited)
+                st.busy_sec += busy
+                st.cpu_sec += cpu
+                self._running -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """
+        По каждой нагрузке: число запусков, ожидание слота (сред./макс.), время в слоте
+        и CPU процесса за это время (в режиме хоста инференса CPU тратит хост, здесь он почти 0).
+        """
+        with self._cond:
+            out = {}
+            for w, st in self._stats.items():
+                key = w.name.lower()
+                out[key] = {
+                    "threads": self.budgets[w],
+                    "runs": st.runs,
+                    "wait_avg": st.wait_sec / st.runs if st.runs else 0.0,
+                    "wait_max": st.wait_max,
+                    "busy_sec": st.busy_sec,
+                    "cpu_sec": st.cpu_sec,
+                }
+            return out
+
+
+_default: ComputeGovernor | None = None
+_default_lock = threading.Lock()
+
+
+def configure_governor(env: dict[str, str]) -> ComputeGovernor:
+    global _default
+    with _default_lock:
+        _default = ComputeGovernor.from_env(env)
+        return _default
+
+
+def default_governor() -> ComputeGovernor:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ComputeGovernor()
+        return _default
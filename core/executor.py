@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable
+
+
+_local = threading.local()
+
+
+def time_left(limit: float) -> float:
+    """
+    Таймаут для блокирующего вызова внутри действия: не больше limit и не дальше дедлайна действия,
+    чтобы подпроцесс/запрос не пережил дедлайн и не держал слот класса. Вне пула — просто limit.
+    """
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return limit
+    return max(0.05, min(limit, deadline - time.monotonic()))
+
+
+class ActionTimeout(Exception):
+    """Действие не уложилось в свой дедлайн (или не дождалось слота своего класса)."""
+
+
+class ActionExecutor:
+    """
+    Общий на процесс пул для системных действий.
+    - у каждого класса действий (osascript / network / shell ...) свой лимит параллельности;
+    - у каждого вызова свой таймаут, по истечении которого результат отдаётся как ActionTimeout,
+      а зависший поток дорабатывает в фоне и освобождает слот сам. Подпроцессы и HTTP внутри действия
+      берут таймаут через time_left(), поэтому «в фоне» длится не дольше самого дедлайна.
+    """
+
+    def __init__(
+            self,
+            max_workers: int = 8,
+            class_limits: dict[str, int] | None = None,
+            default_limit: int = 2,
+    ):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="action")
+        self._limits = dict(class_limits or {})
+        self._default_limit = default_limit
+        self._sems: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.timeouts = 0
+
+    def _sem(self, action_class: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._sems.get(action_class)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self._limits.get(action_class, self._default_limit))
+                self._sems[action_class] = sem
+            return sem
+
+    def submit(self, fn: Callable[[], Any], action_class: str, timeout: float) -> tuple[Future, float]:
+        """Возвращает future и абсолютный дедлайн (time.monotonic)."""
+        deadline = time.monotonic() + timeout
+        sem = self._sem(action_class)
+
+        def _guarded():
+            if not sem.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise ActionTimeout(f"нет свободного слота для '{action_class}'")
+            _local.deadline = deadline
+            try:
+                return fn()
+            finally:
+                _local.deadline = None
+                sem.release()
+
+        return self._pool.submit(_guarded), deadline
+
+    def wait(self, future: Future, deadline: float) -> Any:
+        """Ждёт результат до дедлайна; по истечении бросает ActionTimeout, не блокируя вызывающего."""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            self.timeouts += 1
+            raise ActionTimeout("превышено время ожидания") from None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_default: ActionExecutor | None = None
+_default_lock = threading.Lock()
+
+
+def default_executor() -> ActionExecutor:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ActionExecutor(
+                max_workers=8,
+                class_limits={"osascript": 2, "network": 4, "shell": 2},
+            )
+        return _default
@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from core.compute import current_threads
+from core.tts_backends import TTSBackend, set_torch_threads
+from core.tts_model import TTSModelLoader
+
+logger = logging.getLogger(__name__)
+
+_MIN_SEGMENT = 1 << 20  # 1 МБ — примерно 10 с float32 при 24 кГц
+# прогрев может включать разовую загрузку модели из сети
+_WARM_TIMEOUT = 600.0
+# какая загрузка нужна операции: до неё модель грузится с таймаутом прогрева, а не вызова
+_WARM_FOR = {"transcribe": "load_asr", "tts": "load_tts", "tts_batch": "load_tts"}
+
+
+class InferenceHostError(RuntimeError):
+    pass
+
+
+class _SharedBuffer:
+    """Свой сегмент shared memory, растёт по мере надобности (переиспользуется между запросами)."""
+
+    def __init__(self):
+        self.shm: SharedMemory | None = None
+
+    def ensure(self, nbytes: int) -> SharedMemory:
+        if self.shm is None or self.shm.size < nbytes:
+            self.release()
+            size = _MIN_SEGMENT
+            while size < nbytes:
+                size *= 2
+            self.shm = SharedMemory(create=True, size=size)
+        return self.shm
+
+    def write(self, data: np.ndarray) -> tuple[str, int]:
+        raw = np.ascontiguousarray(data).view(np.uint8).reshape(-1)
+        shm = self.ensure(len(raw))
+        shm.buf[:len(raw)] = raw
+        return shm.name, len(raw)
+
+    def release(self):
+        shm, self.shm = self.shm, None
+        if shm is None:
+            return
+        try:
+            shm.close()
+            shm.unlink()
+        except Exception:
+            pass
+
+
+class _AttachedBuffer:
+    """Чужой сегмент: держим открытым, пока владелец не сменит его на больший."""
+
+    def __init__(self):
+        self.shm: SharedMemory | None = None
+
+    def view(self, name: str, nbytes: int, dtype=np.uint8) -> np.ndarray:
+        if self.shm is None or self.shm.name != name:
+            self.close()
+            try:
+                # сегментом владеет другой процесс — он его и удалит (track есть с Python 3.13)
+                self.shm = SharedMemory(name=name, track=False)
+            except TypeError:
+                # до 3.13 подключение тоже регистрирует сегмент в resource_tracker — тот удалил бы его
+                # при выходе хоста (и предупредил об «утечке»); снимаем регистрацию сразу
+                self.shm = SharedMemory(name=name)
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        return np.ndarray((nbytes // np.dtype(dtype).itemsize,), dtype=dtype, buffer=self.shm.buf)
+
+    def close(self):
+        shm, self.shm = self.shm, None
+        if shm is not None:
+            try:
+                shm.close()
+            except Exception:
+                pass
+
+
+# ---- дочерний процесс ----
+
+class _HostModels:
+    """Модели внутри хоста; грузятся лениво, тяжёлые импорты — только здесь."""
+
+    def __init__(self, env: dict[str, str]):
+        self.env = env
+        self._recognizer = None
+        self._tts: TTSBackend | None = None
+        self.request = _AttachedBuffer()
+        self.response = _SharedBuffer()
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            from core.voice import HFWhisperRecognizer
+
+            t0 = time.perf_counter()
+            self._recognizer = HFWhisperRecognizer.from_env(self.env)
+            logger.info("Inference host: ASR loaded in %.2f s", time.perf_counter() - t0)
+        return self._recognizer
+
+    @property
+    def tts(self) -> TTSBackend:
+        if self._tts is None:
+            from core.tts_backends import backend_from_env
+
+            self._tts = backend_from_env(self.env).start()
+        return self._tts
+
+    def _audio_response(self, audios: list[np.ndarray]) -> dict:
+        lengths = [len(a) for a in audios]
+        data = np.concatenate(audios).astype(np.float32, copy=False) if audios else np.zeros(0, np.float32)
+        name, nbytes = self.response.write(data)
+        return {"shm": name, "nbytes": nbytes, "lengths": lengths}
+
+    def handle(self, op: str, payload: dict | None) -> Any:
+        payload = payload or {}
+        # бюджет потоков назначает ComputeGovernor на стороне приложения
+        set_torch_threads(payload.get("threads"))
+        if op == "ping":
+            return {"pid": os.getpid()}
+        if op == "load_asr":
+            self.recognizer
+            return True
+        if op == "load_tts":
+            self.tts.loader.get()
+            return True
+        if op == "transcribe":
+            audio = self.request.view(payload["shm"], payload["nbytes"], np.float32)
+            return self.recognizer.transcribe(audio, payload["sample_rate"])
+        if op == "tts":
+            audio = self.tts.synthesize(payload["text"], payload["speaker"], payload["sample_rate"])
+            return self._audio_response([audio])
+        if op == "tts_batch":
+            audios = self.tts.synthesize_batch(payload["texts"], payload["speaker"], payload["sample_rate"])
+            return None if audios is None else self._audio_response(audios)
+        raise ValueError(f"unknown op {op!r}")
+
+    def close(self):
+        self.request.close()
+        self.response.release()
+
+
+def _unlink_segment(name: str) -> None:
+    """Удаляет сегмент убитого хоста — сам он уже не сделает это в finally."""
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _host_main(conn, env: dict[str, str]) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] inference-host %(name)s: %(message)s")
+    models = _HostModels(env)
+    try:
+        while True:
+            try:
+                req_id, op, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if op == "shutdown":
+                conn.send((req_id, True, None))
+                break
+            try:
+                conn.send((req_id, True, models.handle(op, payload)))
+            except Exception as e:
+                logger.exception("Inference host: %s failed", op)
+                conn.send((req_id, False, f"{type(e).__name__}: {e}"))
+    finally:
+        models.close()
+
+
+# ---- процесс приложения ----
+
+class InferenceHost:
+    """
+    Подпроцесс, который владеет моделями ASR и TTS: инференс не делит GIL с Qt,
+    а падение модели не роняет приложение. Запросы идут по Pipe, аудио — через shared memory.
+    Фоновый монитор пингует хост и перезапускает его, если тот умер или завис.
+    """
+
+    def __init__(
+            self,
+            env: dict[str, str],
+            call_timeout: float = 120.0,
+            ping_interval: float = 5.0,
+            ping_timeout: float = 3.0,
+    ):
+        self.env = dict(env)
+        self.call_timeout = call_timeout
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._proc = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._req_id = 0
+        self._request = _SharedBuffer()
+        self._response = _AttachedBuffer()
+        # что прогреть заново после перезапуска и что уже загружено в текущем процессе хоста
+        self._warm_ops: list[str] = []
+        self._warm_done: set[str] = set()
+        # последний сегмент ответа, созданный хостом
+        self._host_segment: str | None = None
+        self._closed = threading.Event()
+        self._monitor: threading.Thread | None = None
+
+        self.restarts = 0
+        self._calls: deque[tuple[str, float]] = deque(maxlen=500)
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self) -> "InferenceHost":
+        with self._lock:
+            if self._proc is None:
+                self._spawn()
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="inference-host-monitor", daemon=True)
+            self._monitor.start()
+        return self
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_host_main, args=(child_conn, self.env), name="inference-host", daemon=True)
+        proc.start()
+        child_conn.close()
+        self._proc, self._conn = proc, parent_conn
+        self._warm_done = set()
+        logger.info("Inference host started (pid %s)", proc.pid)
+
+    def _kill(self):
+        proc, conn = self._proc, self._conn
+        self._proc = self._conn = None
+        self._response.close()
+        if conn is not None:
+            conn.close()
+        if proc is not None and proc.is_alive():
+            proc.kill()
+            proc.join(2.0)
+        segment, self._host_segment = self._host_segment, None
+        if segment:
+            try:
+                _unlink_segment(segment)
+            except Exception as e:
+                logger.warning("Inference host segment %s was not removed: %s", segment, e)
+
+    def _restart(self, reason: str):
+        logger.warning("Inference host restart: %s", reason)
+        self._kill()
+        if self._closed.is_set():
+            return
+        self._spawn()
+        self.restarts += 1
+        for op in self._warm_ops:
+            threading.Thread(target=self._safe_call, args=(op, _WARM_TIMEOUT), daemon=True).start()
+
+    def _call_locked(self, op: str, payload: dict | None, timeout: float) -> Any:
+        if not self.alive:
+            self._restart("process is not running")
+        warm_op = _WARM_FOR.get(op)
+        if warm_op and warm_op not in self._warm_done:
+            # после (пере)запуска модель ещё не загружена: иначе загрузка уложилась бы в call_timeout,
+            # не успела бы — и монитор перезапускал бы хост по кругу
+            self._request_locked(warm_op, None, _WARM_TIMEOUT)
+        return self._request_locked(op, payload, timeout)
+
+    def _request_locked(self, op: str, payload: dict | None, timeout: float) -> Any:
+        self._req_id += 1
+        req_id = self._req_id
+        t0 = time.perf_counter()
+        try:
+            self._conn.send((req_id, op, payload))
+            while True:
+                if not self._conn.poll(timeout):
+                    self._restart(f"{op} timed out after {timeout:.0f} s")
+                    raise InferenceHostError(f"{op} timed out")
+                rid, ok, result = self._conn.recv()
+                if rid == req_id:
+                    break
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self._restart(f"{op}: {e}")
+            raise InferenceHostError(f"inference host died during {op}") from e
+        self._calls.append((op, time.perf_counter() - t0))
+        if not ok:
+            raise InferenceHostError(result)
+        if op in _WARM_FOR.values():
+            self._warm_done.add(op)
+        return result
+
+    def call(self, op: str, payload: dict | None = None, timeout: float | None = None) -> Any:
+        if self._closed.is_set():
+            raise InferenceHostError("inference host is closed")
+        with self._lock:
+            return self._call_locked(op, payload, timeout or self.call_timeout)
+
+    def _safe_call(self, op: str, timeout: float | None = None):
+        try:
+            self.call(op, timeout=timeout)
+        except Exception as e:
+            logger.error("Inference host %s failed: %s", op, e)
+
+    def ensure_loaded(self, op: str):
+        """Загрузка (load_asr / load_tts) с таймаутом прогрева, если в текущем процессе хоста её ещё не было."""
+        if self.alive and op in self._warm_done:
+            return
+        with self._lock:
+            if not self.alive:
+                self._restart("process is not running")
+            if op not in self._warm_done:
+                self._request_locked(op, None, _WARM_TIMEOUT)
+
+    def warm(self, op: str, background: bool = True):
+        """Прогрев модели (load_asr / load_tts); повторяется после каждого перезапуска."""
+        if op not in self._warm_ops:
+            self._warm_ops.append(op)
+        if background:
+            threading.Thread(target=self._safe_call, args=(op, _WARM_TIMEOUT), daemon=True).start()
+        else:
+            self.call(op, timeout=_WARM_TIMEOUT)
+
+    def ping(self) -> bool:
+        try:
+            self.call("ping", timeout=self.ping_timeout)
+            return True
+        except InferenceHostError:
+            return False
+
+    def _monitor_loop(self):
+        while not self._closed.wait(self.ping_interval):
+            # занят долгим запросом — достаточно проверить, что процесс жив
+            if not self._lock.acquire(timeout=0.1):
+                if not self.alive:
+                    logger.warning("Inference host is not running while busy")
+                continue
+            try:
+                if self._closed.is_set():
+                    break
+                if not self.alive:
+                    self._restart("process exited")
+                else:
+                    try:
+                        self._call_locked("ping", None, self.ping_timeout)
+                    except InferenceHostError:
+                        pass
+            finally:
+                self._lock.release()
+
+    def _read_audio(self, result: dict) -> list[np.ndarray]:
+        self._host_segment = result["shm"]
+        data = self._response.view(result["shm"], result["nbytes"], np.float32).copy()
+        return np.split(data, np.cumsum(result["lengths"])[:-1])
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        with self._lock:
+            name, nbytes = self._request.write(np.asarray(audio, dtype=np.float32))
+            payload = {"shm": name, "nbytes": nbytes, "sample_rate": sample_rate, "threads": current_threads()}
+            return self._call_locked("transcribe", payload, self.call_timeout)
+
+    def synthesize(self, text: str, speaker: str, sample_rate: int) -> np.ndarray:
+        with self._lock:
+            payload = {"text": text, "speaker": speaker, "sample_rate": sample_rate, "threads": current_threads()}
+            return self._read_audio(self._call_locked("tts", payload, self.call_timeout))[0]
+
+    def synthesize_batch(self, texts: list[str], speaker: str, sample_rate: int) -> list[np.ndarray] | None:
+        with self._lock:
+            payload = {"texts": texts, "speaker": speaker, "sample_rate": sample_rate, "threads": current_threads()}
+            result = self._call_locked("tts_batch", payload, self.call_timeout)
+            return None if result is None else self._read_audio(result)
+
+    def stats(self) -> dict:
+        calls = list(self._calls)
+        out: dict[str, Any] = {"alive": self.alive, "pid": self._proc.pid if self._proc else None,
+                               "restarts": self.restarts}
+        for op in sorted({op for op, _ in calls}):
+            times = [t for o, t in calls if o == op]
+            out[f"{op}_calls"] = len(times)
+            out[f"{op}_avg"] = sum(times) / len(times)
+        return out
+
+    def close(self, timeout: float = 3.0):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._lock:
+            try:
+                if self.alive:
+                    self._conn.send((0, "shutdown", None))
+                    if self._conn.poll(timeout):
+                        self._conn.recv()
+                    self._proc.join(timeout)
+            except Exception:
+                pass
+            self._kill()
+            self._request.release()
+
+
+class RemoteRecognizer:
+    """Тот же интерфейс, что у HFWhisperRecognizer, но распознавание идёт в хосте."""
+
+    def __init__(self, host: InferenceHost):
+        self.host = host
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        if not len(audio):
+            return ""
+        return self.host.transcribe(audio, sample_rate)
+
+
+class RemoteTTSBackend(TTSBackend):
+    """Бэкенд TTS, синтезирующий в хосте; name — как у бэкенда внутри, чтобы кэш аудио был общий."""
+
+    def __init__(self, host: InferenceHost):
+        self.host = host
+        self.loader = None
+        self.model_id = TTSModelLoader.from_env(host.env).model_id
+        self.name = host.env.get("TTS_BACKEND", "").strip() or "torch"
+
+    def start(self) -> "RemoteTTSBackend":
+        self.host.start()
+        self.host.warm("load_tts")
+        return self
+
+    def wait_ready(self) -> None:
+        self.host.ensure_loaded("load_tts")
+
+    def synthesize(self, text: str, speaker: str, sample_rate: int) -> np.ndarray:
+        return self.host.synthesize(text, speaker, sample_rate)
+
+    def synthesize_batch(self, texts: list[str], speaker: str, sample_rate: int) -> list[np.ndarray] | None:
+        return self.host.synthesize_batch(texts, speaker, sample_rate)
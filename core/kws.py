@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from core.audio_io import float_to_wav, wav_to_float
+
+logger = logging.getLogger(__name__)
+
+N_MFCC = 13
+
+
+@lru_cache(maxsize=8)
+def _mel_filterbank(sample_rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    def to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def from_mel(m):
+        return 700.0 * (10 ** (m / 2595.0) - 1.0)
+
+    points = from_mel(np.linspace(to_mel(20.0), to_mel(sample_rate / 2), n_mels + 2))
+    bins = np.floor((n_fft + 1) * points / sample_rate).astype(int)
+    fb = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fb[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fb[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fb
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n_mfcc: int, n_mels: int) -> np.ndarray:
+    k = np.arange(n_mfcc)[:, None]
+    n = np.arange(n_mels)[None, :]
+    return np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)).astype(np.float32)
+
+
+def _frames(audio: np.ndarray, frame: int, hop: int) -> np.ndarray:
+    n = 1 + (len(audio) - frame) // hop
+    idx = np.arange(frame)[None, :] + hop * np.arange(n)[:, None]
+    return audio[idx]
+
+
+def mfcc(audio: np.ndarray, sample_rate: int, n_mfcc: int = N_MFCC, n_mels: int = 26) -> np.ndarray:
+    """MFCC на окнах 25 мс с шагом 10 мс; (кадры, n_mfcc)."""
+    frame = int(sample_rate * 0.025)
+    hop = int(sample_rate * 0.010)
+    if len(audio) < frame:
+        return np.zeros((0, n_mfcc), dtype=np.float32)
+    n_fft = 1 << (frame - 1).bit_length()
+    emphasized = np.append(audio[0], audio[1:] - 0.97 * audio[:-1]).astype(np.float32)
+    frames = _frames(emphasized, frame, hop) * np.hamming(frame).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    log_mel = np.log(power @ _mel_filterbank(sample_rate, n_fft, n_mels).T + 1e-10)
+    return log_mel @ _dct_matrix(n_mfcc, n_mels).T
+
+
+def _features(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    # без c0: он несёт громкость, а она зависит от расстояния до микрофона
+    return mfcc(audio, sample_rate)[:, 1:]
+
+
+def subsequence_dtw(template: np.ndarray, seq: np.ndarray) -> tuple[float, int]:
+    """
+    Лучшее совпадение шаблона с любым участком seq: (оценка, кадр конца).
+    Оценка — средняя цена пути на кадр шаблона, делённая на среднее расстояние между всеми
+    кадрами шаблона и seq: безразмерна, ~0.2–0.4 для того же слова и ~0.8+ для чужого звука.
+    Шаги (1,1), (1,2), (2,1) — наклон от 1/2 до 2, поэтому строка зависит только от двух
+    предыдущих и считается векторно по всей последовательности.
+    """
+    t, n = len(template), len(seq)
+    if t == 0 or n < t // 2:
+        return float("inf"), -1
+    cost = np.sqrt(((template[:, None, :] - seq[None, :, :]) ** 2).sum(axis=-1))
+    inf = np.float32(np.inf)
+    prev2 = np.full(n, inf, dtype=np.float32)
+    prev = cost[0].astype(np.float32)  # начало — в любом кадре
+    for i in range(1, t):
+        best = np.full(n, inf, dtype=np.float32)
+        best[1:] = prev[:-1]
+        best[2:] = np.minimum(best[2:], prev[:-2])
+        if i >= 2:
+            best[1:] = np.minimum(best[1:], prev2[:-1] + cost[i - 1, 1:])
+        prev2, prev = prev, best + cost[i]
+    end = int(np.argmin(prev))
+    return float(prev[end]) / t / (float(cost.mean()) + 1e-9), end
+
+
+@dataclass
+class KWSResult:
+    detected: bool
+    reason: str  # no_speech | no_templates | match | no_match | probe
+    score: float = float("inf")
+    speech_sec: float = 0.0
+    # участок с ключевым словом (сэмплы), если нашёлся
+    span: tuple[int, int] | None = None
+    # индексы шаблонов, прошедших порог
+    matched: tuple[int, ...] = ()
+
+
+class KeywordSpotter:
+    """
+    Дешёвый фильтр перед полным ASR горячего слова:
+    1) энергетический гейт — в сегменте должно быть хотя бы min_speech_sec речи над шумом;
+    2) MFCC + subsequence DTW против шаблонов «Маша» — полный ASR будится только при совпадении.
+    Пока шаблонов нет, работает только гейт; шаблоны набираются из сегментов, где ASR подтвердил
+    активацию (enroll), или лежат готовыми WAV в templates_dir.
+
+    Чтобы неудачный шаблон не запер «Машу» навсегда: после probe_every подряд отвергнутых сегментов
+    следующий короткий (до probe_max_sec речи) всё же уходит в ASR как проба — подтверждённая проба
+    даёт новый шаблон; автошаблоны, которые не совпали ни с одной из последних expire_after
+    подтверждённых активаций, удаляются вместе с файлом. Когда шаблонов max_templates, новый
+    вытесняет самый давно не совпадавший автошаблон.
+    """
+
+    def __init__(
+            self,
+            templates_dir: str | Path | None = None,
+            threshold: float = 0.6,
+            min_speech_sec: float = 0.25,
+            energy_margin_db: float = 10.0,
+            min_level_db: float = -50.0,
+            max_templates: int = 8,
+            probe_every: int = 8,
+            probe_max_sec: float = 1.5,
+            expire_after: int = 20,
+    ):
+        self.templates_dir = Path(templates_dir) if templates_dir else None
+        self.threshold = threshold
+        self.min_speech_sec = min_speech_sec
+        self.energy_margin_db = energy_margin_db
+        self.min_level_db = min_level_db
+        self.max_templates = max_templates
+        self.probe_every = probe_every
+        self.probe_max_sec = probe_max_sec
+        self.expire_after = expire_after
+        self.templates: list[np.ndarray] = []
+        # параллельно templates: файл шаблона и номер подтверждённой активации, когда он последний раз совпал
+        self._paths: list[Path | None] = []
+        self._last_hit: list[int] = []
+        self._confirmed = 0
+        self._rejected_in_row = 0
+
+        self.counts = {"segments": 0, "no_speech": 0, "no_match": 0, "passed": 0, "probes": 0,
+                       "enrolled": 0, "expired": 0}
+        self.cpu_sec = 0.0
+        self.audio_sec = 0.0
+
+        if self.templates_dir and self.templates_dir.exists():
+            for path in sorted(self.templates_dir.glob("*.wav")):
+                try:
+                    audio, sr = wav_to_float(path.read_bytes())
+                    self._add_template(audio, sr, path)
+                except Exception as e:
+                    logger.warning("KWS template %s skipped: %s", path, e)
+            logger.info("KWS: %d templates loaded from %s", len(self.templates), self.templates_dir)
+
+    @classmethod
+    def from_env(cls, env: dict[str, str]) -> "KeywordSpotter":
+        threshold = env.get("KWS_THRESHOLD", "").strip()
+        return cls(
+            templates_dir=env.get("KWS_TEMPLATES_DIR", "").strip() or "kws_templates",
+            threshold=float(threshold) if threshold else 0.6,
+        )
+
+    def _add_template(self, audio: np.ndarray, sample_rate: int, path: Path | None = None):
+        feats = _features(audio, sample_rate)
+        if len(feats) >= 10:
+            self._append_template(feats, path)
+            while len(self.templates) > self.max_templates:
+                self._drop_template(0, delete=False)
+
+    def _append_template(self, feats: np.ndarray, path: Path | None):
+        self.templates.append(feats)
+        self._paths.append(path)
+        self._last_hit.append(self._confirmed)
+
+    def _drop_template(self, idx: int, delete: bool = True):
+        path = self._paths[idx]
+        del self.templates[idx], self._paths[idx], self._last_hit[idx]
+        if delete and path is not None:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("KWS template %s not removed: %s", path, e)
+
+    def _stale_templates(self) -> list[int]:
+        """Автошаблоны (auto-*.wav или не сохранённые), от самого давно не совпадавшего к свежему."""
+        auto = [i for i, p in enumerate(self._paths) if p is None or p.name.startswith("auto-")]
+        return sorted(auto, key=lambda i: self._last_hit[i])
+
+    def _speech_mask(self, audio: np.ndarray, sample_rate: int) -> tuple[np.ndarray, int]:
+        hop = int(sample_rate * 0.010)
+        if len(audio) < hop:
+            return np.zeros(0, dtype=bool), hop
+        frames = audio[:len(audio) // hop * hop].reshape(-1, hop)
+        level = 10 * np.log10((frames.astype(np.float32) ** 2).mean(axis=1) + 1e-12)
+        floor = np.percentile(level, 20)
+        return level > max(floor + self.energy_margin_db, self.min_level_db), hop
+
+    def detect(self, audio: np.ndarray, sample_rate: int) -> KWSResult:
+        t0 = time.process_time()
+        try:
+            return self._detect(audio, sample_rate)
+        finally:
+            self.cpu_sec += time.process_time() - t0
+            self.audio_sec += len(audio) / sample_rate
+
+    def _detect(self, audio: np.ndarray, sample_rate: int) -> KWSResult:
+        self.counts["segments"] += 1
+        mask, hop = self._speech_mask(audio, sample_rate)
+        speech_sec = float(mask.sum()) * hop / sample_rate
+        if speech_sec < self.min_speech_sec:
+            self.counts["no_speech"] += 1
+            return KWSResult(False, "no_speech", speech_sec=speech_sec)
+
+        if not self.templates:
+            self.counts["passed"] += 1
+            return KWSResult(True, "no_templates", speech_sec=speech_sec)
+
+        # режем тишину по краям, чтобы DTW не гонялся по пустым кадрам
+        voiced = np.flatnonzero(mask)
+        start = max(0, (voiced[0] - 20) * hop)
+        stop = min(len(audio), (voiced[-1] + 20) * hop)
+        seq = _features(audio[start:stop], sample_rate)
+
+        best, best_end, best_len = float("inf"), -1, 0
+        matched = []
+        for i, template in enumerate(self.templates):
+            score, end = subsequence_dtw(template, seq)
+            if score <= self.threshold:
+                matched.append(i)
+            if score < best:
+                best, best_end, best_len = score, end, len(template)
+
+        if matched:
+            self.counts["passed"] += 1
+            self._rejected_in_row = 0
+            hop_f = int(sample_rate * 0.010)
+            end = start + (best_end + 3) * hop_f
+            span = (max(start, end - (best_len + 6) * hop_f), min(len(audio), end))
+            return KWSResult(True, "match", best, speech_sec, span, tuple(matched))
+        self.counts["no_match"] += 1
+        self._rejected_in_row += 1
+        if self._rejected_in_row >= self.probe_every and speech_sec <= self.probe_max_sec:
+            # шаблоны могли оказаться плохими — изредка даём ASR проверить короткий сегмент
+            self._rejected_in_row = 0
+            self.counts["probes"] += 1
+            return KWSResult(True, "probe", best, speech_sec)
+        return KWSResult(False, "no_match", best, speech_sec)
+
+    def enroll(self, audio: np.ndarray, sample_rate: int, result: KWSResult | None = None) -> bool:
+        """
+        ASR подтвердил «Маша» в этом сегменте — запоминаем шаблон.
+        Берём найденный DTW участок; без шаблонов — только короткие сегменты (одно слово).
+        Совпавшие шаблоны отмечаются как живые; давно не совпадавшие автошаблоны удаляются.
+        """
+        self._confirmed += 1
+        if result is not None:
+            for i in result.matched:
+                if i < len(self._last_hit):
+                    self._last_hit[i] = self._confirmed
+        for i in reversed(self._stale_templates()):
+            if self._confirmed - self._last_hit[i] >= self.expire_after:
+                logger.info("KWS: template %s expired (no match in %d activations)",
+                            self._paths[i] or f"#{i}", self.expire_after)
+                self._drop_template(i)
+                self.counts["expired"] += 1
+
+        full = len(self.templates) >= self.max_templates
+        if full and result is not None and result.matched:
+            # шаблоны и так узнают это слово — не гоняем их по кругу
+            return False
+        if result is not None and result.span is not None:
+            piece = audio[result.span[0]:result.span[1]]
+        else:
+            mask, hop = self._speech_mask(audio, sample_rate)
+            voiced = np.flatnonzero(mask)
+            if len(voiced) == 0 or (voiced[-1] - voiced[0]) * hop / sample_rate > 1.2:
+                return False
+            piece = audio[max(0, (voiced[0] - 5) * hop):(voiced[-1] + 5) * hop]
+
+        feats = _features(piece, sample_rate)
+        if len(feats) < 10:
+            return False
+        if full:
+            # слово не узнали, а места нет — вытесняем самый давно не совпадавший автошаблон
+            stale = self._stale_templates()
+            if not stale:
+                return False
+            self._drop_template(stale[0])
+            self.counts["expired"] += 1
+        self._append_template(feats, None)
+        self.counts["enrolled"] += 1
+        if self.templates_dir:
+            try:
+                self.templates_dir.mkdir(parents=True, exist_ok=True)
+                path = self.templates_dir / f"auto-{int(time.time() * 1000)}.wav"
+                path.write_bytes(float_to_wav(piece, sample_rate))
+                self._paths[-1] = path
+            except Exception as e:
+                logger.warning("KWS template save failed: %s", e)
+        logger.info("KWS: enrolled template #%d", len(self.templates))
+        return True
+
+    def stats(self) -> dict:
+        segments = self.counts["segments"]
+        return {
+            **self.counts,
+            "templates": len(self.templates),
+            "threshold": self.threshold,
+            "pass_rate": self.counts["passed"] / segments if segments else 0.0,
+            # CPU на секунду аудио — сколько стоит гейт по сравнению с полным ASR
+            "cpu_ms_per_audio_sec": 1000 * self.cpu_sec / self.audio_sec if self.audio_sec else 0.0,
+        }
+
+
+def evaluate(
+        spotter: KeywordSpotter,
+        positives: Iterable[tuple[np.ndarray, int]],
+        negatives: Iterable[tuple[np.ndarray, int]],
+) -> dict:
+    """False reject — пропущенные «Маша», false accept — разбуженный ASR на чужом звуке."""
+    pos = [spotter.detect(a, sr).detected for a, sr in positives]
+    neg = [spotter.detect(a, sr).detected for a, sr in negatives]
+    return {
+        "positives": len(pos),
+        "negatives": len(neg),
+        "false_reject_rate": pos.count(False) / len(pos) if pos else 0.0,
+        "false_accept_rate": neg.count(True) / len(neg) if neg else 0.0,
+        "threshold": spotter.threshold,
+        "cpu_ms_per_audio_sec": spotter.stats()["cpu_ms_per_audio_sec"],
+    }
+
+
+def _load_dir(path: Path) -> list[tuple[np.ndarray, int]]:
+    return [wav_to_float(p.read_bytes()) for p in sorted(path.glob("*.wav"))]
+
+
+def _main() -> None:
+    """
+    python -m core.kws <набор>: в наборе templates/, positive/, negative/ с WAV (16 кГц, моно).
+    """
+    import sys
+
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else "kws_eval")
+    spotter = KeywordSpotter(templates_dir=root / "templates")
+    report = evaluate(spotter, _load_dir(root / "positive"), _load_dir(root / "negative"))
+    print(" ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in report.items()))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+# действия, из которых в одном ходе имеет смысл только последнее
+OVERRIDE_GROUPS = (
+    frozenset({"mute", "un_mute"}),
+    frozenset({"play_media", "pause_media"}),
+)
+
+VOLUME_ACTIONS = frozenset({"set_volume", "change_volume"})
+
+
+@dataclass
+class PlannedStep:
+    """Одно реальное выполнение; origins — индексы исходных интентов, которые оно покрывает."""
+    action: str
+    args: dict[str, Any]
+    origins: list[int] = field(default_factory=list)
+
+
+@dataclass
+class TurnPlan:
+    steps: list[PlannedStep]
+    # индекс интента -> действие, которое его перекрыло
+    overridden: dict[int, str] = field(default_factory=dict)
+
+
+def _volume_arg(action: str, args: dict) -> int | None:
+    """Число из level/delta как его пишет LLM (50, 50.0, "50", "+10", "50%"); None — не число."""
+    value = args.get("level" if action == "set_volume" else "delta")
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        return int(float(value))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _fold_volume(intents: list[tuple[str, dict]], indices: list[int]) -> PlannedStep:
+    level: int | None = None
+    delta = 0
+    for i in indices:
+        action, args = intents[i]
+        value = _volume_arg(action, args)
+        if action == "set_volume":
+            level = value
+            delta = 0
+        else:
+            delta += value
+
+    if level is not None:
+        return PlannedStep("set_volume", {"level": max(0, min(100, level + delta))}, list(indices))
+    return PlannedStep("change_volume", {"delta": delta}, list(indices))
+
+
+def plan_turn(intents: list[tuple[str, dict]]) -> TurnPlan:
+    """
+    Планирует ход перед выполнением:
+    - подряд идущие set_volume/change_volume сворачиваются в один шаг (одна пара get/set вместо N);
+      серии, разделённые другим действием («громкость 20, открой Музыку, громкость 60»), не сливаются;
+    - несколько add_remind — в один add_reminds (один запуск AppleScript);
+    - из mute/un_mute, play/pause остаётся только последнее.
+    Остальные интенты идут как есть, в исходном порядке.
+    """
+    intents = [(action, args or {}) for action, args in intents]
+    plan = TurnPlan(steps=[])
+
+    last_in_group: dict[frozenset, int] = {}
+    for i, (action, _) in enumerate(intents):
+        for group in OVERRIDE_GROUPS:
+            if action in group:
+                last_in_group[group] = i
+
+    volume_runs: list[list[int]] = []
+    remind_idx: list[int] = []
+    for i, (action, args) in enumerate(intents):
+        if action in VOLUME_ACTIONS and _volume_arg(action, args) is not None:
+            # непонятные аргументы не сворачиваем — такой интент выполнится сам и упадёт отдельно
+            if volume_runs and volume_runs[-1][-1] == i - 1:
+                volume_runs[-1].append(i)
+            else:
+                volume_runs.append([i])
+        elif action == "add_remind":
+            remind_idx.append(i)
+
+    # первый индекс серии -> свёрнутый шаг; остальные индексы серии в него вошли
+    volume_steps = {run[0]: _fold_volume(intents, run) for run in volume_runs if len(run) > 1}
+    folded = {i for run in volume_runs if len(run) > 1 for i in run}
+    remind_step = None
+    if len(remind_idx) > 1:
+        remind_step = PlannedStep(
+            "add_reminds",
+            {"items": [intents[i][1] for i in remind_idx]},
+            list(remind_idx),
+        )
+
+    for i, (action, args) in enumerate(intents):
+        group = next((g for g in OVERRIDE_GROUPS if action in g), None)
+        if group is not None and last_in_group[group] != i:
+            plan.overridden[i] = intents[last_in_group[group]][0]
+            continue
+        if i in folded:
+            if i in volume_steps:
+                plan.steps.append(volume_steps[i])
+            continue
+        if remind_step and i in remind_idx:
+            if i == remind_idx[0]:
+                plan.steps.append(remind_step)
+            continue
+        plan.steps.append(PlannedStep(action, args, [i]))
+
+    return plan
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import re
+
+# конец предложения: знак + пробел после него (или перевод строки)
+_SENTENCE_RE = re.compile(r"[.!?…]+(?=\s)|\n+")
+# граница клаузы: запятая/точка с запятой/двоеточие, тире, либо перед союзом
+_CLAUSE_RE = re.compile(
+    r"[,;:](?=\s)|\s[—–-](?=\s)|(?<=\S)(?=\s+(?:и|а|но|или|однако|чтобы|потому что)\s)",
+    re.IGNORECASE,
+)
+# сколько символов назад пересканировать, чтобы поймать границы на стыке чанков
+_OVERLAP = 16
+
+
+class PhraseSegmenter:
+    """
+    Режет поток токенов LLM на фразы для TTS.
+    Первая фраза ответа уходит как можно раньше — на первой границе клаузы после first_min_chars;
+    дальше целевая длина растёт (x growth до max_chars), и режем по концам предложений —
+    так интонация ровнее, а озвучка уже идёт и не ждёт.
+    Буфер сканируется инкрементально: каждый символ проходит регулярки O(1) раз.
+    """
+
+    def __init__(
+            self,
+            first_min_chars: int = 24,
+            min_chars: int = 10,
+            growth: float = 1.5,
+            max_chars: int = 160,
+    ):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.growth = growth
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self):
+        self._buf = ""
+        self._scanned = 0
+        self._sentences: list[int] = []
+        self._clauses: list[int] = []
+        self.emitted = 0
+        self._target = self.min_chars
+
+    @property
+    def pending(self) -> str:
+        return self._buf
+
+    def _scan(self):
+        start = max(0, self._scanned - _OVERLAP)
+        region = self._buf[start:]
+        for m in _SENTENCE_RE.finditer(region):
+            pos = start + m.end()
+            if pos > self._scanned - _OVERLAP and pos not in self._sentences:
+                self._sentences.append(pos)
+        for m in _CLAUSE_RE.finditer(region):
+            pos = start + m.end()
+            if pos > self._scanned - _OVERLAP and pos not in self._clauses:
+                self._clauses.append(pos)
+        self._sentences.sort()
+        self._clauses.sort()
+        self._scanned = len(self._buf)
+
+    def _pick(self) -> int | None:
+        def _first_fit(candidates: list[int], min_len: int) -> int | None:
+            for pos in candidates:
+                if len(self._buf[:pos].strip()) >= min_len:
+                    return pos
+            return None
+
+        if self.emitted == 0:
+            return _first_fit(sorted(self._sentences + self._clauses), self.first_min_chars) \
+                or _first_fit(self._sentences, self.min_chars)
+
+        pos = _first_fit(self._sentences, self._target)
+        if pos is None and len(self._buf) > 2 * self._target:
+            # длинное предложение без точки — не копим бесконечно, режем по клаузе
+            pos = _first_fit(self._clauses, self._target)
+        return pos
+
+    def _cut(self, pos: int) -> str:
+        phrase = " ".join(self._buf[:pos].split())
+        self._buf = self._buf[pos:]
+        self._scanned = max(0, self._scanned - pos)
+        self._sentences = [p - pos for p in self._sentences if p > pos]
+        self._clauses = [p - pos for p in self._clauses if p > pos]
+        self.emitted += 1
+        base = self.first_min_chars if self.emitted == 1 else self._target
+        self._target = min(self.max_chars, int(base * self.growth))
+        return phrase
+
+    def feed(self, chunk: str) -> list[str]:
+        if not chunk:
+            return []
+        self._buf += chunk
+        self._scan()
+
+        out = []
+        while True:
+            pos = self._pick()
+            if pos is None:
+                break
+            phrase = self._cut(pos)
+            if phrase:
+                out.append(phrase)
+        return out
+
+    def flush(self, final: bool = True) -> str | None:
+        """
+        Отдаёт хвост (если он не слишком короткий).
+        final=True — высказывание закончено, следующая фраза снова считается первой.
+        """
+        tail = " ".join(self._buf.split()).strip()
+        emitted, target = self.emitted, self._target
+        self.reset()
+        if not final and tail:
+            self.emitted, self._target = emitted + 1, target
+        if tail and len(tail) >= self.min_chars:
+            return tail
+        return None
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+from core.compute import Workload, default_governor
+
+logger = logging.getLogger(__name__)
+
+
+def find_pause(audio: np.ndarray, sample_rate: int, min_gap_sec: float = 0.2) -> int | None:
+    """Середина последней паузы (>= min_gap_sec) внутри audio, в сэмплах; None — пауз нет."""
+    hop = int(sample_rate * 0.02)
+    n = len(audio) // hop
+    if n < 3:
+        return None
+    frames = audio[:n * hop].reshape(n, hop).astype(np.float32)
+    level = 10 * np.log10((frames ** 2).mean(axis=1) + 1e-10)
+    # порог от нижних 5 % уровней — это шумовой пол записи
+    quiet = np.concatenate(([0], (level < np.percentile(level, 5) + 8).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(quiet))
+    starts, ends = edges[0::2], edges[1::2]
+    ok = (starts > 0) & (ends - starts >= max(1, int(min_gap_sec / 0.02)))
+    if not ok.any():
+        return None
+    i = np.flatnonzero(ok)[-1]
+    return int((starts[i] + ends[i]) // 2) * hop
+
+
+class StreamingTranscriber:
+    """
+    Распознавание, пока пользователь ещё говорит.
+    Каждые interval_sec незакоммиченный хвост (от committed_pos до текущего конца) прогоняется
+    через ASR — окна перекрываются, гипотеза отдаётся в on_partial. Когда хвост длиннее commit_sec,
+    его начало до последней паузы распознаётся окончательно и больше не пересчитывается.
+    finish() после конца записи декодирует только оставшийся хвост — ожидание после речи
+    определяется длиной хвоста, а не всей фразы.
+    """
+
+    def __init__(
+            self,
+            recognizer,
+            source: Callable[[int], np.ndarray],
+            sample_rate: int = 16000,
+            on_partial: Callable[[str], None] | None = None,
+            interval_sec: float = 0.8,
+            commit_sec: float = 4.0,
+            max_window_sec: float = 10.0,
+    ):
+        self.recognizer = recognizer
+        # source(pos) -> float32-сэмплы с позиции pos до текущего конца записи;
+        # source.release(), если есть, вызывается, когда запись больше не читается
+        self.source = source
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.interval_sec = interval_sec
+        self.commit_sec = commit_sec
+        self.max_window_sec = max_window_sec
+
+        self.committed_text = ""
+        self.committed_pos = 0
+        self.partial = ""
+        self._asr_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._cancelled = False
+        self._thread: threading.Thread | None = None
+        self.passes: deque[float] = deque(maxlen=100)
+        self.final_sec: float | None = None
+
+    def start(self) -> "StreamingTranscriber":
+        self._thread = threading.Thread(target=self._loop, name="streaming-asr", daemon=True)
+        self._thread.start()
+        return self
+
+    def _transcribe(self, audio: np.ndarray) -> str:
+        if len(audio) < self.sample_rate * 0.3:
+            return ""
+        t0 = time.perf_counter()
+        with self._asr_lock, default_governor().slot(Workload.COMMAND_ASR):
+            text = self.recognizer.transcribe(audio, self.sample_rate)
+        self.passes.append(time.perf_counter() - t0)
+        return (text or "").strip()
+
+    @staticmethod
+    def _join(*parts: str) -> str:
+        return " ".join(p for p in parts if p).strip()
+
+    def _commit(self, tail: np.ndarray) -> np.ndarray:
+        """Фиксирует начало хвоста до паузы; возвращает то, что осталось незакоммиченным."""
+        sr = self.sample_rate
+        if len(tail) < self.commit_sec * sr:
+            return tail
+        cut = find_pause(tail[:-int(0.3 * sr)], sr)
+        if cut is None:
+            if len(tail) < self.max_window_sec * sr:
+                return tail
+            cut = int(self.commit_sec * sr)  # длинная речь без пауз — режем принудительно
+        text = self._transcribe(tail[:cut])
+        self.committed_text = self._join(self.committed_text, text)
+        self.committed_pos += cut
+        return tail[cut:]
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_sec):
+            try:
+                tail = self._commit(self.source(self.committed_pos))
+                if self._stop.is_set():
+                    break
+                hyp = self._transcribe(tail)
+                self.partial = self._join(self.committed_text, hyp)
+                if self.on_partial and self.partial and not self._stop.is_set():
+                    self.on_partial(self.partial)
+            except Exception as e:
+                logger.warning("Streaming ASR pass failed: %s", e)
+        if self._cancelled:
+            self._release()
+
+    def _release(self):
+        release = getattr(self.source, "release", None)
+        if release is not None:
+            release()
+
+    def finish(self) -> str:
+        """Останавливает промежуточные проходы и декодирует только хвост после последнего коммита."""
+        t0 = time.perf_counter()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            tail = self.source(self.committed_pos)
+            text = self._join(self.committed_text, self._transcribe(tail))
+        finally:
+            self._release()
+        self.final_sec = time.perf_counter() - t0
+        logger.info("Streaming ASR: final pass %.2f s, tail %.1f s, %d partial passes",
+                    self.final_sec, len(tail) / self.sample_rate, len(self.passes))
+        return text
+
+    def cancel(self):
+        """Бросает распознавание; запись отпускается, когда фоновый проход закончится."""
+        self._cancelled = True
+        self._stop.set()
+        if self._thread is None or not self._thread.is_alive():
+            self._release()
@@ -1,13 +1,19 @@
+import logging
 import queue
-import re
 import subprocess
 import threading
 import time
+from collections import deque
 
-import sounddevice as sd
-import torch
+from core.audio_out import RingBufferOutput
+from core.compute import ComputeGovernor, Workload, default_governor
+from core.segmenter import PhraseSegmenter
+from core.tts_backends import TTSBackend, TorchTTSBackend
+from core.tts_model import TTSModelLoader
+from core.tts_cache import TTSAudioCache
+
+logger = logging.getLogger(__name__)
 
-_END_RE = re.compile(r"[.!?…]+(\s|$)|\n+")
 
 
 def _get_output_volume() -> int | None:
@@ -65,6 +71,11 @@ class VolumeDucker:
 
 
 class SileroTTSStreamer:
+    """
+    Двухстадийный конвейер: поток синтеза кладёт готовое аудио в ограниченную очередь,
+    поток воспроизведения её вычитывает. Пока играет фраза N, синтезируется N+1.
+    """
+
     def __init__(
             self,
             speaker: str = "kseniya",
@@ -72,76 +83,241 @@ class SileroTTSStreamer:
             min_chars: int = 10,
             debug: bool = False,
             auto_flush_sec: float = 1.5,
+            first_chunk_chars: int = 24,
+            first_flush_sec: float = 0.4,
             block_output: bool = True,
             duck_other_audio: bool = True,
             duck_volume: int = 20,
+            prefetch: int = 2,
+            batch_threshold: int = 3,
+            max_batch: int = 4,
+            cache: TTSAudioCache | None = None,
+            prewarm_phrases: list[str] | tuple[str, ...] = (),
+            model_loader: TTSModelLoader | None = None,
+            backend: TTSBackend | None = None,
+            governor: ComputeGovernor | None = None,
     ):
         self.speaker = speaker
         self.sample_rate = sample_rate
         self.min_chars = min_chars
         self.debug = debug
         self.auto_flush_sec = auto_flush_sec
+        self.first_flush_sec = first_flush_sec
         self.block_output = block_output
+        # при очереди >= batch_threshold фраз синтезируем до max_batch за один вызов модели
+        self.batch_threshold = batch_threshold
+        self.max_batch = max_batch
         self._duck = VolumeDucker(target_volume=duck_volume) if duck_other_audio else None
         self._ducked = False
 
-        self.model, _ = torch.hub.load(
-            repo_or_dir="snakers4/silero-models",
-            model="silero_tts",
-            language="ru",
-            speaker="v3_1_ru",
-        )
+        # модель грузится в фоне из локального артефакта; первый синтез дождётся её
+        self.backend = (backend or TorchTTSBackend(model_loader or TTSModelLoader.from_env({}))).start()
 
-        self._buf = ""
-        self._last_push = time.time()
+        self.cache = cache
+        self._model_lock = threading.Lock()
+        self.governor = governor or default_governor()
+        if cache is not None and prewarm_phrases:
+            cache.prewarm(prewarm_phrases, self._synthesize_uncached, self._cache_voice, self.sample_rate)
 
-        self._q: "queue.Queue[str | None]" = queue.Queue()
+        self._segmenter = PhraseSegmenter(first_min_chars=first_chunk_chars, min_chars=min_chars)
+        self._seg_lock = threading.Lock()
+        self._last_push = time.time()
+        # время первого push текущего ответа — для time-to-first-audio
+        self._first_push_at: float | None = None
+        self._first_audio: deque[float] = deque(maxlen=200)
+
+        # текст -> синтез: (текст, время постановки); None — остановка
+        self._q: "queue.Queue[tuple[str, float] | None]" = queue.Queue()
+        # синтез -> воспроизведение: (поколение, аудио, время постановки текста)
+        self._audio_q: "queue.Queue[tuple[int, object, float] | None]" = queue.Queue(maxsize=max(1, prefetch))
+        # interrupt() увеличивает поколение — всё, что синтезировано раньше, выбрасывается
+        self._gen = 0
         self._stop = threading.Event()
         self._muted = False
         self._shutdown = threading.Event()
 
+        self._out = RingBufferOutput(sample_rate)
+        self._gaps: deque[float] = deque(maxlen=200)
+        self._depths: deque[int] = deque(maxlen=200)
+        # (символов, секунд синтеза, фраз в вызове) — пропускная способность синтеза
+        self._synth_runs: deque[tuple[int, float, int]] = deque(maxlen=500)
+
         self._worker = threading.Thread(target=self._run, daemon=True)
         self._worker.start()
 
+        self._player = threading.Thread(target=self._play_loop, daemon=True)
+        self._player.start()
+
         self._ticker = threading.Thread(target=self._auto_flush_loop, daemon=True)
         self._ticker.start()
 
+    def _take_backlog(self, limit: int) -> list:
+        items = []
+        while len(items) < limit:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            if item is None:
+                break
+        return items
+
     def _run(self):
-        while not self._shutdown.is_set():
-            text = self._q.get()
-            if text is None:
+        while True:
+            batch = [self._q.get()]
+            # батч держит слот дольше — не собираем его, если ждёт распознавание команды
+            if (batch[0] is not None and self.batch_threshold and self._q.qsize() >= self.batch_threshold
+                    and not self.governor.pending_higher(Workload.TTS)):
+                batch += self._take_backlog(self.max_batch - 1)
+            stop = batch[-1] is None
+            items = [item for item in batch if item is not None]
+
+            gen = self._gen
+            texts = [(text.strip(), queued_at) for text, queued_at in items]
+            texts = [(text, queued_at) for text, queued_at in texts if text]
+            if texts and not self._muted:
+                try:
+                    audios = self._synthesize_many([text for text, _ in texts])
+                except Exception as e:
+                    logger.error("TTS synthesis failed: %s", e)
+                    audios = []
+                for (_, queued_at), audio in zip(texts, audios):
+                    if gen != self._gen or self._muted:
+                        break
+                    if audio is not None:  # None — фраза вошла в неразрезанный батч соседа
+                        self._put_audio((gen, audio, queued_at))
+
+            for _ in batch:
                 self._q.task_done()
+            if stop:
+                self._audio_q.put(None)
                 break
 
-            text = text.strip()
-            if not text:
-                self._q.task_done()
+    @property
+    def _cache_voice(self) -> str:
+        # аудио другой модели (TTS_MODEL_ID) или квантованной модели звучит иначе — кэшируем отдельно
+        voice = f"{self.backend.model_id}-{self.speaker}"
+        if self.backend.name == TorchTTSBackend.name:
+            return voice
+        return f"{voice}-{self.backend.name}"
+
+    def _synthesize_uncached(self, text: str):
+        self.backend.wait_ready()
+        t0 = time.perf_counter()
+        with self.governor.slot(Workload.TTS), self._model_lock:
+            audio = self.backend.synthesize(text, self.speaker, self.sample_rate)
+        self._synth_runs.append((len(text), time.perf_counter() - t0, 1))
+        return audio
+
+    def _synthesize_many(self, texts: list[str]) -> list:
+        """
+        Аудио по каждой фразе: из кэша, одним батчем для нескольких промахов подряд или по одной.
+        None на месте фразы — её звук уже в неразрезанном батче на месте предыдущей.
+        """
+        voice = self._cache_voice
+        out: list = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            cached = self.cache.get(voice, self.sample_rate, text) if self.cache is not None else None
+            if cached is not None:
+                out[i] = cached
+            else:
+                missing.append(i)
+
+        # батчем синтезируются только подряд идущие промахи: если батч не разрежется, он играет
+        # одним куском и не должен перепрыгнуть через фразу из кэша
+        runs: list[list[int]] = []
+        for i in missing:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+
+        for run in runs:
+            audios = self._synthesize_batch([texts[i] for i in run]) if len(run) > 1 else None
+            # куски батча режутся по тишине и могут съехать на соседнюю фразу — в кэш их не кладём
+            from_batch = audios is not None
+            if audios is None:
+                audios = [self._synthesize_uncached(texts[i]) for i in run]
+            if len(audios) != len(run):
+                # не разрезалось: весь батч — на месте первой фразы
+                logger.debug("TTS batch split failed, playing %d phrases as one clip", len(run))
+                out[run[0]] = audios[0]
+                continue
+            for i, audio in zip(run, audios):
+                out[i] = audio
+                if self.cache is not None and not from_batch:
+                    self.cache.put(voice, self.sample_rate, texts[i], audio)
+        return out
+
+    def _synthesize_batch(self, batch: list[str]) -> list | None:
+        self.backend.wait_ready()
+        t0 = time.perf_counter()
+        with self.governor.slot(Workload.TTS), self._model_lock:
+            audios = self.backend.synthesize_batch(batch, self.speaker, self.sample_rate)
+        if audios is not None:
+            # прогон учитывается и когда разрезать не вышло — время модели потрачено
+            self._synth_runs.append((sum(map(len, batch)), time.perf_counter() - t0, len(batch)))
+        return audios
+
+    def _put_audio(self, item):
+        # очередь ограничена: ждём места, но не дольше, чем живёт текущее поколение
+        gen = item[0]
+        while not self._shutdown.is_set() and gen == self._gen:
+            try:
+                self._audio_q.put(item, timeout=0.1)
+                return
+            except queue.Full:
                 continue
 
-            if self._muted:
-                self._q.task_done()
+    def _play_loop(self):
+        while True:
+            item = self._audio_q.get()
+            if item is None:
+                self._audio_q.task_done()
+                break
+
+            gen, audio, queued_at = item
+            if gen != self._gen or self._muted:
+                self._audio_q.task_done()
                 continue
 
             if self._duck and not self._ducked:
                 self._duck.duck()
                 self._ducked = True
 
-            audio = self.model.apply_tts(
-                text=text,
-                speaker=self.speaker,
-                sample_rate=self.sample_rate,
-            )
+            self._depths.append(self._audio_q.qsize())
+            dry_at = self._out.drained_at
+            if dry_at is not None and queued_at <= dry_at:
+                # фраза была готова к моменту, когда кольцо опустело — это «дыра» между фразами
+                self._gaps.append(time.time() - dry_at)
 
-            sd.play(audio, self.sample_rate)
-            if self.block_output:
-                sd.wait()
-            self._q.task_done()
+            first_push = self._first_push_at
+            if first_push:
+                self._first_audio.append(time.time() - first_push)
+                # 0.0 — замер для этого ответа уже сделан, до close()/interrupt()
+                self._first_push_at = 0.0
+
+            try:
+                self._out.write(audio, keep_going=lambda g=gen: g == self._gen and not self._muted)
+            except Exception as e:
+                logger.error("TTS playback failed: %s", e)
+            self._audio_q.task_done()
 
     def _auto_flush_loop(self):
         while not self._stop.is_set():
-            time.sleep(0.2)
-            if self._buf and (time.time() - self._last_push) >= self.auto_flush_sec:
-                self._flush_internal()
+            time.sleep(0.1)
+            with self._seg_lock:
+                pending = self._segmenter.pending.strip()
+                first = self._segmenter.emitted == 0
+            if not pending:
+                continue
+            idle = time.time() - self._last_push
+            # первая фраза ответа ждёт паузы гораздо меньше — это и есть время до первого звука
+            if idle >= self.auto_flush_sec or (first and idle >= self.first_flush_sec
+                                               and len(pending) >= self.min_chars):
+                self._flush_internal(final=False)
 
     def push(self, chunk: str):
         if not chunk or self._shutdown.is_set():
@@ -150,54 +326,98 @@ class SileroTTSStreamer:
         if self._muted:
             return
 
-        self._buf += chunk
         self._last_push = time.time()
-        while True:
-            m = _END_RE.search(self._buf)
-            if not m:
-                break
-
-            end = m.end()
-            phrase = self._buf[:end]
-            rest = self._buf[end:]
-
-            normalized = " ".join(phrase.split())
-            if len(normalized) >= self.min_chars:
-                self._q.put(normalized)
-                self._buf = rest
-            else:
-                break
-
-    def _flush_internal(self):
-        tail = " ".join(self._buf.split()).strip()
-        self._buf = ""
-        if tail and len(tail) >= self.min_chars:
-            self._q.put(tail)
+        if self._first_push_at is None:
+            self._first_push_at = self._last_push
+        with self._seg_lock:
+            phrases = self._segmenter.feed(chunk)
+        for phrase in phrases:
+            self._q.put((phrase, time.time()))
+
+    def _flush_internal(self, final: bool = True):
+        with self._seg_lock:
+            tail = self._segmenter.flush(final=final)
+        if tail:
+            self._q.put((tail, time.time()))
 
     def flush(self):
         self._flush_internal()
 
-    def interrupt(self):
-        try:
-            sd.stop()
-        except Exception:
-            pass
-
-        self._buf = ""
+    @staticmethod
+    def _drain(q: queue.Queue):
         while True:
             try:
-                self._q.get_nowait()
+                item = q.get_nowait()
             except queue.Empty:
                 break
-            finally:
-                try:
-                    self._q.task_done()
-                except ValueError:
-                    pass
+            try:
+                q.task_done()
+            except ValueError:
+                pass
+            if item is None:
+                # сигнал остановки не теряем
+                q.put(None)
+                break
+
+    def silence(self):
+        """
+        Мгновенно глушит звук: новое поколение и пустое кольцо, без блокировок и подпроцессов —
+        можно звать из аудиоколбэка. Очереди, сегментер и дакинг дочищает interrupt().
+        """
+        self._gen += 1
+        self._out.clear()
+
+    def interrupt(self):
+        self.silence()
+
+        with self._seg_lock:
+            self._segmenter.reset()
+        self._first_push_at = None
+        self._drain(self._q)
+        self._drain(self._audio_q)
         if self._ducked and self._duck:
             self._duck.restore()
             self._ducked = False
 
+    @property
+    def output(self) -> RingBufferOutput:
+        return self._out
+
+    @property
+    def is_speaking(self) -> bool:
+        """Звук идёт в динамик (или отзвучал меньше 0.5 с назад — хвост эха ещё в комнате)."""
+        if self._out.buffered > 0:
+            return True
+        drained = self._out.drained_at
+        return drained is not None and time.time() - drained < 0.5
+
+    def stats(self) -> dict:
+        """
+        Время от первого токена ответа до первой фразы в выходном кольце (сек),
+        паузы между фразами, глубина очереди готового аудио на момент старта фразы,
+        time-to-first-sample выходного потока и скорость синтеза (символов в секунду).
+        """
+        gaps = list(self._gaps)
+        depths = list(self._depths)
+        first = list(self._first_audio)
+        runs = list(self._synth_runs)
+        synth_chars = sum(r[0] for r in runs)
+        synth_sec = sum(r[1] for r in runs)
+        return {
+            "first_audio_avg": sum(first) / len(first) if first else 0.0,
+            "first_audio_max": max(first) if first else 0.0,
+            **{f"output_{k}": v for k, v in self._out.stats().items()},
+            **({f"cache_{k}": v for k, v in self.cache.stats().items()} if self.cache else {}),
+            "gap_avg": sum(gaps) / len(gaps) if gaps else 0.0,
+            "gap_max": max(gaps) if gaps else 0.0,
+            "gaps": len(gaps),
+            "queue_depth_avg": sum(depths) / len(depths) if depths else 0.0,
+            "queue_depth_max": max(depths) if depths else 0,
+            "synth_chars_per_sec": synth_chars / synth_sec if synth_sec else 0.0,
+            "synth_calls": len(runs),
+            "batched_phrases": sum(r[2] for r in runs if r[2] > 1),
+        }
+
     def mute(self):
         self._muted = True
         self.interrupt()
@@ -209,8 +429,15 @@ class SileroTTSStreamer:
         if wait:
             self.flush()
             self._q.join()
+            self._audio_q.join()
+            if self.block_output:
+                gen = self._gen
+                self._out.wait_drained(keep_going=lambda: gen == self._gen)
+            if self.debug:
+                logger.info("TTS pipeline stats: %s", self.stats())
         else:
             self.interrupt()
+        self._first_push_at = None
         if self._ducked and self._duck:
             self._duck.restore()
             self._ducked = False
@@ -222,8 +449,10 @@ class SileroTTSStreamer:
         self._q.put(None)
         try:
             self._q.join()
+            self._audio_q.join()
         except Exception:
             pass
+        self._out.close()
         if self._ducked and self._duck:
             self._duck.restore()
             self._ducked = False
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import copy
+import html
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+import numpy as np
+import torch
+
+from core.audio_out import as_float32
+from core.tts_model import TTSModelLoader
+
+logger = logging.getLogger(__name__)
+
+# Silero v3 умеет только эти частоты
+SUPPORTED_SAMPLE_RATES = (8000, 24000, 48000)
+
+BENCH_PHRASES = (
+    "Привет. Чем могу помочь?",
+    "Поставила напоминание на завтра в девять утра.",
+    "Сегодня в Москве облачно, около пяти градусов, к вечеру возможен небольшой дождь.",
+    "Открываю Телеграм.",
+    "Громкость уменьшила до тридцати процентов, если нужно тише — скажи.",
+    "В календаре на сегодня две встречи: созвон с командой в одиннадцать и обед в час.",
+)
+
+
+def split_on_silence(
+        audio: np.ndarray,
+        sample_rate: int,
+        parts: int,
+        min_gap_sec: float = 0.25,
+        threshold: float = 0.01,
+) -> list[np.ndarray] | None:
+    """
+    Режет склеенный синтез обратно на parts фраз по самым длинным внутренним паузам.
+    None — если пауз меньше, чем нужно.
+    """
+    if parts <= 1:
+        return [audio]
+    frame = max(1, sample_rate // 100)  # 10 мс
+    n = len(audio) // frame
+    if n == 0:
+        return None
+    energy = np.abs(audio[:n * frame]).reshape(n, frame).max(axis=1)
+    silent = np.concatenate(([0], (energy < threshold).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(silent))
+    starts, ends = edges[0::2], edges[1::2]
+    # тишина в начале и в конце — не граница между фразами
+    keep = (starts > 0) & (ends < n) & (ends - starts >= int(min_gap_sec * 100))
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) < parts - 1:
+        return None
+    longest = np.sort(np.argsort(ends - starts)[::-1][:parts - 1])
+    cuts = [int((starts[i] + ends[i]) // 2) * frame for i in longest]
+    return np.split(audio, cuts)
+
+
+def set_torch_threads(num_threads: int | None) -> None:
+    """Число потоков intra-op у torch. Настройка общая на процесс — её видит и ASR."""
+    if num_threads and num_threads > 0:
+        torch.set_num_threads(int(num_threads))
+
+
+class TTSBackend(ABC):
+    """Движок синтеза: текст -> float32 моно. Потокобезопасность обеспечивает вызывающий."""
+
+    name = "base"
+
+    def __init__(self, loader: TTSModelLoader):
+        self.loader = loader
+        self.model_id = loader.model_id
+
+    def start(self) -> "TTSBackend":
+        self.loader.start()
+        return self
+
+    def wait_ready(self) -> None:
+        """Ждёт загрузку модели. Вызывать до слота ComputeGovernor: загрузка (и скачивание) — не инференс."""
+        self.loader.get()
+
+    @abstractmethod
+    def synthesize(self, text: str, speaker: str, sample_rate: int) -> np.ndarray:
+        ...
+
+    def synthesize_batch(
+            self, texts: list[str], speaker: str, sample_rate: int
+    ) -> list[np.ndarray] | None:
+        """
+        Несколько фраз за один вызов модели: аудио по каждой фразе, а если разрезать не вышло —
+        [всё аудио одним куском] (синтез не выбрасывается). None — бэкенд батчи не умеет.
+        """
+        return None
+
+
+class TorchTTSBackend(TTSBackend):
+    """Eager-модель Silero как есть."""
+
+    name = "torch"
+
+    def _model(self):
+        return self.loader.get()
+
+    def synthesize(self, text: str, speaker: str, sample_rate: int) -> np.ndarray:
+        with torch.inference_mode():
+            audio = self._model().apply_tts(text=text, speaker=speaker, sample_rate=sample_rate)
+        return as_float32(audio)
+
+    def synthesize_batch(
+            self, texts: list[str], speaker: str, sample_rate: int, break_ms: int = 500
+    ) -> list[np.ndarray] | None:
+        # одна SSML-строка с явными паузами между фразами, потом режем по этим паузам
+        pause = f'<break time="{break_ms}ms"/>'
+        ssml = "<speak>" + pause.join(html.escape(t, quote=False) for t in texts) + "</speak>"
+        with torch.inference_mode():
+            audio = self._model().apply_tts(ssml_text=ssml, speaker=speaker, sample_rate=sample_rate)
+        audio = as_float32(audio)
+        return split_on_silence(audio, sample_rate, len(texts), min_gap_sec=break_ms / 2000) or [audio]
+
+
+def _is_eager(module) -> bool:
+    return isinstance(module, torch.nn.Module) and not isinstance(module, torch.jit.ScriptModule)
+
+
+class QuantizedTTSBackend(TorchTTSBackend):
+    """
+    Та же модель с динамической int8-квантизацией Linear/LSTM (torch.ao.quantization.quantize_dynamic).
+    Квантуется только eager-часть. Если квантовать нечего (модель TorchScript) или квантизация упала —
+    синтез падает с RuntimeError: тихо работать как torch под именем quantized режим не должен.
+    """
+
+    name = "quantized"
+
+    def __init__(self, loader: TTSModelLoader):
+        super().__init__(loader)
+        self._quantized = None
+        self._error: RuntimeError | None = None
+        self._lock = threading.Lock()
+
+    def _model(self):
+        if self._quantized is not None:
+            return self._quantized
+        with self._lock:
+            if self._error is None and self._quantized is None:
+                try:
+                    self._quantized = self._quantize(self.loader.get())
+                except RuntimeError as e:
+                    logger.error("%s", e)
+                    self._error = e
+            if self._error is not None:
+                raise self._error
+        return self._quantized
+
+    def wait_ready(self) -> None:
+        self._model()
+
+    @staticmethod
+    def _quantize(model):
+        inner = getattr(model, "model", None)
+        if not _is_eager(inner) and not _is_eager(model):
+            raise RuntimeError("TTS model is TorchScript, TTS_BACKEND=quantized does not apply to it; "
+                               "use TTS_BACKEND=torch")
+        t0 = time.perf_counter()
+        layers = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+        try:
+            # копия: исходная float-модель общая у загрузчика и может понадобиться другому бэкенду
+            model = copy.deepcopy(model)
+            if _is_eager(inner):
+                model.model = torch.ao.quantization.quantize_dynamic(model.model, layers, dtype=torch.qint8)
+            else:
+                model = torch.ao.quantization.quantize_dynamic(model, layers, dtype=torch.qint8)
+        except Exception as e:
+            raise RuntimeError(f"TTS quantization failed: {e}") from e
+        logger.info("TTS model quantized in %.2f s", time.perf_counter() - t0)
+        return model
+
+
+TTS_BACKENDS: dict[str, type[TTSBackend]] = {
+    TorchTTSBackend.name: TorchTTSBackend,
+    QuantizedTTSBackend.name: QuantizedTTSBackend,
+}
+
+
+def make_tts_backend(name: str, loader: TTSModelLoader, num_threads: int | None = None) -> TTSBackend:
+    cls = TTS_BACKENDS.get((name or "").strip().lower())
+    if cls is None:
+        logger.warning("Unknown TTS backend %r, falling back to torch", name)
+        cls = TorchTTSBackend
+    set_torch_threads(num_threads)
+    return cls(loader)
+
+
+def backend_from_env(env: dict[str, str], loader: TTSModelLoader | None = None) -> TTSBackend:
+    # потоки синтеза (TTS_THREADS) выставляет ComputeGovernor на входе в слот TTS
+    return make_tts_backend(
+        env.get("TTS_BACKEND", "").strip() or TorchTTSBackend.name,
+        loader or TTSModelLoader.from_env(env),
+    )
+
+
+def sample_rate_from_env(env: dict[str, str], default: int = 24000) -> int:
+    raw = env.get("TTS_SAMPLE_RATE", "").strip()
+    rate = int(raw) if raw.isdigit() else default
+    if rate not in SUPPORTED_SAMPLE_RATES:
+        logger.warning("Unsupported TTS_SAMPLE_RATE=%s, using %d", raw, default)
+        return default
+    return rate
+
+
+def benchmark(
+        backend: TTSBackend,
+        phrases: Iterable[str] = BENCH_PHRASES,
+        speaker: str = "kseniya",
+        sample_rate: int = 24000,
+) -> dict:
+    """Real-time factor: время синтеза / длительность аудио (меньше 1 — быстрее реального времени)."""
+    phrases = list(phrases)
+    backend.synthesize(phrases[0], speaker, sample_rate)  # прогрев
+    synth = 0.0
+    audio_sec = 0.0
+    for phrase in phrases:
+        t0 = time.perf_counter()
+        audio = backend.synthesize(phrase, speaker, sample_rate)
+        synth += time.perf_counter() - t0
+        audio_sec += len(audio) / sample_rate
+    return {
+        "backend": backend.name,
+        "sample_rate": sample_rate,
+        "threads": torch.get_num_threads(),
+        "phrases": len(phrases),
+        "synth_sec": synth,
+        "audio_sec": audio_sec,
+        "rtf": synth / audio_sec if audio_sec else 0.0,
+    }
+
+
+def _bench() -> None:
+    from tools.env_tools import read_env
+
+    env = read_env(".env")
+    loader = TTSModelLoader.from_env(env)
+    threads = env.get("TTS_THREADS", "").strip()
+    for rate in (24000, 48000):
+        for name in TTS_BACKENDS:
+            backend = make_tts_backend(name, loader, num_threads=int(threads) if threads else None)
+            try:
+                r = benchmark(backend, sample_rate=rate)
+            except RuntimeError as e:
+                print(f"{name:>9} {rate:>5} Hz unavailable: {e}")
+                continue
+            print(f"{r['backend']:>9} {r['sample_rate']:>5} Hz threads={r['threads']} "
+                  f"audio={r['audio_sec']:.1f}s synth={r['synth_sec']:.2f}s rtf={r['rtf']:.3f}")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# фразы, которые Маша говорит постоянно — их стоит синтезировать заранее
+DEFAULT_PREWARM_PHRASES = (
+    "Привет. Чем могу помочь?",
+    "Готово.",
+    "Сделала.",
+    "Поставила напоминание.",
+    "Открываю.",
+    "Секунду.",
+    "Не получилось.",
+    "Не поняла, повтори, пожалуйста.",
+)
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(text.split()).strip().casefold()
+
+
+class TTSAudioCache:
+    """
+    Кэш синтезированного аудио по (speaker, sample_rate, нормализованный текст); speaker —
+    голос вместе с моделью (v3_1_ru-kseniya), чтобы смена TTS_MODEL_ID не отдавала старое аудио.
+    В памяти — LRU, ограниченный по байтам; на диске (опционально) — int16 PCM в .npy, тоже LRU
+    с лимитом max_disk_bytes. На диск попадают только фразы, которые повторяются: прогретые
+    (prewarm) и те, что понадобились persist_after раз, — разовые фразы ответов LLM живут в памяти.
+    """
+
+    def __init__(
+            self,
+            max_bytes: int = 64 * 1024 * 1024,
+            disk_dir: str | Path | None = None,
+            max_disk_bytes: int = 256 * 1024 * 1024,
+            persist_after: int = 2,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self.persist_after = persist_after
+
+        self._mem: OrderedDict[tuple[str, int, str], np.ndarray] = OrderedDict()
+        self._bytes = 0
+        # сколько раз фраза понадобилась (синтез или попадание), пока она в памяти
+        self._uses: dict[tuple[str, int, str], int] = {}
+        # файлы на диске от давно не нужных к свежим: путь -> размер
+        self._disk: OrderedDict[Path, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            files = []
+            for path in self.disk_dir.glob("*.npy"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, path, st.st_size))
+            for _, path, size in sorted(files):
+                self._disk[path] = size
+                self._disk_bytes += size
+            self._evict_disk()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(speaker: str, sample_rate: int, text: str) -> tuple[str, int, str]:
+        return speaker, int(sample_rate), normalize_phrase(text)
+
+    def _path(self, key: tuple[str, int, str]) -> Path | None:
+        if not self.disk_dir:
+            return None
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return self.disk_dir / f"{key[0]}-{key[1]}-{digest}.npy"
+
+    def _remember(self, key, audio: np.ndarray):
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._mem[key] = audio
+            self._bytes += audio.nbytes
+            while self._bytes > self.max_bytes and len(self._mem) > 1:
+                evicted_key, evicted = self._mem.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._uses.pop(evicted_key, None)
+
+    def _use(self, key) -> int:
+        with self._lock:
+            self._uses[key] = self._uses.get(key, 0) + 1
+            return self._uses[key]
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            path, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("TTS cache evict failed (%s): %s", path, e)
+
+    def _touch(self, path: Path):
+        with self._lock:
+            if path in self._disk:
+                self._disk.move_to_end(path)
+        try:
+            os.utime(path)  # порядок LRU переживает перезапуск
+        except OSError:
+            pass
+
+    def _save(self, key, audio: np.ndarray):
+        path = self._path(key)
+        if path is None or path.exists():
+            return
+        try:
+            pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+            np.save(path, pcm)
+            size = path.stat().st_size
+        except Exception as e:
+            logger.warning("TTS cache write failed (%s): %s", path, e)
+            return
+        with self._lock:
+            self._disk[path] = size
+            self._disk_bytes += size
+            self._evict_disk()
+
+    def get(self, speaker: str, sample_rate: int, text: str, count: bool = True) -> np.ndarray | None:
+        key = self._key(speaker, sample_rate, text)
+        with self._lock:
+            audio = self._mem.get(key)
+            if audio is not None:
+                self._mem.move_to_end(key)
+                self.hits += count
+        if audio is not None:
+            if count and self._use(key) == self.persist_after:
+                self._save(key, audio)
+            return audio
+
+        path = self._path(key)
+        if path is not None and path.exists():
+            try:
+                pcm = np.load(path)
+                audio = pcm.astype(np.float32) / 32767.0
+                self._remember(key, audio)
+                self._touch(path)
+                with self._lock:
+                    self.disk_hits += count
+                return audio
+            except Exception as e:
+                logger.warning("TTS cache read failed (%s): %s", path, e)
+
+        with self._lock:
+            self.misses += count
+        return None
+
+    def put(self, speaker: str, sample_rate: int, text: str, audio: np.ndarray, persist: bool = False) -> None:
+        """persist=True — сразу на диск (прогрев); иначе только после persist_after обращений."""
+        key = self._key(speaker, sample_rate, text)
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self._remember(key, audio)
+        if self._use(key) >= self.persist_after or persist:
+            self._save(key, audio)
+
+    def prewarm(
+            self,
+            phrases: Iterable[str],
+            synthesize: Callable[[str], np.ndarray],
+            speaker: str,
+            sample_rate: int,
+    ) -> threading.Thread:
+        """Синтезирует недостающие фразы в фоне."""
+
+        def _run():
+            done = 0
+            for phrase in phrases:
+                if self.get(speaker, sample_rate, phrase, count=False) is not None:
+                    continue
+                try:
+                    self.put(speaker, sample_rate, phrase, synthesize(phrase), persist=True)
+                    done += 1
+                except Exception as e:
+                    logger.warning("TTS prewarm failed for %r: %s", phrase, e)
+            logger.info("TTS cache prewarmed: %d new phrases", done)
+
+        t = threading.Thread(target=_run, daemon=True)
+        t.start()
+        return t
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "bytes": self._bytes,
+                "disk_files": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
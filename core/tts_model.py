@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+import requests
+import torch
+from torch.package import PackageImporter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTS_MODEL_DIR = "models/tts"
+DEFAULT_TTS_MODEL_ID = "v3_1_ru"
+SILERO_MODEL_URL = "https://models.silero.ai/models/tts/{language}/{model_id}.pt"
+
+# форматы TorchScript-архива; всё остальное (.pt от Silero) — torch.package
+_TORCHSCRIPT_SUFFIXES = (".jit", ".ts", ".torchscript")
+
+
+def model_artifact_path(model_dir: str | Path, model_id: str, language: str = "ru") -> Path:
+    """Версия модели — часть пути: models/tts/ru/v3_1_ru.pt."""
+    return Path(model_dir) / language / f"{model_id}.pt"
+
+
+def fetch_artifact(path: Path, url: str, timeout: float = 30.0) -> None:
+    """Разовая загрузка артефакта; пишем во временный файл, чтобы обрыв не оставил битую модель."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".part")
+    t0 = time.perf_counter()
+    with requests.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        with open(tmp, "wb") as f:
+            for chunk in r.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    tmp.replace(path)
+    logger.info("TTS model downloaded to %s in %.1f s", path, time.perf_counter() - t0)
+
+
+def load_tts_model(path: str | Path, device: str = "cpu"):
+    """
+    Грузит модель из локального файла без torch.hub и без кода репозитория silero-models:
+    .pt — самодостаточный torch.package (так Silero публикует модели), .jit/.ts — TorchScript.
+    """
+    path = Path(path)
+    if path.suffix in _TORCHSCRIPT_SUFFIXES:
+        return torch.jit.load(str(path), map_location=device)
+
+    importer = PackageImporter(str(path))
+    model = importer.load_pickle("tts_models", "model")
+    model.to(torch.device(device))
+    return model
+
+
+class TTSModelLoader:
+    """
+    Ленивая/фоновая загрузка модели TTS из локального версионированного артефакта.
+    start() запускает загрузку в фоне, get() ждёт её (или грузит синхронно, если start не вызывали).
+    offline=True — никаких сетевых запросов: нет файла — ошибка с понятным текстом.
+    """
+
+    def __init__(
+            self,
+            path: str | Path,
+            url: str | None = None,
+            offline: bool = False,
+            device: str = "cpu",
+    ):
+        self.path = Path(path)
+        # имя артефакта (v3_1_ru) — версия модели; входит в ключ кэша аудио
+        self.model_id = self.path.stem
+        self.url = url
+        self.offline = offline
+        self.device = device
+        self.load_seconds: float | None = None
+
+        self._model = None
+        self._error: Exception | None = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls, env: dict[str, str]) -> "TTSModelLoader":
+        model_id = env.get("TTS_MODEL_ID", "").strip() or DEFAULT_TTS_MODEL_ID
+        language = env.get("TTS_MODEL_LANGUAGE", "").strip() or "ru"
+        path = env.get("TTS_MODEL_PATH", "").strip() or model_artifact_path(
+            env.get("TTS_MODEL_DIR", "").strip() or DEFAULT_TTS_MODEL_DIR, model_id, language
+        )
+        return cls(
+            path=path,
+            url=SILERO_MODEL_URL.format(language=language, model_id=model_id),
+            offline=env.get("TTS_OFFLINE", "0") == "1",
+            device=env.get("TTS_DEVICE", "").strip() or "cpu",
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self._model is not None
+
+    def start(self) -> "TTSModelLoader":
+        with self._lock:
+            if self._thread is None and not self._done.is_set():
+                self._thread = threading.Thread(target=self._load, name="tts-model-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self) -> None:
+        try:
+            t0 = time.perf_counter()
+            if not self.path.exists():
+                if self.offline or not self.url:
+                    raise FileNotFoundError(
+                        f"TTS model not found at {self.path} (offline mode: put the artifact there)"
+                    )
+                fetch_artifact(self.path, self.url)
+            self._model = load_tts_model(self.path, self.device)
+            self.load_seconds = time.perf_counter() - t0
+            logger.info("TTS model loaded from %s in %.2f s", self.path, self.load_seconds)
+        except Exception as e:
+            self._error = e
+            logger.error("TTS model load failed: %s", e)
+        finally:
+            self._done.set()
+
+    def get(self, timeout: float | None = None):
+        if not self._done.is_set():
+            self.start()
+            if not self._done.wait(timeout):
+                raise TimeoutError(f"TTS model is still loading ({self.path})")
+        if self._error is not None:
+            raise RuntimeError(f"TTS model unavailable: {self._error}") from self._error
+        return self._model
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class VADEvent:
+    kind: str  # speech_start | speech_end
+    # позиция в потоке (сек от начала): для start — первый речевой кадр, для end — последний
+    stream_sec: float
+    wall_time: float
+
+
+class BandMeter:
+    """
+    Мощность в речевой полосе 300–3400 Гц как средний квадрат сэмпла (окно Ханна с поправкой на его
+    энергию): уровень не зависит ни от длины блока, ни от частоты, так что блоки выхода TTS
+    и кадры микрофона можно сравнивать напрямую. Окно и маска полосы кэшируются по длине блока.
+    """
+
+    def __init__(self, sample_rate: int, low: float = 300.0, high: float = 3400.0):
+        self.sample_rate = sample_rate
+        self.low = low
+        self.high = high
+        self._setups: dict[int, tuple[np.ndarray, np.ndarray, float]] = {}
+
+    def band(self, frame: np.ndarray) -> np.ndarray:
+        """Спектр мощности в полосе; его сумма — мощность сигнала в полосе."""
+        n = len(frame)
+        setup = self._setups.get(n)
+        if setup is None:
+            freqs = np.fft.rfftfreq(n, 1.0 / self.sample_rate)
+            window = np.hanning(n).astype(np.float32)
+            # rfft — половина спектра, отсюда 2; n * sum(w^2) — Парсеваль и энергия окна
+            setup = (window, (freqs >= self.low) & (freqs <= self.high),
+                     2.0 / max(1e-12, n * float(np.dot(window, window))))
+            self._setups[n] = setup
+        window, mask, scale = setup
+        spec = np.abs(np.fft.rfft(frame * window)) ** 2
+        return spec[mask] * scale
+
+    def power(self, frame: np.ndarray) -> float:
+        return float(self.band(frame).sum())
+
+
+class FrameVAD:
+    """
+    Покадровый VAD (20 мс) для эндпоинтинга:
+    - признак — энергия в речевой полосе 300–3400 Гц (дБ) плюс спектральная плоскостность,
+      чтобы ровный шум вентилятора/улицы не считался речью;
+    - шумовой пол адаптивный: быстро опускается, медленно поднимается и обновляется только на паузах;
+    - старт речи — start_ms подряд речевых кадров, конец — end_silence_sec тишины (hangover).
+    Работает с float32 [-1, 1], чанками любой длины.
+    """
+
+    def __init__(
+            self,
+            sample_rate: int = 16000,
+            frame_ms: int = 20,
+            margin_db: float = 9.0,
+            start_ms: int = 60,
+            end_silence_sec: float = 0.6,
+            max_flatness: float = 0.45,
+            min_level_db: float = -60.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, int(end_silence_sec * 1000 / frame_ms))
+        self.max_flatness = max_flatness
+        self.min_level_db = min_level_db
+
+        freqs = np.fft.rfftfreq(self.frame, 1.0 / sample_rate)
+        self._band = (freqs >= 300) & (freqs <= 3400)
+        self._window = np.hanning(self.frame).astype(np.float32)
+        self.end_latencies: deque[float] = deque(maxlen=200)
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames = 0
+        self.floor_db: float | None = None
+        self.in_speech = False
+        self._run = 0  # подряд речевых кадров (до старта) или тихих (во время речи)
+        self._last_speech_frame = -1
+        self._last_speech_wall = 0.0
+
+    @property
+    def frame_sec(self) -> float:
+        return self.frame / self.sample_rate
+
+    def _is_speech(self, frame: np.ndarray) -> bool:
+        spec = np.abs(np.fft.rfft(frame * self._window)) ** 2
+        band = spec[self._band] + 1e-12
+        level = 10 * np.log10(band.sum() / self.frame + 1e-12)
+        flatness = float(np.exp(np.log(band).mean()) / band.mean())
+
+        if self.floor_db is None:
+            self.floor_db = level
+        speech = (level > self.floor_db + self.margin_db and level > self.min_level_db
+                  and flatness < self.max_flatness)
+        if not speech:
+            # вниз быстро, вверх медленно — короткие громкие звуки пол не задирают
+            rate = 0.3 if level < self.floor_db else 0.02
+            self.floor_db += rate * (level - self.floor_db)
+        return speech
+
+    def process(self, chunk: np.ndarray) -> list[VADEvent]:
+        data = np.concatenate([self._pending, np.asarray(chunk, dtype=np.float32).reshape(-1)])
+        n = len(data) // self.frame
+        self._pending = data[n * self.frame:]
+        now = time.time()
+
+        events: list[VADEvent] = []
+        for i in range(n):
+            speech = self._is_speech(data[i * self.frame:(i + 1) * self.frame])
+            idx = self._frames
+            self._frames += 1
+
+            if speech:
+                self._last_speech_frame = idx
+                self._last_speech_wall = now
+
+            if not self.in_speech:
+                self._run = self._run + 1 if speech else 0
+                if self._run >= self.start_frames:
+                    self.in_speech = True
+                    self._run = 0
+                    start = idx - self.start_frames + 1
+                    events.append(VADEvent("speech_start", start * self.frame_sec, now))
+            else:
+                self._run = 0 if speech else self._run + 1
+                if self._run >= self.end_frames:
+                    self.in_speech = False
+                    self._run = 0
+                    end_sec = (self._last_speech_frame + 1) * self.frame_sec
+                    events.append(VADEvent("speech_end", end_sec, now))
+                    self.end_latencies.append(now - self._last_speech_wall)
+        return events
+
+
+def endpoint_latency(audio: np.ndarray, sample_rate: int, speech_end_sec: float, **vad_kwargs) -> float | None:
+    """
+    Прогоняет запись блоками по 32 мс (как колбэк микрофона) и возвращает, через сколько секунд
+    после настоящего конца речи VAD выдал speech_end (None — не выдал).
+    """
+    vad = FrameVAD(sample_rate=sample_rate, **vad_kwargs)
+    block = int(sample_rate * 0.032)
+    for pos in range(0, len(audio), block):
+        for event in vad.process(audio[pos:pos + block]):
+            if event.kind == "speech_end" and event.stream_sec >= speech_end_sec - 0.3:
+                emitted_at = (pos + block) / sample_rate
+                return emitted_at - speech_end_sec
+    return None
+
+
+def _main() -> None:
+    """
+    python -m core.vad <папка>: WAV-записи + labels.json {"файл.wav": конец_речи_сек}.
+    Печатает задержку обнаружения конца речи по каждой записи и среднюю.
+    """
+    import json
+    import sys
+
+    from core.audio_io import wav_to_float
+
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else "vad_eval")
+    end_silence = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+    labels = json.loads((root / "labels.json").read_text(encoding="utf-8"))
+    latencies = []
+    for name, end_sec in labels.items():
+        audio, sr = wav_to_float((root / name).read_bytes())
+        lat = endpoint_latency(audio, sr, float(end_sec), end_silence_sec=end_silence)
+        print(f"{name}: " + ("missed" if lat is None else f"{lat * 1000:.0f} ms"))
+        if lat is not None:
+            latencies.append(lat)
+    if latencies:
+        print(f"avg={sum(latencies) / len(latencies) * 1000:.0f} ms max={max(latencies) * 1000:.0f} ms "
+              f"detected={len(latencies)}/{len(labels)}")
+
+
+if __name__ == "__main__":
+    _main()
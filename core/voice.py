@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import io
+import itertools
+import logging
 import os
 import tempfile
+import threading
 import time
-import wave
+from contextlib import contextmanager
 from typing import Optional
 
 import numpy as np
@@ -13,39 +15,123 @@ import torch
 from transformers import AutoConfig, AutoModel, AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 from transformers.utils import cached_file
 
+from core.asr_backends import DEFAULT_ASR_ARTIFACT_DIR, make_asr_backend
+from core.capture import AudioRing, CaptureHub
+from core.audio_io import float_to_wav, wav_to_float
+from core.vad import FrameVAD
+
+logger = logging.getLogger(__name__)
+
+GIGAAM_SAMPLE_RATE = 16000
+
+
+def resample_linear(audio: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """Линейная передискретизация — микрофон и так пишет 16 кГц, это страховка для других частот."""
+    if sample_rate == target_rate or not len(audio):
+        return audio
+    n = int(round(len(audio) * target_rate / sample_rate))
+    return np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+
 
 class VoiceRecorder:
-    """Простой рекордер через sounddevice, возвращает WAV-байты."""
+    """
+    Рекордер: моно float32 [-1, 1] пишется прямо в заранее выделенное кольцо (core.capture.AudioRing).
+    stop() отдаёт срез кольца без копирования; WAV собирается только в export_wav().
+    Отданная запись держит аренду своего кольца: stop() и source() берут её, потребитель отпускает
+    через release(audio) / reader.release(). Новая запись берёт кольцо без аренд (обычно их два
+    и они чередуются), а если все заняты — выделяет ещё одно: запись не перезаписывается, пока её читают.
+    Конец фразы определяет покадровый VAD (core.vad.FrameVAD).
+    С hub запись — подписка на общий поток микрофона (можно начать с позиции в прошлом),
+    без hub рекордер открывает свой InputStream.
+    """
 
     def __init__(
             self,
             sample_rate: int = 16000,
             channels: int = 1,
-            dtype: str = "int16",
-            silence_threshold: int = 800,
+            dtype: str = "float32",
+            end_silence_sec: float = 0.6,
+            max_sec: float = 60.0,
+            hub: CaptureHub | None = None,
     ):
-        self.sample_rate = sample_rate
+        self.sample_rate = hub.sample_rate if hub else sample_rate
         self.channels = channels
         self.dtype = dtype
-        self.silence_threshold = silence_threshold
-        self._frames: list[np.ndarray] = []
+        self.hub = hub
+        self.vad = FrameVAD(sample_rate=self.sample_rate, end_silence_sec=end_silence_sec)
+        self.capacity = int(self.sample_rate * max_sec)
+        self._rings = [AudioRing(self.capacity) for _ in range(2)]
+        self._active = 0
+        self._lease_lock = threading.Lock()
         self._stream: sd.InputStream | None = None
+        self._sub_id: int | None = None
+        self.start_pos = 0
         self._last_sound_ts = time.time()
+        self._started_ts = time.time()
+        self._heard_speech = False
+        self._speech_ended = False
+        self._last: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._callbacks = 0
+        self._exports = 0
 
     @property
     def is_recording(self) -> bool:
-        return self._stream is not None
+        return self._stream is not None or self._sub_id is not None
 
-    def _callback(self, indata, frames, _time, status):  # noqa: ARG002
-        if np.abs(indata).max() >= self.silence_threshold:
+    @property
+    def heard_speech(self) -> bool:
+        return self._heard_speech
+
+    @property
+    def _ring(self) -> AudioRing:
+        return self._rings[self._active]
+
+    @property
+    def recorded_sec(self) -> float:
+        return self._ring.samples / self.sample_rate
+
+    @property
+    def end_pos(self) -> int:
+        """Абсолютная позиция (в потоке hub) конца записанного."""
+        return self.start_pos + self._ring.samples
+
+    def _on_audio(self, mono: np.ndarray, _pos: int = 0):
+        self._callbacks += 1
+        events = [e for part in self._ring.write(mono) for e in self.vad.process(part)]
+        for event in events:
+            if event.kind == "speech_start":
+                self._heard_speech = True
+                self._speech_ended = False
+            else:
+                self._speech_ended = True
+        if self.vad.in_speech:
             self._last_sound_ts = time.time()
-        self._frames.append(indata.copy())
 
-    def start(self):
-        if self._stream:
+    def _callback(self, indata, frames, _time, status):  # noqa: ARG002
+        self._on_audio(indata[:, 0])
+
+    def start(self, from_pos: int | None = None, preroll_sec: float = 0.0):
+        """
+        Начинает запись. С hub можно захватить уже прозвучавшее: from_pos — абсолютная позиция
+        в потоке, иначе preroll_sec до текущего момента.
+        """
+        if self.is_recording:
             return
-        self._frames = []
-        self._last_sound_ts = time.time()
+        with self._lease_lock:
+            self._active = self._free_ring()
+        self._ring.reset()
+        self._heard_speech = False
+        self._speech_ended = False
+        self.vad.reset()
+        self._last_sound_ts = self._started_ts = time.time()
+        if self.hub is not None:
+            self.hub.start()
+            if from_pos is None:
+                from_pos = max(0, self.hub.position - int(preroll_sec * self.sample_rate))
+            self.start_pos = max(from_pos, self.hub.position - self.hub.history.capacity)
+            self._sub_id = self.hub.subscribe(self._on_audio, self.start_pos)
+            return
+        self.start_pos = 0
         self._stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
@@ -54,31 +140,137 @@ class VoiceRecorder:
         )
         self._stream.start()
 
-    def stop(self) -> tuple[bytes, int]:
-        if not self._stream:
-            return b"", self.sample_rate
+    def _free_ring(self) -> int:
+        order = [(self._active + i) % len(self._rings) for i in range(1, len(self._rings) + 1)]
+        for i in order:
+            if not self._rings[i].in_use:
+                return i
+        self._rings.append(AudioRing(self.capacity))
+        logger.info("Recorder: all %d rings are still in use, allocated another", len(self._rings) - 1)
+        return len(self._rings) - 1
+
+    def stop(self, keep: bool = True) -> tuple[np.ndarray, int]:
+        """
+        Останавливает запись; float32-волна (срез кольца, пока оно не провернулось) + частота.
+        keep=True — запись арендует кольцо до release(audio); keep=False — запись не нужна.
+        """
+        if not self.is_recording:
+            return np.zeros(0, dtype=np.float32), self.sample_rate
+
+        if self._sub_id is not None:
+            self.hub.unsubscribe(self._sub_id)
+            self._sub_id = None
+        else:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+        self._last = self.audio_since(0)
+        if keep:
+            self._lease(self._last)
+        return self._last, self.sample_rate
+
+    def _ring_of(self, audio: np.ndarray) -> AudioRing | None:
+        # склейка провернувшегося кольца — уже копия, аренда ей не нужна
+        if not len(audio):
+            return None
+        return next((r for r in self._rings if np.may_share_memory(audio, r.buffer)), None)
 
-        self._stream.stop()
-        self._stream.close()
-        self._stream = None
+    def _lease(self, audio: np.ndarray):
+        ring = self._ring_of(audio)
+        if ring is not None:
+            with self._lease_lock:
+                ring.leases += 1
 
-        if not self._frames:
-            return b"", self.sample_rate
+    def release(self, audio: np.ndarray):
+        """Запись из stop() больше не читается — её кольцо можно отдать следующей записи."""
+        ring = self._ring_of(audio)
+        if ring is not None:
+            with self._lease_lock:
+                ring.leases = max(0, ring.leases - 1)
 
-        data = np.concatenate(self._frames, axis=0)
-        buff = io.BytesIO()
-        with wave.open(buff, "wb") as wf:
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(2)
-            wf.setframerate(self.sample_rate)
-            wf.writeframes(data.tobytes())
+    def audio_since(self, pos: int) -> np.ndarray:
+        """
+        Сэмплы записи с позиции pos (от начала записи) до текущего конца — можно звать во время записи,
+        для потокового ASR. Пока кольцо не провернулось, это срез без копирования.
+        """
+        return self._ring.since(pos)
 
-        return buff.getvalue(), self.sample_rate
+    def source(self) -> "RingReader":
+        """
+        audio_since(), привязанный к кольцу текущей записи и арендующий его: следующие записи
+        кольцо не возьмут, пока читатель не вызовет release() (потоковый ASR дочитывает хвост
+        уже после stop()).
+        """
+        ring = self._ring
+        with self._lease_lock:
+            ring.leases += 1
+        return RingReader(ring, self._lease_lock)
+
+    def export_wav(self, audio: np.ndarray | None = None) -> bytes:
+        """WAV (int16) последней записи — только для сохранения/отправки, в ASR идёт float32."""
+        audio = self._last if audio is None else audio
+        self._exports += 1
+        return float_to_wav(audio, self.sample_rate)
+
+    def stats(self) -> dict:
+        """Сколько буферов выделено и сколько раз аудио копировалось (склейка кольца, экспорт)."""
+        return {
+            "allocations": len(self._rings),
+            "copies": sum(r.copies for r in self._rings) + self._exports,
+            "callbacks": self._callbacks,
+            "overwritten_samples": sum(r.overwritten for r in self._rings),
+            "capacity_sec": self.capacity / self.sample_rate,
+        }
+
+    def speech_ended(self) -> bool:
+        """VAD услышал речь и после неё end_silence_sec тишины — фразу можно отдавать в ASR."""
+        return self._heard_speech and self._speech_ended
 
     def silence_for(self) -> float:
+        """Сколько секунд нет речи (по VAD)."""
         return max(0.0, time.time() - self._last_sound_ts)
 
 
+class RingReader:
+    """reader(pos) — сэмплы записи с позиции pos; release() отпускает аренду кольца (повторный — no-op)."""
+
+    def __init__(self, ring: AudioRing, lock: threading.Lock):
+        self._ring = ring
+        self._lock = lock
+        self._released = False
+
+    def __call__(self, pos: int) -> np.ndarray:
+        return self._ring.since(pos)
+
+    def release(self):
+        with self._lock:
+            if not self._released:
+                self._released = True
+                self._ring.leases = max(0, self._ring.leases - 1)
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса (ru_maxrss: на macOS в байтах, на Linux в КБ)."""
+    import resource
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_weights(weights_path: str) -> dict[str, torch.Tensor]:
+    """
+    Веса без второй копии в RAM: safetensors и torch.load(mmap=True) отображают файл в память,
+    тензоры читаются с диска по мере обращения.
+    """
+    if weights_path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+
+        return load_file(weights_path, device="cpu")
+    return torch.load(weights_path, map_location="cpu", mmap=True, weights_only=True)
+
+
 class HFWhisperRecognizer:
     """ASR через Hugging Face pipeline (модели Hugging Face)."""
 
@@ -87,48 +279,53 @@ class HFWhisperRecognizer:
             model_id: str = "ai-sage/GigaAM-v3",
             device: str = "cpu",
             language: str = "ru",
+            backend: str = "torch",
+            artifact_dir: str = DEFAULT_ASR_ARTIFACT_DIR,
+            offline: bool = False,
     ):
         self.model_id = model_id
         self.device = device
         self.language = language
+        self.offline = offline
+        self.load_timings: dict[str, float] = {}
 
         self.dtype = torch.float16 if torch.cuda.is_available() and device != "cpu" else torch.float32
 
-        def _from_pretrained(loader, *args, **kwargs):
-            try:
-                return loader(*args, local_files_only=True, **kwargs)
-            except OSError:
-                return loader(*args, local_files_only=False, **kwargs)
-
-        self.config = _from_pretrained(AutoConfig.from_pretrained, self.model_id, trust_remote_code=True)
+        t_total = time.perf_counter()
+        with self._phase("config"):
+            self.config = self._from_pretrained(AutoConfig.from_pretrained, self.model_id, trust_remote_code=True)
         self.is_gigaam = getattr(self.config, "model_type", None) == "gigaam"
 
         if self.is_gigaam:
             self.processor = None
-            try:
-                weights_path = cached_file(self.model_id, "pytorch_model.bin", local_files_only=True)
-            except OSError:
-                weights_path = cached_file(self.model_id, "pytorch_model.bin", local_files_only=False)
-
-            self.model = AutoModel.from_config(self.config, trust_remote_code=True)
-            state = torch.load(weights_path, map_location=device)
-            self.model.load_state_dict(state)
-            self.model = self.model.to(device=device, dtype=self.dtype)
-            self.model.eval()
+            with self._phase("weights"):
+                self.model = self._load_gigaam()
+            with self._phase("device"):
+                self.model = self.model.to(device=device, dtype=self.dtype)
+                self.model.eval()
+            with self._phase("backend"):
+                self.backend = make_asr_backend(backend, artifact_dir).prepare(self)
             self.pipe = None
+            self._log_load(time.perf_counter() - t_total)
             return
 
-        self.processor = _from_pretrained(AutoProcessor.from_pretrained, self.model_id, trust_remote_code=True)
-        self.model = _from_pretrained(
-            AutoModelForSpeechSeq2Seq.from_pretrained,
-            self.model_id,
-            trust_remote_code=True,
-            torch_dtype=self.dtype,
-            use_safetensors=False,
-        )
+        with self._phase("weights"):
+            self.processor = self._from_pretrained(
+                AutoProcessor.from_pretrained, self.model_id, trust_remote_code=True)
+            # low_cpu_mem_usage: скелет на meta, веса (safetensors, если есть) ставятся сразу на место
+            self.model = self._from_pretrained(
+                AutoModelForSpeechSeq2Seq.from_pretrained,
+                self.model_id,
+                trust_remote_code=True,
+                torch_dtype=self.dtype,
+                low_cpu_mem_usage=True,
+            )
 
-        if device != "cpu":
-            self.model = self.model.to(device)
+        with self._phase("device"):
+            if device != "cpu":
+                self.model = self.model.to(device)
+        with self._phase("backend"):
+            self.backend = make_asr_backend(backend, artifact_dir).prepare(self)
 
         self.pipe = pipeline(
             "automatic-speech-recognition",
@@ -140,34 +337,187 @@ class HFWhisperRecognizer:
             dtype=self.dtype,
             trust_remote_code=True,
         )
+        self._log_load(time.perf_counter() - t_total)
+
+    @contextmanager
+    def _phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.load_timings[name] = time.perf_counter() - t0
+
+    def _log_load(self, total: float):
+        phases = " ".join(f"{k}={v:.2f}s" for k, v in self.load_timings.items())
+        logger.info("ASR %s loaded in %.2f s (%s, backend=%s, peak RSS %.0f MB)",
+                    self.model_id, total, phases, self.backend, peak_rss_mb())
+
+    def _from_pretrained(self, loader, *args, **kwargs):
+        """
+        Сначала только локальный кэш HF. offline=True — сеть не трогаем вовсе:
+        нет модели в кэше — сразу ошибка, а не зависание на таймаутах.
+        """
+        try:
+            return loader(*args, local_files_only=True, **kwargs)
+        except OSError as e:
+            if self.offline:
+                raise OSError(f"ASR model {self.model_id} is not in the local HF cache "
+                              f"(HF_ASR_OFFLINE=1): {e}") from e
+        return loader(*args, local_files_only=False, **kwargs)
+
+    def _weights_path(self) -> str:
+        """
+        Оба имени весов сначала ищутся в локальном кэше и только потом в сети: иначе отсутствующий
+        model.safetensors шёл бы в сеть, даже когда pytorch_model.bin уже скачан.
+        """
+        names = ("model.safetensors", "pytorch_model.bin")
+        for local_only in (True, False):
+            if not local_only and self.offline:
+                raise OSError(f"ASR model {self.model_id} weights are not in the local HF cache "
+                              f"(HF_ASR_OFFLINE=1)")
+            for name in names:
+                try:
+                    path = cached_file(self.model_id, name, local_files_only=local_only)
+                except OSError:
+                    continue
+                if path:
+                    return path
+        raise OSError(f"No weights found for ASR model {self.model_id}")
+
+    def _load_gigaam(self):
+        """
+        Скелет модели на meta (без выделения памяти под случайные веса), затем load_state_dict(assign=True)
+        подставляет отображённые в память тензоры как есть — веса в RAM существуют в одном экземпляре.
+        Если после этого что-то осталось на meta (буферы, которых нет в чекпойнте), скелет строится на CPU.
+        """
+        state = load_weights(self._weights_path())
+        with torch.device("meta"):
+            model = AutoModel.from_config(self.config, trust_remote_code=True)
+        model.load_state_dict(state, assign=True)
+        leftovers = [n for n, t in itertools.chain(model.named_parameters(), model.named_buffers()) if t.is_meta]
+        if leftovers:
+            logger.info("ASR: %d tensors are not in the checkpoint (%s...), building on CPU",
+                        len(leftovers), leftovers[0])
+            model = AutoModel.from_config(self.config, trust_remote_code=True)
+            model.load_state_dict(state, assign=True)
+        return model
 
     @classmethod
     def from_env(cls, env: dict[str, str]) -> Optional["HFWhisperRecognizer"]:
         model = env.get("HF_ASR_MODEL", "").strip() or "ai-sage/GigaAM-v3"
         device = env.get("HF_ASR_DEVICE", "").strip() or ("cuda" if torch.cuda.is_available() else "cpu")
-        return cls(model_id=model, device=device)
+        return cls(
+            model_id=model,
+            device=device,
+            backend=env.get("HF_ASR_BACKEND", "").strip() or "torch",
+            artifact_dir=env.get("HF_ASR_ARTIFACT_DIR", "").strip() or DEFAULT_ASR_ARTIFACT_DIR,
+            offline=env.get("HF_ASR_OFFLINE", "0") == "1",
+        )
+
+    def _gigaam_core(self):
+        """
+        Внутренняя модель GigaAM (preprocessor/encoder/head/decoding) — через неё волна идёт в модель
+        тензором, минуя файл. None — у версии remote code другая структура, остаётся путь через файл.
+        """
+        core = getattr(self.model, "model", self.model)
+        if all(hasattr(core, attr) for attr in ("preprocessor", "encoder", "head", "decoding")):
+            return core
+        return None
 
-    def transcribe(self, wav_bytes: bytes, sample_rate: int) -> str:
-        if not wav_bytes:
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        """audio — моно float32 [-1, 1] (например, срез буфера VoiceRecorder)."""
+        if not len(audio):
             return ""
 
         if self.is_gigaam:
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-            try:
-                tmp_file.write(wav_bytes)
-                tmp_file.flush()
-                tmp_file.close()
+            return self.transcribe_batch([audio], sample_rate)[0]
 
-                result = self.model.transcribe(tmp_file.name)
-                return result.strip() if isinstance(result, str) else ""
-            finally:
-                try:
-                    os.unlink(tmp_file.name)
-                except FileNotFoundError:
-                    pass
-
-        audio = {"array": np.frombuffer(wav_bytes, dtype=np.int16).astype(np.float32) / 32768.0,
-                 "sampling_rate": sample_rate}
-        result = self.pipe(audio, generate_kwargs={"language": self.language})
+        inputs = {"array": np.asarray(audio, dtype=np.float32), "sampling_rate": sample_rate}
+        result = self.pipe(inputs, generate_kwargs={"language": self.language})
         text = result.get("text") if isinstance(result, dict) else None
         return text.strip() if text else ""
+
+    @torch.inference_mode()
+    def transcribe_batch(self, audios: list[np.ndarray], sample_rate: int) -> list[str]:
+        """
+        GigaAM без диска: float32-волны дополняются нулями до общей длины и одним батчем
+        проходят preprocessor -> encoder -> decoding (как GigaAMASR.transcribe, но без load_audio).
+        """
+        core = self._gigaam_core()
+        if core is None:
+            return [self._transcribe_file(float_to_wav(a, sample_rate)) if len(a) else "" for a in audios]
+
+        texts = [""] * len(audios)
+        items = [(i, resample_linear(np.asarray(a, dtype=np.float32).reshape(-1), sample_rate, GIGAAM_SAMPLE_RATE))
+                 for i, a in enumerate(audios) if len(a)]
+        if not items:
+            return texts
+
+        param = next(core.parameters())
+        if len(items) == 1 and param.dtype == torch.float32:
+            batch = torch.from_numpy(items[0][1]).unsqueeze(0)  # общая память с буфером записи
+        else:
+            batch = torch.zeros(len(items), max(len(a) for _, a in items), dtype=param.dtype)
+            for row, (_, audio) in enumerate(items):
+                batch[row, :len(audio)] = torch.from_numpy(audio)
+        lengths = torch.tensor([len(a) for _, a in items], device=param.device)
+
+        features, feature_lengths = core.preprocessor(batch.to(param.device), lengths)
+        encoded, encoded_len = core.encoder(features, feature_lengths)
+        decoded = core.decoding.decode(core.head, encoded, encoded_len)
+        for (i, _), text in zip(items, decoded):
+            texts[i] = text.strip() if isinstance(text, str) else ""
+        return texts
+
+    def _transcribe_file(self, wav_bytes: bytes) -> str:
+        """Исходный путь GigaAM через временный WAV — запасной и для сравнения в бенчмарке."""
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        try:
+            tmp_file.write(wav_bytes)
+            tmp_file.flush()
+            tmp_file.close()
+
+            result = self.model.transcribe(tmp_file.name)
+            return result.strip() if isinstance(result, str) else ""
+        finally:
+            try:
+                os.unlink(tmp_file.name)
+            except FileNotFoundError:
+                pass
+
+
+def _bench() -> None:
+    """
+    python -m core.voice <файл.wav> [повторов]: время на вызов GigaAM через временный файл
+    и через тензор в памяти (плюс батч из 4 копий) на одной и той же записи.
+    """
+    import sys
+
+    from tools.env_tools import read_env
+
+    logging.basicConfig(level=logging.INFO)
+    wav_bytes = open(sys.argv[1], "rb").read()
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    recognizer = HFWhisperRecognizer.from_env(read_env(".env"))
+    if not recognizer.is_gigaam or recognizer._gigaam_core() is None:
+        print("in-memory path needs a GigaAM model")
+        return
+    audio, sr = wav_to_float(wav_bytes)
+    recognizer.transcribe(audio, sr)  # прогрев
+
+    def timed(fn) -> float:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - t0) / repeats
+
+    file_sec = timed(lambda: recognizer._transcribe_file(wav_bytes))
+    mem_sec = timed(lambda: recognizer.transcribe(audio, sr))
+    batch_sec = timed(lambda: recognizer.transcribe_batch([audio] * 4, sr)) / 4
+    print(f"audio={len(audio) / sr:.2f}s file={file_sec * 1000:.1f} ms memory={mem_sec * 1000:.1f} ms "
+          f"batch4={batch_sec * 1000:.1f} ms/utt overhead_saved={(file_sec - mem_sec) * 1000:.1f} ms")
+    print(f"text: {recognizer.transcribe(audio, sr)!r}")
+
+
+if __name__ == "__main__":
+    _bench()
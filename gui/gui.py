@@ -3,10 +3,21 @@ from __future__ import annotations
 import logging
 import math
 import threading
+from typing import Callable
 
+import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from core.asr_backends import ASR_BACKENDS
+from core.barge_in import BargeInDetector, BargeInEvent
+from core.capture import CaptureHub
+from core.compute import Workload, default_governor
+from core.kws import KeywordSpotter, KWSResult
+from core.streaming_asr import StreamingTranscriber
+from core.tts_backends import SUPPORTED_SAMPLE_RATES, TTS_BACKENDS
 from core.voice import VoiceRecorder, HFWhisperRecognizer
+from gui.jobs import Job, JobWorker
+from gui.stream_render import MarkdownBlocks, StreamRenderer
 from gui.styles import MASHA_QSS
 from tools.env_tools import read_env, write_env
 
@@ -111,6 +122,13 @@ class ChatArea(QtWidgets.QScrollArea):
         self.v.addStretch(1)
         self.setWidget(self.container)
 
+        # прокрутка вниз — одна за кадр; «прилипание» дожимает её, когда лэйаут пересчитается
+        self._stick = False
+        self._scroll_pending = False
+        bar = self.verticalScrollBar()
+        bar.rangeChanged.connect(self._on_range_changed)
+        bar.actionTriggered.connect(self._on_user_scroll)
+
     def add_row(self, w: QtWidgets.QWidget, right: bool):
         row = QtWidgets.QHBoxLayout()
         row.setContentsMargins(0, 0, 0, 0)
@@ -124,15 +142,25 @@ class ChatArea(QtWidgets.QScrollArea):
         QtCore.QTimer.singleShot(0, self.scroll_to_bottom)
 
     def scroll_to_bottom(self):
+        """Сколько бы раз ни вызвали за кадр — одна прокрутка; рост высоты после неё догоняет rangeChanged."""
+        self._stick = True
+        if not self._scroll_pending:
+            self._scroll_pending = True
+            QtCore.QTimer.singleShot(0, self._scroll)
+
+    def _scroll(self):
+        self._scroll_pending = False
         bar = self.verticalScrollBar()
-        if not bar:
-            return
-
-        def _scroll():
+        if bar:
             bar.setValue(bar.maximum())
 
-        QtCore.QTimer.singleShot(0, _scroll)
-        QtCore.QTimer.singleShot(15, _scroll)  # второй тик после пересчёта лэйаута
+    def _on_range_changed(self, _min: int, maximum: int):
+        if self._stick:
+            self.verticalScrollBar().setValue(maximum)
+
+    def _on_user_scroll(self, _action: int):
+        # пользователь сам крутит чат — не тянем его вниз до следующего scroll_to_bottom()
+        self._stick = False
 
     def clear_messages(self):
         # удаляем все строки, кроме финального stretch
@@ -156,28 +184,82 @@ class ChatArea(QtWidgets.QScrollArea):
 
 
 class Bubble(QtWidgets.QFrame):
+    """
+    Пузырь сообщения. Стрим идёт через feed()/flush(): законченные Markdown-блоки становятся
+    отдельными QLabel и больше не перерисовываются, каждый кадр обновляется только последний блок.
+    finish() сворачивает ответ в один QLabel — выделение и вёрстка как у обычного сообщения.
+    """
+
     def __init__(self, text: str, is_user: bool):
         super().__init__()
         self.setObjectName("UserBubble" if is_user else "BotBubble")
         self.setFrameShape(QtWidgets.QFrame.NoFrame)
 
-        self.label = QtWidgets.QLabel(text)
-        self.label.setObjectName("BubbleText")
-        self.label.setWordWrap(True)
-        self.label.setTextFormat(QtCore.Qt.TextFormat.MarkdownText)
-        self.label.setOpenExternalLinks(True)
-        self.label.setTextInteractionFlags(QtCore.Qt.TextBrowserInteraction)
-
-        lay = QtWidgets.QVBoxLayout(self)
-        lay.setContentsMargins(18, 12, 18, 12)
-        lay.addWidget(self.label)
+        self.label = self._make_label(text)
+        self._text = [text]
+        self._pending: list[str] = []
+        self._md = MarkdownBlocks()
+        self._streamed = False
+        self._blocks: list[QtWidgets.QLabel] = []
+
+        self.lay = QtWidgets.QVBoxLayout(self)
+        self.lay.setContentsMargins(18, 12, 18, 12)
+        self.lay.addWidget(self.label)
+
+    @staticmethod
+    def _make_label(text: str) -> QtWidgets.QLabel:
+        label = QtWidgets.QLabel(text)
+        label.setObjectName("BubbleText")
+        label.setWordWrap(True)
+        label.setTextFormat(QtCore.Qt.TextFormat.MarkdownText)
+        label.setOpenExternalLinks(True)
+        label.setTextInteractionFlags(QtCore.Qt.TextBrowserInteraction)
+        return label
 
     def set_max_width(self, w: int):
         # Даем пузырям ширину ближе к макс. доступной, чтобы текст не ломался каждую строку
         self.setMaximumWidth(max(360, int(w * 0.95)))
 
+    def text(self) -> str:
+        return "".join(self._text + self._pending)
+
+    def feed(self, chunk: str):
+        """Кусок стрима; на экран попадёт при следующем flush()."""
+        self._pending.append(chunk)
+
+    def flush(self):
+        if not self._pending:
+            return
+        chunk = "".join(self._pending)
+        self._pending.clear()
+        blocks = []
+        if not self._streamed:
+            # то, что уже было в пузыре, — начало потока
+            self._streamed = True
+            blocks = self._md.feed("".join(self._text))
+        self._text.append(chunk)
+        for block in blocks + self._md.feed(chunk):
+            label = self._make_label(block)
+            self._blocks.append(label)
+            self.lay.insertWidget(self.lay.count() - 1, label)
+        self.label.setText(self._md.tail)
+
+    def finish(self):
+        """Конец стрима: весь ответ — одним документом (один разбор Markdown на ответ)."""
+        self.flush()
+        self._md = MarkdownBlocks()
+        self._streamed = False
+        if not self._blocks:
+            return
+        for label in self._blocks:
+            self.lay.removeWidget(label)
+            label.deleteLater()
+        self._blocks.clear()
+        self.label.setText("".join(self._text))
+
     def append(self, chunk: str):
-        self.label.setText(self.label.text() + chunk)
+        self.feed(chunk)
+        self.finish()
 
 
 class TypingDots(QtWidgets.QWidget):
@@ -229,37 +311,27 @@ class TypingBubble(QtWidgets.QFrame):
         self.setMaximumWidth(max(220, int(w)))
 
 
-class StreamWorker(QtCore.QObject):
-    chunk = QtCore.Signal(str)
-    done = QtCore.Signal()
-    error = QtCore.Signal(str)
+class StreamJob:
+    """Стрим ответа агента; куски уходят через job.progress, отмена — через токен задачи."""
 
     def __init__(self, agent, prompt: str):
-        super().__init__()
         self.agent = agent
         self.prompt = prompt
-        self._stop = False
-        self._cancel_event = threading.Event()
 
-    @QtCore.Slot()
-    def run(self):
-        try:
-            for piece in self.agent.handle_stream(self.prompt, cancel_event=self._cancel_event):
-                if self._stop or self._cancel_event.is_set():
-                    break
-                self.chunk.emit(piece)
-            self.done.emit()
-        except Exception as e:
-            self.error.emit(str(e))
+    def __call__(self, job: Job):
+        for piece in self.agent.handle_stream(self.prompt, cancel_event=job.token):
+            if job.token.cancelled:
+                break
+            job.progress(piece)
 
-    def stop(self):
-        self._stop = True
-        self._cancel_event.set()
+    @staticmethod
+    def stop(agent, job: Job):
+        job.token.cancel()
         try:
-            self.agent.cancel_generation()
+            agent.cancel_generation()
         except Exception:
             pass
-        tts = getattr(self.agent, "tts", None)
+        tts = getattr(agent, "tts", None)
         if tts:
             try:
                 tts.close(wait=False)
@@ -267,23 +339,77 @@ class StreamWorker(QtCore.QObject):
                 pass
 
 
-class TranscribeWorker(QtCore.QObject):
-    finished = QtCore.Signal(str)
-    error = QtCore.Signal(str)
-
-    def __init__(self, recognizer: HFWhisperRecognizer, audio_bytes: bytes, sample_rate: int):
-        super().__init__()
+class TranscribeJob:
+    def __init__(
+            self,
+            recognizer: HFWhisperRecognizer,
+            audio: np.ndarray,
+            sample_rate: int,
+            workload: Workload = Workload.COMMAND_ASR,
+            streaming: StreamingTranscriber | None = None,
+            release: Callable[[], None] | None = None,
+    ):
         self.recognizer = recognizer
-        self.audio_bytes = audio_bytes
+        self.audio = audio
         self.sample_rate = sample_rate
-
-    @QtCore.Slot()
-    def run(self):
+        self.workload = workload
+        self.streaming = streaming
+        # отпускает аренду записи у VoiceRecorder — один раз, когда audio больше не читается
+        self._release = release
+
+    def release(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def on_cancel(self):
+        """Отменена до старта: потоковый распознаватель иначе так и крутил бы свой цикл."""
+        if self.streaming is not None:
+            self.streaming.cancel()
+        self.release()
+
+    def __call__(self, job: Job) -> str:
+        if job.token.cancelled:
+            self.on_cancel()
+            return ""
         try:
-            text = self.recognizer.transcribe(self.audio_bytes, self.sample_rate)
-            self.finished.emit(text.strip())
-        except Exception as e:
-            self.error.emit(str(e))
+            if self.streaming is not None:
+                # большая часть фразы уже распознана на лету — декодируем только хвост
+                return self.streaming.finish().strip()
+            with default_governor().slot(self.workload):
+                return self.recognizer.transcribe(self.audio, self.sample_rate).strip()
+        finally:
+            self.release()
+
+
+class HotwordJob:
+    """
+    Пассивный сегмент: KWS (MFCC + DTW по всему сегменту) и, если он пропустил, hotword ASR —
+    всё в потоке воркера. Результат — (текст, результат KWS или None без KWS).
+    """
+
+    def __init__(self, recognizer: HFWhisperRecognizer, kws: KeywordSpotter | None, audio: np.ndarray,
+                 sample_rate: int):
+        self.kws = kws
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.transcribe = TranscribeJob(recognizer, audio, sample_rate, Workload.HOTWORD_ASR)
+
+    def __call__(self, job: Job) -> tuple[str, KWSResult | None]:
+        result = self.kws.detect(self.audio, self.sample_rate) if self.kws else None
+        if result is not None and not result.detected:
+            return "", result
+        return self.transcribe(job), result
+
+
+class PartialTranscript(QtCore.QObject):
+    """Мост из потока потокового ASR в GUI-поток."""
+    text = QtCore.Signal(str)
+
+
+class BargeInSignal(QtCore.QObject):
+    """Мост из потока микрофона (BargeInDetector) в GUI-поток."""
+    triggered = QtCore.Signal(object)
 
 
 class SettingsTab(QtWidgets.QWidget):
@@ -326,6 +452,15 @@ class SettingsTab(QtWidgets.QWidget):
         self.voice_combo = QtWidgets.QComboBox()
         self.voice_combo.addItems(["kseniya", "baya", "xenia", "aidar"])
 
+        # TTS backend / sample rate (применяются после перезапуска)
+        self.tts_backend_combo = QtWidgets.QComboBox()
+        self.tts_backend_combo.addItems(list(TTS_BACKENDS))
+        self.tts_rate_combo = QtWidgets.QComboBox()
+        self.tts_rate_combo.addItems([str(r) for r in SUPPORTED_SAMPLE_RATES])
+        self.tts_rate_combo.setCurrentText("24000")
+        self.asr_backend_combo = QtWidgets.QComboBox()
+        self.asr_backend_combo.addItems(list(ASR_BACKENDS))
+
         # Hotword toggle
         self.hotword_check = QtWidgets.QCheckBox("Активация по \"привет, маша\"")
         self.hotword_check.setChecked(hotword_enabled)
@@ -333,7 +468,9 @@ class SettingsTab(QtWidgets.QWidget):
         self.hotword_check.setToolTip("Пассивная активация по кодовой фразе")
 
         hint = QtWidgets.QLabel(
-            "Модели сохраняются в .env (MAIN_MODEL / MINI_MODEL). После смены моделей лучше перезапуск.")
+            "Модели, TTS и ASR сохраняются в .env (MAIN_MODEL / MINI_MODEL / TTS_BACKEND / TTS_SAMPLE_RATE / "
+            "HF_ASR_BACKEND). "
+            "После смены лучше перезапуск.")
         hint.setObjectName("Hint")
 
         grid = QtWidgets.QGridLayout()
@@ -349,8 +486,17 @@ class SettingsTab(QtWidgets.QWidget):
         grid.addWidget(QtWidgets.QLabel("Voice (Silero)"), 2, 0)
         grid.addWidget(self.voice_combo, 2, 1)
 
-        grid.addWidget(QtWidgets.QLabel("Hotword"), 3, 0)
-        grid.addWidget(self.hotword_check, 3, 1)
+        grid.addWidget(QtWidgets.QLabel("TTS backend"), 3, 0)
+        grid.addWidget(self.tts_backend_combo, 3, 1)
+
+        grid.addWidget(QtWidgets.QLabel("TTS sample rate"), 4, 0)
+        grid.addWidget(self.tts_rate_combo, 4, 1)
+
+        grid.addWidget(QtWidgets.QLabel("ASR backend"), 5, 0)
+        grid.addWidget(self.asr_backend_combo, 5, 1)
+
+        grid.addWidget(QtWidgets.QLabel("Hotword"), 6, 0)
+        grid.addWidget(self.hotword_check, 6, 1)
 
         outer.addLayout(grid)
         outer.addWidget(self.btn_save)
@@ -380,6 +526,18 @@ class SettingsTab(QtWidgets.QWidget):
                 self.mini_model.addItem(mini_val)
             self.mini_model.setCurrentText(mini_val)
 
+        backend_val = env.get("TTS_BACKEND", "").strip()
+        if backend_val and self.tts_backend_combo.findText(backend_val) >= 0:
+            self.tts_backend_combo.setCurrentText(backend_val)
+
+        rate_val = env.get("TTS_SAMPLE_RATE", "").strip()
+        if rate_val and self.tts_rate_combo.findText(rate_val) >= 0:
+            self.tts_rate_combo.setCurrentText(rate_val)
+
+        asr_val = env.get("HF_ASR_BACKEND", "").strip()
+        if asr_val and self.asr_backend_combo.findText(asr_val) >= 0:
+            self.asr_backend_combo.setCurrentText(asr_val)
+
     def save_env(self):
         main_val = self.main_model.currentText().strip()
         mini_val = self.mini_model.currentText().strip()
@@ -387,7 +545,13 @@ class SettingsTab(QtWidgets.QWidget):
             self.msg.setText("Выбери MAIN_MODEL и MINI_MODEL.")
             return
 
-        write_env(self.env_path, {"MAIN_MODEL": main_val, "MINI_MODEL": mini_val})
+        write_env(self.env_path, {
+            "MAIN_MODEL": main_val,
+            "MINI_MODEL": mini_val,
+            "TTS_BACKEND": self.tts_backend_combo.currentText(),
+            "TTS_SAMPLE_RATE": self.tts_rate_combo.currentText(),
+            "HF_ASR_BACKEND": self.asr_backend_combo.currentText(),
+        })
         self.msg.setText("Сохранено в .env. Перезапусти приложение, чтобы точно применилось.")
 
     def apply_voice(self):
@@ -547,29 +711,70 @@ class MainWindow(QtWidgets.QMainWindow):
         # state
         self._active_bot: Bubble | None = None
         self._typing: TypingBubble | None = None
-        self._thread: QtCore.QThread | None = None
-        self._worker: StreamWorker | None = None
-        self.recorder = VoiceRecorder()
-        self.hotword_recorder = VoiceRecorder()
-        self._asr_thread: QtCore.QThread | None = None
-        self._asr_worker: TranscribeWorker | None = None
+        # по одному долгоживущему потоку на тип задач; текущая задача — по её id
+        self._llm_jobs = self._make_llm_worker()
+        # воркеры стрима, брошенные на зависшей отменённой задаче; дожидаются её и завершаются сами
+        self._retired_llm_jobs: list[JobWorker] = []
+        self._asr_jobs = JobWorker("command-asr", self)
+        self._hotword_jobs = JobWorker("hotword-asr", self)
+        self._stream_job: Job | None = None
+        self._asr_job: Job | None = None
+        self._hotword_job: Job | None = None
+        # конец фразы — по VAD, после VAD_END_SILENCE_SEC тишины
+        end_silence = float(env.get("VAD_END_SILENCE_SEC", "0.6") or 0.6)
+        # один открытый поток микрофона на hotword и команды; рекордеры — его подписчики
+        self.capture = CaptureHub.from_env(env)
+        self._capture_preroll_sec = float(env.get("CAPTURE_PREROLL_SEC", "0.3") or 0.3)
+        self._command_from_pos: int | None = None
+        self.recorder = VoiceRecorder(end_silence_sec=end_silence, hub=self.capture)
+        # фраза hotword обрывается на 15 с — большой буфер ему не нужен
+        self.hotword_recorder = VoiceRecorder(end_silence_sec=end_silence, max_sec=20.0, hub=self.capture)
         self._recording = False
         self._silence_timer = QtCore.QTimer(self)
-        self._silence_timer.setInterval(300)
+        self._silence_timer.setInterval(50)
         self._silence_timer.timeout.connect(self._check_silence)
         self._hotword_enabled = hotword_enabled
         self._hotword_listening = False
         self._hotword_timer = QtCore.QTimer(self)
-        self._hotword_timer.setInterval(300)
+        self._hotword_timer.setInterval(100)
         self._hotword_timer.timeout.connect(self._check_hotword_silence)
-        self._hotword_thread: QtCore.QThread | None = None
-        self._hotword_worker: TranscribeWorker | None = None
+        # потоковый ASR: промежуточные гипотезы в поле ввода, после речи — только хвост
+        self._asr_streaming_enabled = env.get("ASR_STREAMING", "1") == "1"
+        self._streaming_asr: StreamingTranscriber | None = None
+        self._partial = PartialTranscript(self)
+        self._partial.text.connect(self._on_partial_transcript)
+        # дешёвый KWS-гейт: полный ASR горячего слова будится, только если похоже на «Маша»
+        self.kws = KeywordSpotter.from_env(env) if env.get("KWS_ENABLED", "1") == "1" else None
+        self._hotword_segment = None
+        # barge-in: пользователь заговорил поверх озвучки — TTS глушится из потока микрофона,
+        # здесь отменяется ответ и начинается запись команды с начала его речи
+        self._barge_in_signal = BargeInSignal(self)
+        self._barge_in_signal.triggered.connect(self._on_barge_in)
+        self.barge_in: BargeInDetector | None = None
+        if env.get("BARGE_IN_ENABLED", "1") == "1":
+            self.barge_in = BargeInDetector(
+                lambda: getattr(self.agent, "tts", None),
+                on_barge_in=self._barge_in_signal.triggered.emit,
+                sample_rate=self.capture.sample_rate,
+            )
+            try:
+                self.capture.start()
+                self.capture.subscribe(self.barge_in.on_audio)
+            except Exception as e:
+                logger.warning("Barge-in disabled, mic unavailable: %s", e)
+                self.barge_in = None
         self._streaming = False
         self._auto_refocus = True
         self._stream_timeout_ms = 60000  # safety net, чтобы запросы не зависали навсегда
         self._stream_timeout = QtCore.QTimer(self)
         self._stream_timeout.setSingleShot(True)
         self._stream_timeout.timeout.connect(self._on_stream_timeout)
+        # куски ответа копятся и рисуются раз в кадр (CHAT_FRAME_MS, 16–33 мс)
+        self._renderer = StreamRenderer(int(env.get("CHAT_FRAME_MS", "25") or 25), self)
+        self._asr_jobs.finished_job.connect(self._on_asr_job_done)
+        self._asr_jobs.failed.connect(self._on_asr_job_failed)
+        self._hotword_jobs.finished_job.connect(self._on_hotword_job_done)
+        self._hotword_jobs.failed.connect(self._on_hotword_job_failed)
 
         self.focus_shortcuts = [
             QtGui.QShortcut(QtGui.QKeySequence("Meta+Shift+Space"), self),
@@ -691,13 +896,21 @@ class MainWindow(QtWidgets.QMainWindow):
         if recording:
             self._stop_speech_output()
             self._stop_hotword_listening()
+            from_pos, self._command_from_pos = self._command_from_pos, None
             try:
-                self.recorder.start()
+                self.recorder.start(from_pos=from_pos, preroll_sec=self._capture_preroll_sec)
             except Exception as e:
                 self.status.setText(f"Ошибка микрофона: {e}")
                 self.btn_mic.setChecked(False)
                 return
             self._recording = True
+            if self._asr_streaming_enabled:
+                self._streaming_asr = StreamingTranscriber(
+                    self.recognizer,
+                    self.recorder.source(),
+                    sample_rate=self.recorder.sample_rate,
+                    on_partial=self._partial.text.emit,
+                ).start()
             self.status.setText("Recording…")
             self.btn_send.setEnabled(False)
             self.btn_stop.setEnabled(False)
@@ -712,44 +925,51 @@ class MainWindow(QtWidgets.QMainWindow):
         self._silence_timer.stop()
         self.voice_orb.set_active(False)
         try:
-            audio_bytes, sample_rate = self.recorder.stop()
+            audio, sample_rate = self.recorder.stop()
         except Exception as e:
             self.status.setText(f"Ошибка записи: {e}")
+            if self._streaming_asr:
+                self._streaming_asr.cancel()
+                self._streaming_asr = None
             return
 
         self.status.setText("Transcribing…")
-        self.start_transcription(audio_bytes, sample_rate)
+        self.start_transcription(audio, sample_rate)
+
+    def _on_partial_transcript(self, text: str):
+        if self._recording or self._asr_job:
+            self.input.setPlainText(text)
 
-    def start_transcription(self, audio_bytes: bytes, sample_rate: int):
-        if not audio_bytes:
+    def start_transcription(self, audio: np.ndarray, sample_rate: int):
+        if not len(audio):
+            if self._streaming_asr:
+                self._streaming_asr.cancel()
+                self._streaming_asr = None
             self.status.setText("Пустая запись")
             self.btn_mic.setChecked(False)
             self.btn_send.setEnabled(True)
             return
 
-        if self._asr_thread:
-            self._asr_thread.quit()
-            self._asr_thread.wait()
-            self._asr_thread = None
-            self._asr_worker = None
+        if self._asr_job:
+            # новая запись важнее недораспознанной старой
+            self._asr_job.token.cancel()
 
-        self._asr_thread = QtCore.QThread(self)
-        self._asr_worker = TranscribeWorker(self.recognizer, audio_bytes, sample_rate)
-        self._asr_worker.moveToThread(self._asr_thread)
+        streaming, self._streaming_asr = self._streaming_asr, None
+        recorder = self.recorder
+        self._asr_job = self._asr_jobs.submit(
+            TranscribeJob(self.recognizer, audio, sample_rate, streaming=streaming,
+                          release=lambda: recorder.release(audio)))
 
-        self._asr_thread.started.connect(self._asr_worker.run)
-        self._asr_worker.finished.connect(self.on_transcribe_ready)
-        self._asr_worker.error.connect(self.on_transcribe_error)
-        self._asr_worker.finished.connect(self._asr_thread.quit)
-        self._asr_worker.error.connect(self._asr_thread.quit)
-        self._asr_thread.finished.connect(self._asr_worker.deleteLater)
-        self._asr_thread.finished.connect(self._asr_thread.deleteLater)
+    def _on_asr_job_done(self, job_id: int, text):
+        if self._asr_job and self._asr_job.id == job_id:
+            self.on_transcribe_ready(text or "")
 
-        self._asr_thread.start()
+    def _on_asr_job_failed(self, job_id: int, msg: str):
+        if self._asr_job and self._asr_job.id == job_id:
+            self.on_transcribe_error(msg)
 
     def on_transcribe_ready(self, text: str):
-        self._asr_thread = None
-        self._asr_worker = None
+        self._asr_job = None
         self.btn_mic.setChecked(False)
         self.status.setText("Ready")
         self.voice_orb.set_active(False)
@@ -764,8 +984,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self._start_hotword_listening()
 
     def on_transcribe_error(self, msg: str):
-        self._asr_thread = None
-        self._asr_worker = None
+        self._asr_job = None
         self.btn_mic.setChecked(False)
         self.status.setText(f"ASR error: {msg}")
         logger.error("ASR error: %s", msg)
@@ -808,23 +1027,39 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.voice_orb.enabled:
             self.voice_orb.set_active(True)
 
-        self._thread = QtCore.QThread(self)
-        self._worker = StreamWorker(self.agent, prompt)
-        self._worker.moveToThread(self._thread)
+        if self._llm_jobs.busy:
+            # отменённый стрим ещё не вернулся (висит на сети или модели) — новый за ним не ставим
+            logger.warning("LLM stream worker is still busy with a cancelled job, starting a new one")
+            old, self._llm_jobs = self._llm_jobs, self._make_llm_worker()
+            old.retire()
+            old.finished.connect(self._prune_retired_llm_jobs)
+            self._retired_llm_jobs.append(old)
+        self._stream_job = self._llm_jobs.submit(StreamJob(self.agent, prompt))
+        self._stream_timeout.start(self._stream_timeout_ms)
 
-        self._thread.started.connect(self._worker.run)
-        self._worker.chunk.connect(self.on_chunk)
-        self._worker.done.connect(self.on_done)
-        self._worker.error.connect(self.on_error)
+    def _make_llm_worker(self) -> JobWorker:
+        jobs = JobWorker("llm-stream", self)
+        jobs.progress.connect(self._on_stream_progress)
+        jobs.finished_job.connect(self._on_stream_job_done)
+        jobs.failed.connect(self._on_stream_job_failed)
+        return jobs
 
-        self._worker.done.connect(self._thread.quit)
-        self._worker.error.connect(self._thread.quit)
-        self._worker.done.connect(self._worker.deleteLater)
-        self._worker.error.connect(self._worker.deleteLater)
-        self._thread.finished.connect(self._thread.deleteLater)
+    def _prune_retired_llm_jobs(self):
+        for jobs in [j for j in self._retired_llm_jobs if j.isFinished()]:
+            self._retired_llm_jobs.remove(jobs)
+            jobs.deleteLater()
 
-        self._thread.start()
-        self._stream_timeout.start(self._stream_timeout_ms)
+    def _on_stream_progress(self, job_id: int, chunk):
+        if self._stream_job and self._stream_job.id == job_id:
+            self.on_chunk(chunk)
+
+    def _on_stream_job_done(self, job_id: int, _result):
+        if self._stream_job and self._stream_job.id == job_id:
+            self.on_done()
+
+    def _on_stream_job_failed(self, job_id: int, msg: str):
+        if self._stream_job and self._stream_job.id == job_id:
+            self.on_error(msg)
 
     def _remove_typing(self):
         if self._typing:
@@ -832,15 +1067,12 @@ class MainWindow(QtWidgets.QMainWindow):
             self._typing.deleteLater()
             self._typing = None
 
-    def _stop_stream_thread(self, wait_ms: int = 350):
-        if self._worker:
-            self._worker.stop()
-        if self._thread and self._thread.isRunning():
-            self._thread.requestInterruption()
-            self._thread.quit()
-            self._thread.wait(wait_ms)
-        self._worker = None
-        self._thread = None
+    def _stop_stream_job(self):
+        # поток воркера не ждём: отменённая задача доработает в фоне, её сигналы отбросятся по id;
+        # если она не вернётся к следующему стриму, start_stream отдаст его новому воркеру
+        if self._stream_job:
+            StreamJob.stop(self.agent, self._stream_job)
+        self._stream_job = None
 
     def _reset_stream_state(self, status_text: str = "Ready"):
         self._remove_typing()
@@ -849,9 +1081,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_stop.setEnabled(False)
         self.voice_orb.set_active(False)
         self._streaming = False
-        self._worker = None
-        self._thread = None
+        self._stream_job = None
         self._stream_timeout.stop()
+        self._renderer.finish()
         self._active_bot = None
         if self._auto_refocus:
             try:
@@ -868,11 +1100,10 @@ class MainWindow(QtWidgets.QMainWindow):
             self._remove_typing()
             if self._active_bot:
                 self.chat.add_row(self._active_bot, right=False)
+                self._renderer.start(self._active_bot, self.chat)
             self.status.setText("Responding…")
 
-        if self._active_bot:
-            self._active_bot.append(chunk)
-            self.chat.scroll_to_bottom()
+        self._renderer.push(chunk)
 
     def on_done(self):
         if not self._streaming:
@@ -883,17 +1114,18 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self._streaming:
             return
         logger.error("Stream worker error: %s", msg)
+        self._renderer.finish()
         if self._active_bot:
             self._active_bot.append(f"\n\nОшибка: {msg}")
         self._reset_stream_state("Error")
 
     def _on_stream_timeout(self):
         logger.warning("Stream timed out, forcing reset")
-        self._stop_stream_thread()
+        self._stop_stream_job()
         self._reset_stream_state("Timeout")
 
     def on_stop(self):
-        self._stop_stream_thread()
+        self._stop_stream_job()
         self._reset_stream_state("Stopped")
         if self.btn_mic.isChecked():
             self.btn_mic.setChecked(False)
@@ -906,7 +1138,7 @@ class MainWindow(QtWidgets.QMainWindow):
             logger.warning("stop_tts failed: %s", e)
 
         if self._streaming:
-            self._stop_stream_thread()
+            self._stop_stream_job()
             self._reset_stream_state("Stopped")
 
     def on_reset_dialog(self):
@@ -934,22 +1166,24 @@ class MainWindow(QtWidgets.QMainWindow):
             self._silence_timer.stop()
             return
 
-        if self.recorder.silence_for() >= 1.5:
+        if self.recorder.speech_ended():
+            self.status.setText("Auto stop: end of speech")
+            self.btn_mic.setChecked(False)
+        elif not self.recorder.heard_speech and self.recorder.silence_for() >= 1.5:
             self.status.setText("Auto stop: silence")
             self.btn_mic.setChecked(False)
 
     # --- Passive hotword listening (always-on "Маша") ---
-    def _start_hotword_listening(self):
+    def _start_hotword_listening(self, from_pos: int | None = None):
+        """from_pos — продолжить с позиции в потоке (без дыры после только что снятого сегмента)."""
         if not self._hotword_enabled or self._hotword_listening:
             return
         if self._recording:
             return
         if not self.recognizer:
             return
-        if self._hotword_thread:
-            return
         try:
-            self.hotword_recorder.start()
+            self.hotword_recorder.start(from_pos=from_pos)
             self._hotword_listening = True
             self._hotword_timer.start()
         except Exception as e:
@@ -961,7 +1195,7 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         self._hotword_timer.stop()
         try:
-            self.hotword_recorder.stop()
+            self.hotword_recorder.stop(keep=False)
         except Exception:
             pass
         self._hotword_listening = False
@@ -972,24 +1206,30 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         if self._recording:
             return
-        if self._hotword_thread:
+        if self._hotword_job:
             return
-        # если тишина, завершаем сегмент и пробуем распознать активационное слово
-        if self.hotword_recorder.silence_for() >= 1.5:
+        rec = self.hotword_recorder
+        if not rec.heard_speech and rec.recorded_sec >= 5.0:
+            # одна тишина/шум без речи — сбрасываем буфер, слушаем дальше
+            self._stop_hotword_listening()
+            self._start_hotword_listening()
+            return
+        # VAD закрыл фразу (или речь без пауз слишком длинная) — пробуем распознать активационное слово
+        if rec.speech_ended() or rec.recorded_sec >= 15.0:
             try:
-                audio_bytes, sample_rate = self.hotword_recorder.stop()
+                audio, sample_rate = rec.stop()
             except Exception as e:
                 self.status.setText(f"Hotword stop error: {e}")
                 self._hotword_listening = False
                 self._hotword_timer.stop()
                 self._start_hotword_listening()
                 return
+            # слушаем дальше ровно с конца сегмента: пока он проверяется и распознаётся,
+            # следующая речь (например, команда сразу после "Маша") уже пишется
             self._hotword_listening = False
-            self._hotword_timer.stop()
-            if audio_bytes:
-                self._start_hotword_asr(audio_bytes, sample_rate)
-            else:
-                self._start_hotword_listening()
+            self._start_hotword_listening(from_pos=rec.end_pos)
+            if len(audio):
+                self._start_hotword_asr(audio, sample_rate)
 
     def bring_to_front(self):
         """Пытаемся вернуть окно на передний план, если система разрешает."""
@@ -1019,33 +1259,26 @@ class MainWindow(QtWidgets.QMainWindow):
     def _on_focus_changed(self, old, new):
         logger.info("Focus changed: %s -> %s", old, new)
 
-    def _start_hotword_asr(self, audio_bytes: bytes, sample_rate: int):
-        if not self.recognizer:
-            self._start_hotword_listening()
+    def _start_hotword_asr(self, audio: np.ndarray, sample_rate: int):
+        if not self.recognizer or self._hotword_job:
+            self.hotword_recorder.release(audio)
             return
-        if self._hotword_thread:
-            return
-
-        self._hotword_thread = QtCore.QThread(self)
-        self._hotword_worker = TranscribeWorker(self.recognizer, audio_bytes, sample_rate)
-        self._hotword_worker.moveToThread(self._hotword_thread)
+        # KWS по сегменту до 15 с — не в GUI-потоке: сначала он, затем ASR, если сегмент прошёл
+        self._hotword_segment = (audio, sample_rate)
+        self._hotword_job = self._hotword_jobs.submit(HotwordJob(self.recognizer, self.kws, audio, sample_rate))
 
-        self._hotword_thread.started.connect(self._hotword_worker.run)
-        self._hotword_worker.finished.connect(self._on_hotword_ready)
-        self._hotword_worker.error.connect(self._on_hotword_error)
-        self._hotword_worker.finished.connect(self._hotword_thread.quit)
-        self._hotword_worker.error.connect(self._hotword_thread.quit)
-        self._hotword_thread.finished.connect(self._hotword_worker.deleteLater)
-        self._hotword_thread.finished.connect(self._hotword_thread.deleteLater)
+    def _on_hotword_job_done(self, job_id: int, value):
+        if self._hotword_job and self._hotword_job.id == job_id:
+            text, result = value if value else ("", None)
+            self._on_hotword_ready(text or "", result)
 
-        self._hotword_thread.start()
+    def _on_hotword_job_failed(self, job_id: int, msg: str):
+        if self._hotword_job and self._hotword_job.id == job_id:
+            self._on_hotword_error(msg)
 
-    def _on_hotword_ready(self, text: str):
-        self._hotword_thread = None
-        self._hotword_worker = None
-        if not text:
-            self._start_hotword_listening()
-            return
+    def _on_hotword_ready(self, text: str, result: KWSResult | None = None):
+        self._hotword_job = None
+        segment, self._hotword_segment = self._hotword_segment, None
 
         lowered = text.lower()
         wake_variants = ("привет маша", "маша")
@@ -1057,8 +1290,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 match_pos = idx
                 match_len = len(w)
 
+        self._finish_hotword_segment(segment, result if match_pos is not None else None)
         if match_pos is None:
-            # no wake word, just resume listening
+            # no wake word (or nothing recognized), just resume listening
             self._start_hotword_listening()
             return
 
@@ -1066,8 +1300,11 @@ class MainWindow(QtWidgets.QMainWindow):
         command = text[match_pos + match_len:].strip()
         command = command.lstrip(" .,!?:;-—\"'«»")
         if not command:
-            self.status.setText("Слушаю команду после \"Маша\"")
-            self._start_hotword_listening()
+            # команда — всё, что сказано после сегмента с "Маша": hotword-рекордер уже пишет это
+            # с конца сегмента, командная запись забирает ту же позицию из истории общего потока
+            from_pos = self.hotword_recorder.start_pos if self._hotword_listening else None
+            if self._start_command_capture(from_pos):
+                self.status.setText("Слушаю команду после \"Маша\"")
             return
 
         self._flash_mic_indicator()
@@ -1075,9 +1312,49 @@ class MainWindow(QtWidgets.QMainWindow):
         self.on_send()
         self._start_hotword_listening()
 
+    def _finish_hotword_segment(self, segment, result: KWSResult | None):
+        """Отпускает аренду сегмента у hotword-рекордера; с результатом KWS — после записи шаблона."""
+        if segment is None:
+            return
+        samples, rate = segment
+        recorder = self.hotword_recorder
+        if not (self.kws and result is not None):
+            recorder.release(samples)
+            return
+        # шаблон пишется в WAV — тоже в потоке воркера; ответ не нужен, его id ни с чем не совпадёт
+        kws, matched = self.kws, result if result.reason == "match" else None
+
+        def enroll(_job):
+            try:
+                kws.enroll(samples, rate, matched)
+            finally:
+                recorder.release(samples)
+
+        self._hotword_jobs.submit(enroll)
+
+    def _start_command_capture(self, from_pos: int | None) -> bool:
+        """Включает запись команды как кнопка микрофона, но с позиции from_pos в общем потоке."""
+        if self._recording:
+            return True
+        self._command_from_pos = from_pos
+        self.btn_mic.blockSignals(True)
+        self.btn_mic.setChecked(True)
+        self.btn_mic.blockSignals(False)
+        self.on_record_toggle(True)
+        return self._recording
+
+    def _on_barge_in(self, event: BargeInEvent):
+        # звук уже заглушён детектором; здесь, вне аудиопотока, дочищаем TTS (очереди, дакинг),
+        # отменяем генерацию и пишем то, что пользователь начал говорить
+        self._stop_speech_output()
+        from_pos = max(0, event.speech_pos - int(self._capture_preroll_sec * self.capture.sample_rate))
+        if self.recognizer and self._start_command_capture(from_pos):
+            self.status.setText("Слушаю…")
+
     def _on_hotword_error(self, msg: str):
-        self._hotword_thread = None
-        self._hotword_worker = None
+        self._hotword_job = None
+        segment, self._hotword_segment = self._hotword_segment, None
+        self._finish_hotword_segment(segment, None)
         self.status.setText(f"Hotword ASR error: {msg}")
         self._start_hotword_listening()
 
@@ -1107,28 +1384,33 @@ class MainWindow(QtWidgets.QMainWindow):
         except Exception:
             pass
 
-        try:
-            if self._asr_thread and self._asr_thread.isRunning():
-                self._asr_thread.requestInterruption()
-                self._asr_thread.quit()
-                self._asr_thread.wait(1000)
-        except Exception as e:
-            logger.warning("ASR thread shutdown failed: %s", e)
+        for jobs in (self._llm_jobs, self._asr_jobs, self._hotword_jobs, *self._retired_llm_jobs):
+            try:
+                logger.info("Job worker %s stats: %s", jobs.name, jobs.stats())
+                jobs.shutdown(1000)
+            except Exception as e:
+                logger.warning("Job worker %s shutdown failed: %s", jobs.name, e)
 
-        try:
-            if self._hotword_thread and self._hotword_thread.isRunning():
-                self._hotword_thread.requestInterruption()
-                self._hotword_thread.quit()
-                self._hotword_thread.wait(1000)
-        except Exception as e:
-            logger.warning("Hotword thread shutdown failed: %s", e)
+        if self.kws:
+            logger.info("KWS stats: %s", self.kws.stats())
+        if self.barge_in:
+            logger.info("Barge-in stats: %s", self.barge_in.stats())
+        logger.info("Chat render stats: %s", self._renderer.stats())
+        if self._streaming_asr:
+            self._streaming_asr.cancel()
 
         for rec in (getattr(self, "recorder", None), getattr(self, "hotword_recorder", None)):
             try:
                 if rec:
-                    rec.stop()
+                    rec.stop(keep=False)
+                    logger.info("Recorder stats: %s", rec.stats())
             except Exception:
                 pass
+        try:
+            logger.info("Capture hub stats: %s", self.capture.stats())
+            self.capture.close()
+        except Exception as e:
+            logger.warning("capture hub close failed: %s", e)
 
         try:
             if getattr(self.agent, "tts", None):
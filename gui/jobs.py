@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+from PySide6 import QtCore
+
+logger = logging.getLogger(__name__)
+
+# id задач общие для всех воркеров: сигналы замененного воркера не спутать с задачами нового
+_job_ids = itertools.count(1)
+
+
+class CancelToken(threading.Event):
+    """Флаг отмены задачи; это threading.Event, его можно отдать туда, где ждут cancel_event."""
+
+    def cancel(self):
+        self.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.is_set()
+
+
+class Job:
+    def __init__(self, job_id: int, fn: Callable[["Job"], Any], worker: "JobWorker"):
+        self.id = job_id
+        self.fn = fn
+        self.token = CancelToken()
+        self.submitted = time.perf_counter()
+        self._worker = worker
+
+    def progress(self, value: Any):
+        """Промежуточный результат (например, кусок стрима) — уходит в GUI-поток сигналом progress."""
+        if not self.token.cancelled:
+            self._worker.progress.emit(self.id, value)
+
+
+class JobWorker(QtCore.QThread):
+    """
+    Долгоживущий поток для одного типа задач (командный ASR, hotword ASR, стрим LLM).
+    Задачи идут из очереди по одной; результат — сигналами с id задачи, так что ответ
+    отменённой или устаревшей задачи легко отбросить. Поток создаётся один раз на всё приложение
+    и заменяется, только если застрял на отменённой задаче (retire).
+    """
+
+    finished_job = QtCore.Signal(int, object)
+    failed = QtCore.Signal(int, str)
+    progress = QtCore.Signal(int, object)
+
+    def __init__(self, name: str, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self.setObjectName(name)
+        self.name = name
+        self._queue: queue.Queue[Job | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending: list[Job] = []
+        self._current: Job | None = None
+        self._done = 0
+        self._cancelled = 0
+        self._wait_sec = 0.0
+        self._wait_max = 0.0
+        self._run_sec = 0.0
+        self._depth_max = 0
+
+    def submit(self, fn: Callable[[Job], Any]) -> Job:
+        """
+        fn(job) выполняется в потоке воркера; его результат приходит в finished_job.
+        Если задачу отменили, пока она ждала в очереди, fn не вызывается — вместо него зовётся
+        fn.on_cancel(), если он есть (освободить то, что задача держит с момента создания).
+        """
+        job = Job(next(_job_ids), fn, self)
+        with self._lock:
+            self._pending.append(job)
+            self._depth_max = max(self._depth_max, len(self._pending))
+        self._queue.put(job)
+        if not self.isRunning():
+            self.start()
+        return job
+
+    def cancel_all(self):
+        """Отменяет текущую задачу и всё, что ждёт в очереди."""
+        with self._lock:
+            jobs = list(self._pending) + ([self._current] if self._current else [])
+        for job in jobs:
+            job.token.cancel()
+
+    @property
+    def busy(self) -> bool:
+        """Выполняется ли сейчас задача (в том числе уже отменённая, но ещё не вернувшаяся)."""
+        with self._lock:
+            return self._current is not None
+
+    def retire(self):
+        """
+        Отменяет всё и просит поток завершиться, не дожидаясь его: поток выйдет, когда вернётся
+        текущая задача. Для воркера, застрявшего на отменённой задаче, — новые задачи идут в новый.
+        """
+        self.cancel_all()
+        self._queue.put(None)
+
+    def run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            started = time.perf_counter()
+            with self._lock:
+                self._pending.remove(job)
+                self._current = job
+                waited = started - job.submitted
+                self._wait_sec += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                if job.token.cancelled:
+                    result, error = None, None
+                    on_cancel = getattr(job.fn, "on_cancel", None)
+                    if on_cancel is not None:
+                        on_cancel()
+                else:
+                    result, error = job.fn(job), None
+            except Exception as e:
+                result, error = None, str(e)
+            with self._lock:
+                self._current = None
+                self._run_sec += time.perf_counter() - started
+                if job.token.cancelled:
+                    self._cancelled += 1
+                else:
+                    self._done += 1
+            if job.token.cancelled:
+                continue
+            if error is not None:
+                self.failed.emit(job.id, error)
+            else:
+                self.finished_job.emit(job.id, result)
+
+    def shutdown(self, wait_ms: int = 1000):
+        self.retire()
+        if self.isRunning() and not self.wait(wait_ms):
+            logger.warning("Job worker %s did not stop in %d ms", self.name, wait_ms)
+
+    def stats(self) -> dict:
+        """Глубина очереди (сейчас и максимум), ожидание до старта (сред./макс.) и время выполнения."""
+        with self._lock:
+            started = self._done + self._cancelled
+            return {
+                "queue_depth": len(self._pending),
+                "queue_depth_max": self._depth_max,
+                "busy": self._current is not None,
+                "done": self._done,
+                "cancelled": self._cancelled,
+                "wait_avg": self._wait_sec / started if started else 0.0,
+                "wait_max": self._wait_max,
+                "run_avg": self._run_sec / started if started else 0.0,
+            }
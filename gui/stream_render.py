@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from PySide6 import QtCore
+
+logger = logging.getLogger(__name__)
+
+FENCES = ("```", "~~~")
+
+
+class MarkdownBlocks:
+    """
+    Режет Markdown, приходящий кусками, на законченные блоки. Блок закончен, когда после пустой строки
+    начинается новая строка без отступа (отступ — продолжение пункта списка) вне блока кода.
+    Законченный блок больше не меняется — его можно отрисовать один раз; tail — незаконченный хвост.
+    Просматриваются только новые целые строки, так что feed() не зависит от длины всего ответа.
+    """
+
+    def __init__(self):
+        self.tail = ""
+        self._scanned = 0  # сколько символов tail уже просмотрено (только целые строки)
+        self._fence: str | None = None
+        self._blank = False
+
+    def feed(self, chunk: str) -> list[str]:
+        """Добавляет кусок; возвращает блоки, которые с ним закончились."""
+        self.tail += chunk
+        done = []
+        start, pos = 0, self._scanned
+        while True:
+            nl = self.tail.find("\n", pos)
+            if nl < 0:
+                break
+            line = self.tail[pos:nl]
+            stripped = line.strip()
+            if self._fence:
+                if stripped.startswith(self._fence) and not stripped.strip(self._fence[0]):
+                    self._fence = None
+            elif not stripped:
+                self._blank = True
+            else:
+                if self._blank and not line[:1].isspace() and self.tail[start:pos].strip():
+                    done.append(self.tail[start:pos].strip("\n"))
+                    start = pos
+                self._blank = False
+                if stripped.startswith(FENCES):
+                    self._fence = stripped[:3]
+            pos = nl + 1
+        self.tail = self.tail[start:]
+        self._scanned = pos - start
+        return done
+
+
+class StreamRenderer(QtCore.QObject):
+    """
+    Вывод стрима LLM в пузырь: куски копятся и отдаются пузырю раз в кадр (frame_ms),
+    после кадра — одна прокрутка чата. Считает время GUI-потока на отрисовку каждого ответа.
+    """
+
+    def __init__(self, frame_ms: int = 25, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self.frame_ms = frame_ms
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._frame)
+        self._bubble = None
+        self._chat = None
+        self._chunks = 0
+        self._frames = 0
+        self._gui_sec = 0.0
+        self.replies = 0
+        self.ms_per_1k: list[float] = []
+
+    def start(self, bubble, chat):
+        self.finish()
+        self._bubble, self._chat = bubble, chat
+        self._chunks = self._frames = 0
+        self._gui_sec = 0.0
+
+    def push(self, chunk: str):
+        if self._bubble is None:
+            return
+        self._bubble.feed(chunk)
+        self._chunks += 1
+        if not self._timer.isActive():
+            self._timer.start(self.frame_ms)
+
+    def _frame(self):
+        if self._bubble is None:
+            return
+        t0 = time.perf_counter()
+        self._bubble.flush()
+        self._chat.scroll_to_bottom()
+        self._frames += 1
+        self._gui_sec += time.perf_counter() - t0
+
+    def finish(self):
+        """Дорисовывает остаток и сворачивает пузырь в единый документ; без активного стрима ничего не делает."""
+        if self._bubble is None:
+            return
+        self._timer.stop()
+        t0 = time.perf_counter()
+        self._bubble.finish()
+        self._chat.scroll_to_bottom()
+        self._gui_sec += time.perf_counter() - t0
+        self._bubble = self._chat = None
+        if self._chunks:
+            self.replies += 1
+            self.ms_per_1k.append(self._gui_sec * 1000 / self._chunks * 1000)
+            logger.info("Stream render: %d chunks in %d frames, GUI thread %.1f ms",
+                        self._chunks, self._frames + 1, self._gui_sec * 1000)
+
+    def stats(self) -> dict:
+        """Время GUI-потока на 1000 кусков (≈ токенов) ответа: среднее и максимум по ответам."""
+        ms = self.ms_per_1k
+        return {
+            "replies": self.replies,
+            "gui_ms_per_1k_avg": sum(ms) / len(ms) if ms else 0.0,
+            "gui_ms_per_1k_max": max(ms) if ms else 0.0,
+        }
+
+
+def _bench() -> None:
+    """
+    python -m gui.stream_render [токенов]: время GUI-потока на отрисовку ответа из N токенов —
+    старый путь (setText всего текста на каждый токен + два таймера прокрутки) против StreamRenderer.
+    Токены приходят с реальным темпом стрима (~5 мс), время меряется только внутри обработчиков.
+    """
+    import re
+    import sys
+
+    from PySide6 import QtWidgets
+
+    from gui.gui import Bubble, ChatArea
+    from gui.styles import MASHA_QSS
+
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    text = ("Вот **короткий** ответ с `кодом` и [ссылкой](https://example.com): " + "слово " * 30
+            + "\n\n- пункт списка\n- ещё пункт\n\n```python\nprint('hi')\n```\n\n")
+    words = re.findall(r"\S+\s*", text)
+    pieces = (words * (tokens // len(words) + 1))[:tokens]
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    app.setStyleSheet(MASHA_QSS)
+
+    def run(legacy: bool) -> float:
+        chat = ChatArea()
+        chat.resize(720, 900)
+        chat.show()
+        bubble = Bubble("", is_user=False)
+        bubble.set_max_width(700)
+        chat.add_row(bubble, right=False)
+        renderer = StreamRenderer()
+        renderer.start(bubble, chat)
+        spent = 0.0
+        for piece in pieces:
+            t0 = time.perf_counter()
+            if legacy:
+                bubble.label.setText(bubble.label.text() + piece)
+                bar = chat.verticalScrollBar()
+                QtCore.QTimer.singleShot(0, lambda: bar.setValue(bar.maximum()))
+                QtCore.QTimer.singleShot(15, lambda: bar.setValue(bar.maximum()))
+            else:
+                renderer.push(piece)
+            app.processEvents()
+            spent += time.perf_counter() - t0
+            time.sleep(0.005)
+        t0 = time.perf_counter()
+        renderer.finish()
+        app.processEvents()
+        spent += time.perf_counter() - t0
+        chat.close()
+        return spent
+
+    before, after = run(legacy=True), run(legacy=False)
+    print(f"{tokens} tokens: legacy {before * 1000:.0f} ms, frame-batched {after * 1000:.0f} ms "
+          f"of GUI thread ({before / max(after, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    _bench()
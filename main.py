@@ -1,5 +1,7 @@
 import logging
 import faulthandler
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -9,11 +11,16 @@ from PySide6.QtWidgets import QApplication
 from brain.client import LLMClient
 from brain.support_model import MiniCommandModel
 from core.agent import Agent
+from core.compute import configure_governor
+from core.inference_host import InferenceHost, RemoteRecognizer, RemoteTTSBackend
 from core.tts import SileroTTSStreamer
+from core.tts_backends import backend_from_env, sample_rate_from_env
+from core.tts_cache import DEFAULT_PREWARM_PHRASES, TTSAudioCache
+from core.tts_model import TTSModelLoader
 from core.voice import HFWhisperRecognizer
 from gui.gui import MainWindow
 from tools.env_tools import load_settings, read_env
-from tools.system import open_app, list_running_apps
+from tools.system import open_app, list_running_apps, warm_app_index
 
 faulthandler.enable()
 
@@ -24,18 +31,24 @@ class ResourceLoader(QtCore.QObject):
     error = QtCore.Signal(str)
     finished = QtCore.Signal()
 
-    def __init__(self, env: dict[str, str], agent: Agent):
+    def __init__(self, env: dict[str, str], agent: Agent, host: InferenceHost | None = None):
         super().__init__()
         self.env = env
         self.agent = agent
+        self.host = host
         self.logger = logging.getLogger(__name__)
 
     @QtCore.Slot()
     def run(self):
+        t0 = time.perf_counter()
         try:
-            recognizer = HFWhisperRecognizer.from_env(self.env)
+            if self.host is not None:
+                self.host.warm("load_asr", background=False)
+                recognizer = RemoteRecognizer(self.host)
+            else:
+                recognizer = HFWhisperRecognizer.from_env(self.env)
             self.recognizer_ready.emit(recognizer)
-            self.logger.info("ASR model loaded")
+            self.logger.info("ASR model ready in %.2f s", time.perf_counter() - t0)
         except Exception as e:
             self.error.emit(f"ASR load failed: {e}")
 
@@ -82,20 +95,46 @@ if __name__ == "__main__":
         h.setFormatter(formatter)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+    # индекс приложений строится в фоне, пока грузятся модели, — первый open_app его уже не ждёт
+    threading.Thread(target=warm_app_index, name="app-index-warmup", daemon=True).start()
+
     settings = load_settings()
     env = read_env(".env")
     voice_enabled = (env.get("VOICE_ENABLED", "1") == "1")
+    governor = configure_governor(env)
 
     llm_client = LLMClient(model=settings.main_model)
     mini_llm = MiniCommandModel(model=settings.mini_model)
 
+    tts_cache = TTSAudioCache(
+        max_bytes=int(env.get("TTS_CACHE_MB", "64")) * 1024 * 1024,
+        disk_dir=env.get("TTS_CACHE_DIR", "cache/tts") or None,
+        max_disk_bytes=int(env.get("TTS_CACHE_DISK_MB", "256")) * 1024 * 1024,
+    )
+    prewarm_raw = env.get("TTS_PREWARM_PHRASES", "").strip()
+    prewarm_phrases = [p.strip() for p in prewarm_raw.split("|") if p.strip()] if prewarm_raw \
+        else list(DEFAULT_PREWARM_PHRASES)
+
+    # модель TTS грузится в фоне из локального артефакта — окно не ждёт её
+    # INFERENCE_HOST=1 — ASR и TTS работают в отдельном процессе, аудио ходит через shared memory
+    inference_host = InferenceHost(env).start() if env.get("INFERENCE_HOST", "0") == "1" else None
+
+    tts_model = TTSModelLoader.from_env(env)
+    tts_backend = RemoteTTSBackend(inference_host) if inference_host else backend_from_env(env, tts_model)
+    tts_sample_rate = sample_rate_from_env(env)
+    if voice_enabled:
+        tts_backend.start()
 
     def _tts_factory():
         logging.getLogger(__name__).info("Initializing TTS streamer")
         return SileroTTSStreamer(
             speaker="kseniya",
+            sample_rate=tts_sample_rate,
             debug=True,
             block_output=True,
+            cache=tts_cache,
+            prewarm_phrases=prewarm_phrases,
+            backend=tts_backend,
         )
 
     if not list_running_apps("Ollama")["running"]:
@@ -114,7 +153,7 @@ if __name__ == "__main__":
     window = MainWindow(agent, env_path=".env", recognizer=None)
     window.show()
 
-    loader = ResourceLoader(env, agent)
+    loader = ResourceLoader(env, agent, inference_host)
     loader_thread = QtCore.QThread()
     loader.moveToThread(loader_thread)
     loader_thread.started.connect(loader.run)
@@ -142,3 +181,8 @@ if __name__ == "__main__":
             active_tts.shutdown()
     except Exception as e:
         logging.getLogger(__name__).warning("Failed to shutdown TTS: %s", e)
+
+    logging.getLogger(__name__).info("Compute governor stats: %s", governor.stats())
+
+    if inference_host is not None:
+        inference_host.close()
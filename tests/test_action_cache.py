@@ -0,0 +1,40 @@
+import time
+
+from core.action_cache import ActionCache
+
+
+def test_entries_expire_after_ttl():
+    cache = ActionCache()
+    cache.put("get_volume", None, 40, ttl=0.05, tags=("volume",))
+    assert cache.get("get_volume", None) == (True, 40)
+    time.sleep(0.06)
+    assert cache.get("get_volume", None) == (False, None)
+    assert cache.stats()["get_volume"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_zero_ttl_is_not_cached():
+    cache = ActionCache()
+    cache.put("get_volume", None, 40, ttl=0)
+    assert cache.get("get_volume", None) == (False, None)
+
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = ActionCache()
+    cache.put("get_volume", None, 40, ttl=10, tags=("volume",))
+    cache.put("list_running_apps", "Music", ["Music"], ttl=10, tags=("apps",))
+    assert cache.invalidate(["volume"]) == 1
+    assert cache.get("get_volume", None) == (False, None)
+    assert cache.get("list_running_apps", "Music") == (True, ["Music"])
+    assert cache.invalidate([]) == 0
+
+
+def test_read_that_raced_a_write_is_not_cached():
+    cache = ActionCache()
+    versions = cache.versions(["volume"])
+    # set_volume успел отработать, пока get_volume читал старый уровень
+    cache.invalidate(["volume"])
+    cache.put("get_volume", None, 40, ttl=10, tags=("volume",), versions=versions)
+    assert cache.get("get_volume", None) == (False, None)
+
+    cache.put("get_volume", None, 60, ttl=10, tags=("volume",), versions=cache.versions(["volume"]))
+    assert cache.get("get_volume", None) == (True, 60)
@@ -0,0 +1,83 @@
+import threading
+
+from tools.app_index import AppEntry, AppIndex, StaticAppSource
+
+
+def _entry(name: str, *names: str) -> AppEntry:
+    return AppEntry(name=name, path=f"/Applications/{name}.app", names=(name, *names))
+
+
+APPS = [
+    _entry("Telegram"),
+    _entry("Music", "Музыка"),
+    _entry("Safari"),
+    _entry("Photo Pro 1"),
+    _entry("Pro Studio"),
+    _entry("Proxyman"),
+    _entry("Visual Studio Code"),
+]
+
+
+class SlowSource(StaticAppSource):
+    """Сборка ждёт сигнала — как первый скан /Applications при старте."""
+
+    def __init__(self, entries):
+        super().__init__(entries)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def scan(self):
+        self.started.set()
+        self.release.wait(5)
+        return super().scan()
+
+
+def test_exact_alias_translit_and_fuzzy():
+    index = AppIndex(StaticAppSource(APPS))
+    assert index.resolve("музыка").entry.name == "Music"
+    assert index.resolve("телега").entry.name == "Telegram"
+    assert index.resolve("сафари").kind == "exact"
+    match = index.resolve("vscode")
+    assert match.entry.name == "Visual Studio Code" and match.kind == "exact"
+    assert index.resolve("telgram").kind == "fuzzy"
+    assert index.resolve("калькулятор") is None
+
+
+def test_prefix_must_be_unique_or_cover_most_of_the_name():
+    index = AppIndex(StaticAppSource(APPS))
+    match = index.resolve("teleg")
+    assert (match.entry.name, match.kind) == ("Telegram", "prefix")
+    # «pro» — начало и Pro Studio, и Proxyman: короткий неоднозначный префикс не открывает ничего
+    assert index.resolve("pro") is None
+    assert index.resolve("pro stud").entry.name == "Pro Studio"
+    assert index.resolve("proxy").entry.name == "Proxyman"
+
+
+def test_resolve_waits_for_the_first_build():
+    source = SlowSource(APPS)
+    index = AppIndex(source)
+    warmup = threading.Thread(target=index.refresh, kwargs={"force": True})
+    warmup.start()
+    assert source.started.wait(5)
+
+    result = []
+    lookup = threading.Thread(target=lambda: result.append(index.resolve("Telegram")))
+    lookup.start()
+    lookup.join(0.2)
+    assert lookup.is_alive()  # ждёт сборку, а не ищет по пустому индексу
+
+    source.release.set()
+    warmup.join(5)
+    lookup.join(5)
+    assert result[0] is not None and result[0].entry.name == "Telegram"
+
+
+def test_rebuilds_only_when_signature_changes():
+    source = StaticAppSource(APPS[:2])
+    index = AppIndex(source, check_interval=0.0)
+    assert index.resolve("Safari") is None
+    assert not index.refresh()
+    source.entries = APPS
+    source.version += 1
+    assert index.refresh()
+    assert index.resolve("Safari").entry.name == "Safari"
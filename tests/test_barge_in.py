@@ -0,0 +1,87 @@
+import numpy as np
+
+from core.barge_in import BargeInDetector
+from core.vad import BandMeter
+
+MIC_RATE = 16000
+TTS_RATE = 24000
+BLOCK = 512  # блок RingBufferOutput при 24 кГц
+
+
+def _voice(f0: float, t: np.ndarray) -> np.ndarray:
+    # гармоники с огибающей «слогов» — спектр речевой, не плоский
+    harmonics = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 15))
+    return (0.1 * harmonics * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)).astype(np.float32)
+
+
+def _tts(t: np.ndarray) -> np.ndarray:
+    # слова по 0.45 с с паузами 0.25 с
+    return _voice(150, t) * ((t % 0.7) < 0.45)
+
+
+class FakeOutput:
+    """Как RingBufferOutput: уровень каждого отданного блока тем же BandMeter."""
+
+    def __init__(self):
+        self.meter = BandMeter(TTS_RATE)
+        self.levels: list[float] = []
+
+    def play(self, block: np.ndarray):
+        self.levels.append(self.meter.power(block))
+
+    def recent_level_db(self, window_sec: float) -> float:
+        blocks = max(1, int(window_sec * TTS_RATE / BLOCK))
+        return float(10 * np.log10(max(self.levels[-blocks:], default=0.0) + 1e-10))
+
+
+class FakeTTS:
+    is_speaking = True
+
+    def __init__(self):
+        self.output = FakeOutput()
+        self.interrupted = False
+
+    def silence(self):
+        self.interrupted = True
+
+
+def _run(coupling_db: float, user_db: float | None = None, user_from: float = 2.0, seconds: float = 4.0):
+    tts = FakeTTS()
+    fired = []
+    detector = BargeInDetector(lambda: tts, on_barge_in=fired.append, sample_rate=MIC_RATE)
+    gain = 10 ** (coupling_db / 20)
+    noise = np.random.default_rng(0).normal(0, 1e-3, int(seconds * MIC_RATE)).astype(np.float32)
+    for k in range(int(seconds * TTS_RATE / BLOCK)):
+        t_out = (k * BLOCK + np.arange(BLOCK)) / TTS_RATE
+        tts.output.play(_tts(t_out))
+        a, b = (round(x * BLOCK * MIC_RATE / TTS_RATE) for x in (k, k + 1))
+        t_mic = np.arange(a, b) / MIC_RATE
+        # эхо — тот же голос через динамик с задержкой 10 мс
+        mic = gain * _tts(t_mic - 0.010) + noise[a:b]
+        if user_db is not None:
+            mic = mic + 10 ** (user_db / 20) * _voice(220, t_mic) * (t_mic >= user_from)
+        detector.on_audio(mic.astype(np.float32), a)
+        if fired:
+            break
+    return detector, fired
+
+
+def test_echo_alone_never_triggers():
+    for coupling_db in (-40.0, -30.0, -20.0, -6.0, -3.0):
+        _, fired = _run(coupling_db)
+        assert not fired, coupling_db
+
+
+def test_coupling_adapts_to_echo():
+    # стартовая оценка -10 дБ; эхо заметно выше шумового пола — связь сходится к настоящей
+    for coupling_db in (-20.0, -6.0):
+        detector, _ = _run(coupling_db)
+        assert abs(detector.coupling_db - coupling_db) < 3.0, (coupling_db, detector.coupling_db)
+
+
+def test_user_speech_over_echo_triggers():
+    detector, fired = _run(-20.0, user_db=-6.0)
+    assert fired
+    start = fired[0].speech_pos / MIC_RATE
+    assert 2.0 <= start < 2.1
+    assert fired[0].detect_delay <= 0.1
@@ -0,0 +1,83 @@
+import datetime
+
+from tools.calendar_index import CalendarEvent, CalendarService, StaticEventSource
+
+
+def _at(days: int, hour: int) -> int:
+    day = datetime.date.today() + datetime.timedelta(days=days)
+    return int(datetime.datetime.combine(day, datetime.time(hour)).timestamp())
+
+
+def _day(days: int) -> tuple[int, int]:
+    return _at(days, 0), _at(days + 1, 0)
+
+
+EVENTS = [
+    CalendarEvent("a", "Планёрка", "Работа", _at(0, 10), _at(0, 11)),
+    CalendarEvent("b", "Спортзал", "Дом", _at(0, 18), _at(0, 19)),
+    # через полночь — попадает в оба дня
+    CalendarEvent("c", "Поезд", "Дом", _at(1, 22), _at(2, 6)),
+    CalendarEvent("d", "Отчёт", "Работа", _at(3, 9), _at(3, 10)),
+]
+
+
+def _titles(events):
+    return [e.title for e in events]
+
+
+def test_window_queries_are_served_from_the_index():
+    source = StaticEventSource(EVENTS)
+    service = CalendarService(source)
+    service.warm()
+    assert source.fetch_calls == 1
+
+    assert _titles(service.query(*_day(0))) == ["Планёрка", "Спортзал"]
+    assert _titles(service.query(_day(1)[0], _day(2)[1])) == ["Поезд"]
+    assert _titles(service.query(_day(0)[0], _day(4)[1], calendars=["Работа"])) == ["Планёрка", "Отчёт"]
+    assert source.fetch_calls == 1
+    assert service.stats()["hits"] == 3
+
+
+def test_missing_days_load_in_one_fetch_and_outside_window_goes_direct():
+    source = StaticEventSource(EVENTS)
+    service = CalendarService(source, days_back=1, days_ahead=5)
+    assert _titles(service.query(_day(0)[0], _day(3)[1])) == ["Планёрка", "Спортзал", "Поезд", "Отчёт"]
+    assert source.fetch_calls == 1
+    assert service.stats()["indexed_days"] == 4
+
+    service.query(*_day(30))
+    service.query(*_day(30))
+    assert source.fetch_calls == 3
+    assert service.stats()["indexed_days"] == 4
+
+
+def test_change_notification_invalidates_only_touched_days():
+    source = StaticEventSource(EVENTS)
+    service = CalendarService(source)
+    service.warm()
+
+    source.events.append(CalendarEvent("e", "Созвон", "Работа", _at(3, 15), _at(3, 16)))
+    source.notify(_day(3))
+    assert _titles(service.query(*_day(0))) == ["Планёрка", "Спортзал"]
+    assert source.fetch_calls == 1
+    assert _titles(service.query(*_day(3))) == ["Отчёт", "Созвон"]
+    assert source.fetch_calls == 2
+
+    source.notify(None)
+    assert service.stats()["indexed_days"] == 0
+
+
+def test_change_during_fetch_is_not_cached():
+    class RacingSource(StaticEventSource):
+        def fetch(self, start_epoch, end_epoch):
+            events = super().fetch(start_epoch, end_epoch)
+            if self.fetch_calls == 1:
+                # событие поменялось, пока индекс читал источник
+                self.notify(None)
+            return events
+
+    source = RacingSource(EVENTS)
+    service = CalendarService(source)
+    assert _titles(service.query(*_day(0))) == ["Планёрка", "Спортзал"]
+    assert service.stats()["indexed_days"] == 0
+    assert source.fetch_calls == 2
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from core.executor import ActionExecutor, ActionTimeout, time_left
+
+
+def test_slow_action_times_out_without_blocking_the_caller():
+    executor = ActionExecutor(max_workers=2)
+    release = threading.Event()
+    try:
+        future, deadline = executor.submit(lambda: release.wait(5), "shell", timeout=0.1)
+        t0 = time.monotonic()
+        with pytest.raises(ActionTimeout):
+            executor.wait(future, deadline)
+        assert time.monotonic() - t0 < 0.5
+        assert executor.timeouts == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_class_limit_bounds_parallelism_and_waiting_for_a_slot_counts_against_the_deadline():
+    executor = ActionExecutor(max_workers=4, class_limits={"osascript": 1})
+    release = threading.Event()
+    try:
+        busy, busy_deadline = executor.submit(lambda: release.wait(5), "osascript", timeout=2.0)
+        queued, queued_deadline = executor.submit(lambda: "done", "osascript", timeout=0.1)
+        # другой класс свой слот получает сразу
+        other, other_deadline = executor.submit(lambda: "shell", "shell", timeout=1.0)
+        assert executor.wait(other, other_deadline) == "shell"
+        with pytest.raises(ActionTimeout, match="слота"):
+            queued.result(timeout=1.0)
+        release.set()
+        assert executor.wait(busy, busy_deadline) is True
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_time_left_is_capped_by_the_action_deadline():
+    executor = ActionExecutor(max_workers=1)
+    try:
+        assert time_left(30.0) == 30.0
+        future, deadline = executor.submit(lambda: time_left(30.0), "shell", timeout=0.5)
+        assert 0.05 <= executor.wait(future, deadline) <= 0.5
+    finally:
+        executor.shutdown()
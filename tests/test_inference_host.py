@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from core.inference_host import _SharedBuffer
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# отдельный интерпретатор со своим resource_tracker: при выходе он удалил бы всё, что в нём зарегистрировано
+ATTACH = """
+import sys
+import numpy as np
+from core.inference_host import _AttachedBuffer
+buf = _AttachedBuffer()
+data = buf.view(sys.argv[1], int(sys.argv[2]), np.float32)
+assert float(data.sum()) == float(sys.argv[3]), data.sum()
+buf.close()
+"""
+
+
+def test_attached_segment_survives_detach_and_process_exit():
+    owner = _SharedBuffer()
+    data = np.arange(1000, dtype=np.float32)
+    name, nbytes = owner.write(data)
+    try:
+        proc = subprocess.run([sys.executable, "-c", ATTACH, name, str(nbytes), str(float(data.sum()))],
+                              cwd=ROOT, capture_output=True, text=True, timeout=60)
+        assert proc.returncode == 0, proc.stderr
+        assert "leaked shared_memory" not in proc.stderr
+
+        # подключившийся процесс вышел, а сегмент владельца цел
+        shm = SharedMemory(name=name)
+        assert np.array_equal(np.ndarray(data.shape, np.float32, buffer=shm.buf), data)
+        shm.close()
+    finally:
+        owner.release()
@@ -0,0 +1,45 @@
+from core.planner import plan_turn
+
+
+def _steps(plan):
+    return [(s.action, s.args, s.origins) for s in plan.steps]
+
+
+def test_volume_intents_fold_into_one_step():
+    plan = plan_turn([("set_volume", {"level": 40}), ("change_volume", {"delta": "+10"})])
+    assert _steps(plan) == [("set_volume", {"level": 50}, [0, 1])]
+
+
+def test_malformed_volume_args_are_not_folded():
+    plan = plan_turn([
+        ("set_volume", {"level": None}),
+        ("change_volume", {"delta": "больше"}),
+        ("change_volume", {"delta": 10}),
+        ("set_volume", {}),
+        ("change_volume", {"delta": "5%"}),
+        ("change_volume", {"delta": float("inf")}),
+    ])
+    # битые интенты остаются отдельными шагами (и упадут сами) и разрывают серию числовых
+    assert [(a, o) for a, _, o in _steps(plan)] == [
+        ("set_volume", [0]),
+        ("change_volume", [1]),
+        ("change_volume", [2]),
+        ("set_volume", [3]),
+        ("change_volume", [4]),
+        ("change_volume", [5]),
+    ]
+    assert plan.steps[2].args == {"delta": 10}
+
+
+def test_volume_runs_keep_order_around_other_actions():
+    plan = plan_turn([
+        ("set_volume", {"level": 20}),
+        ("open_app", {"app_name": "Music"}),
+        ("set_volume", {"level": 60}),
+        ("change_volume", {"delta": "-10"}),
+    ])
+    assert _steps(plan) == [
+        ("set_volume", {"level": 20}, [0]),
+        ("open_app", {"app_name": "Music"}, [1]),
+        ("set_volume", {"level": 50}, [2, 3]),
+    ]
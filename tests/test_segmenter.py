@@ -0,0 +1,51 @@
+from core.segmenter import PhraseSegmenter
+
+TEXT = ("Хорошо, сейчас посмотрю погоду в Москве, и скажу тебе. Завтра будет тепло и солнечно, "
+        "до двадцати градусов. Вечером возможен небольшой дождь, так что возьми зонт. Хорошего дня!")
+
+PHRASES = [
+    "Хорошо, сейчас посмотрю погоду в Москве,",
+    "и скажу тебе. Завтра будет тепло и солнечно, до двадцати градусов.",
+    "Вечером возможен небольшой дождь, так что возьми зонт.",
+]
+
+
+def _stream(segmenter: PhraseSegmenter, text: str, step: int) -> list[str]:
+    out = []
+    for i in range(0, len(text), step):
+        out += segmenter.feed(text[i:i + step])
+    return out
+
+
+def test_first_phrase_leaves_at_a_clause_and_later_ones_at_sentence_ends():
+    segmenter = PhraseSegmenter()
+    assert segmenter.feed(TEXT) == PHRASES
+    assert segmenter.flush() == "Хорошего дня!"
+    assert segmenter.emitted == 0
+
+
+def test_phrases_do_not_depend_on_chunk_size():
+    for step in (1, 2, 3, 7, 40):
+        segmenter = PhraseSegmenter()
+        assert _stream(segmenter, TEXT, step) == PHRASES, step
+        assert segmenter.flush() == "Хорошего дня!"
+
+
+def test_long_sentence_without_a_stop_is_cut_at_clauses():
+    segmenter = PhraseSegmenter()
+    segmenter.feed("Да, конечно, давай разберёмся с этим вопросом подробнее. ")
+    items = ", ".join(f"пункт номер {i} про важное" for i in range(8))
+    phrases = _stream(segmenter, "Сначала " + items + " ", 5)
+    assert phrases and all(p.endswith(",") for p in phrases)
+
+
+def test_short_tail_is_dropped_and_non_final_flush_keeps_the_pace():
+    segmenter = PhraseSegmenter()
+    assert segmenter.feed("Ок. ") == []
+    assert segmenter.flush() is None
+
+    segmenter.feed("Да, конечно, давай разберёмся с этим вопросом подробнее. Ну")
+    assert segmenter.flush(final=False) is None
+    # продолжение того же высказывания — уже не «первая фраза», ранний рез по запятой не нужен
+    assert segmenter.emitted == 2
+    assert segmenter.feed("Это вторая часть, она идёт сразу. ") == []
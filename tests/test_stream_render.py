@@ -0,0 +1,44 @@
+from gui.stream_render import MarkdownBlocks
+
+TEXT = (
+    "# Заголовок\n\nПервый абзац\nпродолжение.\n\n"
+    "- пункт\n\n  продолжение пункта\n- ещё\n\n"
+    "```python\nx = 1\n\ny = 2\n```\n\nКонец"
+)
+
+BLOCKS = [
+    "# Заголовок",
+    "Первый абзац\nпродолжение.",
+    # строка с отступом после пустой — продолжение пункта, а не новый блок
+    "- пункт\n\n  продолжение пункта\n- ещё",
+]
+
+
+def _stream(blocks: MarkdownBlocks, text: str, step: int) -> list[str]:
+    out = []
+    for i in range(0, len(text), step):
+        out += blocks.feed(text[i:i + step])
+    return out
+
+
+def test_finished_blocks_do_not_depend_on_chunk_size():
+    for step in (1, 3, 7, len(TEXT)):
+        blocks = MarkdownBlocks()
+        assert _stream(blocks, TEXT, step) == BLOCKS, step
+        # блок кода с пустой строкой внутри не закрыт, пока после него не начался следующий
+        assert blocks.tail.startswith("```python\nx = 1\n\ny = 2\n```")
+        assert blocks.tail.endswith("Конец")
+
+
+def test_fenced_block_ends_only_after_the_closing_fence():
+    blocks = MarkdownBlocks()
+    assert blocks.feed("~~~\nкод\n\nещё код\n") == []
+    assert blocks.feed("~~~\n\nТекст\n") == ["~~~\nкод\n\nещё код\n~~~"]
+    assert blocks.tail == "Текст\n"
+
+
+def test_partial_line_is_not_scanned_until_it_ends():
+    blocks = MarkdownBlocks()
+    assert blocks.feed("Абзац\n\nНов") == []
+    assert blocks.feed("ый\n") == ["Абзац"]
+    assert blocks.tail == "Новый\n"
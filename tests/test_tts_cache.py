@@ -0,0 +1,30 @@
+import numpy as np
+
+from core.tts_cache import TTSAudioCache
+
+AUDIO = np.zeros(4000, dtype=np.float32)
+
+
+def _files(path):
+    return sorted(path.glob("*.npy"))
+
+
+def test_only_repeated_or_prewarmed_phrases_reach_disk(tmp_path):
+    cache = TTSAudioCache(disk_dir=tmp_path)
+    cache.put("v", 24000, "разовая фраза ответа", AUDIO)
+    assert _files(tmp_path) == []
+    assert cache.get("v", 24000, "Разовая  фраза ответа") is not None
+    assert len(_files(tmp_path)) == 1
+    cache.put("v", 24000, "Готово.", AUDIO, persist=True)
+    assert len(_files(tmp_path)) == 2
+
+
+def test_disk_store_is_capped_lru(tmp_path):
+    cache = TTSAudioCache(disk_dir=tmp_path, max_disk_bytes=3 * 8200)
+    for i in range(5):
+        cache.put("v", 24000, f"фраза {i}", AUDIO, persist=True)
+    assert len(_files(tmp_path)) == 3
+    assert cache.stats()["disk_bytes"] <= 3 * 8200
+    # свежая копия кэша берёт файлы с диска и держит тот же лимит
+    assert TTSAudioCache(disk_dir=tmp_path, max_disk_bytes=8200).stats()["disk_files"] == 1
+    assert len(_files(tmp_path)) == 1
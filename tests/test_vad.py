@@ -0,0 +1,44 @@
+import numpy as np
+
+from core.vad import FrameVAD, endpoint_latency
+
+SR = 16000
+BLOCK = 512  # колбэк микрофона, 32 мс
+
+
+def _voice(t: np.ndarray, f0: float = 180) -> np.ndarray:
+    # гармоники с огибающей «слогов» — спектр речевой, не плоский
+    harmonics = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 15))
+    return (0.1 * harmonics * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)).astype(np.float32)
+
+
+def _events(vad: FrameVAD, audio: np.ndarray):
+    out = []
+    for pos in range(0, len(audio), BLOCK):
+        out += vad.process(audio[pos:pos + BLOCK])
+    return [(e.kind, round(e.stream_sec, 2)) for e in out]
+
+
+def _phrase(seconds: float = 3.0, start: float = 0.5, end: float = 1.5) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    noise = np.random.default_rng(0).normal(0, 3e-3, len(t)).astype(np.float32)
+    return noise + _voice(t) * ((t >= start) & (t < end))
+
+
+def test_speech_start_and_end_are_on_stream_time():
+    vad = FrameVAD(SR)
+    assert _events(vad, _phrase()) == [("speech_start", 0.5), ("speech_end", 1.5)]
+    assert not vad.in_speech
+    assert len(vad.end_latencies) == 1
+
+
+def test_end_is_reported_after_the_hangover():
+    latency = endpoint_latency(_phrase(), SR, 1.5, end_silence_sec=0.6)
+    assert latency is not None and 0.6 <= latency < 0.7
+    assert endpoint_latency(_phrase(), SR, 1.5, end_silence_sec=0.3) < latency
+
+
+def test_loud_flat_noise_is_not_speech():
+    noise = np.random.default_rng(1).normal(0, 0.1, 3 * SR).astype(np.float32)
+    noise[:SR // 2] *= 0.03  # шум резко стал громче — пол ещё не догнал
+    assert _events(FrameVAD(SR), noise) == []
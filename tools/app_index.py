@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import bisect
+import difflib
+import json
+import logging
+import os
+import plistlib
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_APP_ROOTS = (
+    "/Applications",
+    "/Applications/Utilities",
+    "/System/Applications",
+    "/System/Applications/Utilities",
+    "~/Applications",
+)
+
+# то, как приложения чаще всего называют голосом, когда локализованного имени нет
+BUILTIN_ALIASES = {
+    "телега": "Telegram",
+    "хром": "Google Chrome",
+    "гугл хром": "Google Chrome",
+    "настройки": "System Settings",
+    "системные настройки": "System Settings",
+    "вотсап": "WhatsApp",
+    "ватсап": "WhatsApp",
+    "вскод": "Visual Studio Code",
+    "vscode": "Visual Studio Code",
+    "зум": "zoom.us",
+    "олама": "Ollama",
+    "эпл мьюзик": "Music",
+}
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s",
+    "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "",
+    "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+_NON_WORD_RE = re.compile(r"[^\w ]+")
+_STRINGS_RE = re.compile(r'"?(CFBundleDisplayName|CFBundleName)"?\s*=\s*"((?:[^"\\]|\\.)*)"')
+
+
+def normalize_name(name: str) -> str:
+    s = name.lower().replace("ё", "е").strip()
+    if s.endswith(".app"):
+        s = s[:-4]
+    s = _NON_WORD_RE.sub(" ", s).replace("_", " ")
+    return " ".join(s.split())
+
+
+def _translit(s: str) -> str:
+    return "".join(_TRANSLIT.get(ch, ch) for ch in s)
+
+
+def _variants(name: str) -> set[str]:
+    base = normalize_name(name)
+    if not base:
+        return set()
+    out = {base, base.replace(" ", "")}
+    lat = _translit(base)
+    out.update({lat, lat.replace(" ", "")})
+    return out
+
+
+def _trigrams(s: str) -> set[str]:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+@dataclass(frozen=True)
+class AppEntry:
+    name: str
+    path: str
+    bundle_id: str = ""
+    names: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class AppMatch:
+    entry: AppEntry
+    score: float
+    kind: str  # exact | prefix | fuzzy
+
+
+class AppSource(ABC):
+    """Источник установленных приложений; signature() — дешёвый отпечаток для проверки изменений."""
+
+    @abstractmethod
+    def scan(self) -> list[AppEntry]:
+        ...
+
+    def signature(self) -> Hashable:
+        return None
+
+
+def _read_plist(path: Path) -> dict:
+    try:
+        with open(path, "rb") as f:
+            data = plistlib.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _localized_names(resources: Path, languages: Iterable[str]) -> list[str]:
+    names: list[str] = []
+
+    loctable = resources / "InfoPlist.loctable"
+    if loctable.exists():
+        table = _read_plist(loctable)
+        for lang in languages:
+            entry = table.get(lang) or {}
+            names.extend(str(entry[k]) for k in ("CFBundleDisplayName", "CFBundleName") if entry.get(k))
+
+    for lang in languages:
+        strings = resources / f"{lang}.lproj" / "InfoPlist.strings"
+        if not strings.exists():
+            continue
+        parsed = _read_plist(strings)
+        if parsed:
+            names.extend(str(parsed[k]) for k in ("CFBundleDisplayName", "CFBundleName") if parsed.get(k))
+            continue
+        try:
+            raw = strings.read_bytes()
+            text = raw.decode("utf-16") if raw[:2] in (b"\xff\xfe", b"\xfe\xff") else raw.decode("utf-8", "ignore")
+        except Exception:
+            continue
+        names.extend(m.group(2) for m in _STRINGS_RE.finditer(text))
+    return names
+
+
+class DirectoryAppSource(AppSource):
+    """Сканирует *.app в каталогах приложений: Info.plist + локализованные имена (ru/en)."""
+
+    def __init__(self, roots: Iterable[str] = DEFAULT_APP_ROOTS, languages: Iterable[str] = ("ru", "en")):
+        self.roots = [Path(os.path.expanduser(r)) for r in roots]
+        self.languages = tuple(languages)
+
+    def signature(self) -> Hashable:
+        sig = []
+        for root in self.roots:
+            try:
+                sig.append((str(root), root.stat().st_mtime_ns))
+            except OSError:
+                sig.append((str(root), None))
+        return tuple(sig)
+
+    def scan(self) -> list[AppEntry]:
+        entries: list[AppEntry] = []
+        seen: set[str] = set()
+        for root in self.roots:
+            try:
+                children = list(root.iterdir())
+            except OSError:
+                continue
+            for app in children:
+                if app.suffix != ".app" or str(app) in seen:
+                    continue
+                seen.add(str(app))
+                entries.append(self._entry(app))
+        return entries
+
+    def _entry(self, app: Path) -> AppEntry:
+        info = _read_plist(app / "Contents" / "Info.plist")
+        names = [app.stem]
+        names.extend(str(info[k]) for k in ("CFBundleDisplayName", "CFBundleName") if info.get(k))
+        names.extend(_localized_names(app / "Contents" / "Resources", self.languages))
+        uniq = tuple(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+        return AppEntry(name=app.stem, path=str(app), bundle_id=str(info.get("CFBundleIdentifier", "")), names=uniq)
+
+
+class StaticAppSource(AppSource):
+    """Готовый список приложений — для прогонов без файловой системы macOS."""
+
+    def __init__(self, entries: Iterable[AppEntry]):
+        self.entries = list(entries)
+        self.version = 0
+
+    def scan(self) -> list[AppEntry]:
+        return list(self.entries)
+
+    def signature(self) -> Hashable:
+        return self.version
+
+
+class AppIndex:
+    """
+    Индекс установленных приложений: точное совпадение по нормализованному имени (в т.ч. транслит),
+    затем префикс (если он указывает на одно приложение или покрывает не меньше min_prefix_score
+    имени), затем нечёткий поиск по триграммам. Перестраивается, если поменялся signature()
+    источника (проверка не чаще раза в check_interval секунд). Пока идёт сборка (например, прогрев
+    при старте), resolve() ждёт её на _build_lock, а не ищет по пустому индексу.
+    """
+
+    def __init__(
+            self,
+            source: AppSource,
+            aliases: Optional[dict[str, str]] = None,
+            check_interval: float = 5.0,
+            min_score: float = 0.72,
+            min_prefix_score: float = 0.5,
+    ):
+        self.source = source
+        self.aliases = {normalize_name(k): v for k, v in {**BUILTIN_ALIASES, **(aliases or {})}.items()}
+        self.check_interval = check_interval
+        self.min_score = min_score
+        self.min_prefix_score = min_prefix_score
+
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._signature: Hashable = object()
+        self._checked_at = float("-inf")
+        self._entries: list[AppEntry] = []
+        self._exact: dict[str, AppEntry] = {}
+        self._keys: list[str] = []
+        self._grams: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> list[AppEntry]:
+        self.refresh()
+        return list(self._entries)
+
+    def refresh(self, force: bool = False) -> bool:
+        if not force and time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        with self._build_lock:
+            # пока ждали замок, индекс мог собрать другой поток
+            if not force and time.monotonic() - self._checked_at < self.check_interval:
+                return False
+            sig = self.source.signature()
+            if not force and sig == self._signature and sig is not None:
+                self._checked_at = time.monotonic()
+                return False
+            self._build(sig)
+            # отметка — только после удачной сборки: иначе resolve() счёл бы пустой индекс свежим
+            self._checked_at = time.monotonic()
+            return True
+
+    def _build(self, sig: Hashable) -> None:
+        t0 = time.perf_counter()
+        entries = self.source.scan()
+        exact: dict[str, AppEntry] = {}
+        grams: dict[str, set[str]] = {}
+        for entry in entries:
+            for name in entry.names or (entry.name,):
+                for v in _variants(name):
+                    exact.setdefault(v, entry)
+        for alias, target in self.aliases.items():
+            entry = exact.get(normalize_name(target))
+            if entry is not None:
+                for v in _variants(alias):
+                    exact.setdefault(v, entry)
+        for key in exact:
+            for g in _trigrams(key):
+                grams.setdefault(g, set()).add(key)
+
+        with self._lock:
+            self._signature = sig
+            self._entries = entries
+            self._exact = exact
+            self._keys = sorted(exact)
+            self._grams = grams
+        logger.info("App index built: %d apps, %d keys in %.1f ms",
+                    len(entries), len(exact), (time.perf_counter() - t0) * 1000)
+
+    def resolve(self, query: str) -> Optional[AppMatch]:
+        self.refresh()
+        q = normalize_name(query)
+        if not q:
+            return None
+
+        with self._lock:
+            exact, keys, grams = self._exact, self._keys, self._grams
+
+        for v in (q, q.replace(" ", ""), _translit(q), _translit(q).replace(" ", "")):
+            if v in exact:
+                return AppMatch(exact[v], 1.0, "exact")
+
+        for v in (q, _translit(q)):
+            if len(v) < 3:
+                continue
+            i = bisect.bisect_left(keys, v)
+            j = bisect.bisect_left(keys, v + "\uffff", i)
+            if i == j:
+                continue
+            key = min(keys[i:j], key=len)
+            score = len(v) / len(key)
+            # «pro» при десятке приложений на pro — не повод открыть первое попавшееся
+            if len({exact[k].path for k in keys[i:j]}) == 1 or score >= self.min_prefix_score:
+                return AppMatch(exact[key], score, "prefix")
+
+        best: tuple[float, str] | None = None
+        for v in {q, _translit(q)}:
+            counts: dict[str, int] = {}
+            for g in _trigrams(v):
+                for key in grams.get(g, ()):
+                    counts[key] = counts.get(key, 0) + 1
+            candidates = sorted(counts, key=counts.get, reverse=True)[:20]
+            for key in candidates:
+                score = difflib.SequenceMatcher(None, v, key).ratio()
+                if best is None or score > best[0]:
+                    best = (score, key)
+
+        if best and best[0] >= self.min_score:
+            return AppMatch(exact[best[1]], best[0], "fuzzy")
+        return None
+
+
+def load_aliases(path: str | Path) -> dict[str, str]:
+    """Пользовательские алиасы: JSON {"как говорю": "Имя приложения"}."""
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+        return {str(k): str(v) for k, v in data.items()}
+    except Exception as e:
+        logger.warning("Failed to read app aliases %s: %s", p, e)
+        return {}
+
+
+def _bench(n_apps: int = 400, n_queries: int = 2000) -> None:
+    import random
+    import tempfile
+
+    words = ["photo", "music", "code", "studio", "note", "mail", "chat", "player", "pro", "lite", "cloud", "sync"]
+    with tempfile.TemporaryDirectory() as tmp:
+        names = []
+        for i in range(n_apps):
+            name = f"{random.choice(words).title()} {random.choice(words).title()} {i}"
+            contents = Path(tmp) / f"{name}.app" / "Contents"
+            contents.mkdir(parents=True)
+            with open(contents / "Info.plist", "wb") as f:
+                plistlib.dump({"CFBundleName": name, "CFBundleIdentifier": f"com.example.app{i}"}, f)
+            names.append(name)
+
+        index = AppIndex(DirectoryAppSource([tmp]))
+        t0 = time.perf_counter()
+        index.refresh(force=True)
+        build = time.perf_counter() - t0
+
+        queries = []
+        for _ in range(n_queries):
+            n = random.choice(names).lower()
+            pos = random.randrange(len(n))
+            queries.append(n[:pos] + n[pos + 1:] if random.random() < 0.5 else n)
+
+        t0 = time.perf_counter()
+        found = sum(1 for q in queries if index.resolve(q))
+        per_query = (time.perf_counter() - t0) / n_queries
+
+    print(f"apps={n_apps} build={build * 1000:.1f}ms resolve={per_query * 1e6:.0f}us "
+          f"resolved={found}/{n_queries}")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+ChangeCallback = Callable[[Optional[tuple[float, float]]], None]
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarEvent:
+    uid: str
+    title: str
+    calendar: str
+    start_epoch: int
+    end_epoch: int
+    all_day: bool = False
+    location: str = ""
+
+    @property
+    def key(self) -> tuple[str, int]:
+        # у повторяющихся событий общий uid, поэтому различаем их по началу
+        return self.uid, self.start_epoch
+
+    def to_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "calendar": self.calendar,
+            "start_epoch": self.start_epoch,
+            "end_epoch": self.end_epoch,
+            "all_day": self.all_day,
+            "location": self.location,
+        }
+
+
+class EventSource(ABC):
+    """
+    Источник событий календаря.
+    fetch() возвращает все события, пересекающиеся с [start, end) (epoch-секунды).
+    subscribe() регистрирует колбэк на изменения: диапазон (start, end) или None = «изменилось что-то».
+    """
+
+    @abstractmethod
+    def fetch(self, start_epoch: float, end_epoch: float) -> list[CalendarEvent]:
+        ...
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        return None
+
+
+class EventKitEventSource(EventSource):
+    """Один долгоживущий EKEventStore + подписка на EKEventStoreChangedNotification."""
+
+    def __init__(self):
+        import EventKit
+        import Foundation
+
+        self._ek = EventKit
+        self._foundation = Foundation
+        self.store = EventKit.EKEventStore.alloc().init()
+        self._observers: list = []
+
+    def fetch(self, start_epoch: float, end_epoch: float) -> list[CalendarEvent]:
+        ns = self._foundation.NSDate
+        calendars = list(self.store.calendarsForEntityType_(self._ek.EKEntityTypeEvent))
+        predicate = self.store.predicateForEventsWithStartDate_endDate_calendars_(
+            ns.dateWithTimeIntervalSince1970_(start_epoch),
+            ns.dateWithTimeIntervalSince1970_(end_epoch),
+            calendars,
+        )
+        out = []
+        for e in self.store.eventsMatchingPredicate_(predicate):
+            out.append(CalendarEvent(
+                uid=str(e.eventIdentifier() or ""),
+                title=str(e.title() or ""),
+                calendar=str(e.calendar().title() if e.calendar() else ""),
+                start_epoch=int(e.startDate().timeIntervalSince1970()),
+                end_epoch=int(e.endDate().timeIntervalSince1970()),
+                all_day=bool(e.isAllDay()),
+                location=str(e.location() or ""),
+            ))
+        return out
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        def _on_change(_notification):
+            # EventKit не сообщает, какие даты затронуты — помечаем всё грязным
+            callback(None)
+
+        observer = self._foundation.NSNotificationCenter.defaultCenter().addObserverForName_object_queue_usingBlock_(
+            self._ek.EKEventStoreChangedNotification, self.store, None, _on_change
+        )
+        self._observers.append(observer)
+
+
+class StaticEventSource(EventSource):
+    """In-memory источник: для прогонов индекса и бенчмарков без EventKit."""
+
+    def __init__(self, events: Iterable[CalendarEvent] = (), fetch_delay: float = 0.0):
+        self.events = list(events)
+        self.fetch_delay = fetch_delay
+        self.fetch_calls = 0
+        self._callbacks: list[ChangeCallback] = []
+
+    def fetch(self, start_epoch: float, end_epoch: float) -> list[CalendarEvent]:
+        self.fetch_calls += 1
+        if self.fetch_delay:
+            time.sleep(self.fetch_delay)
+        return [e for e in self.events if e.start_epoch < end_epoch and e.end_epoch > start_epoch]
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        self._callbacks.append(callback)
+
+    def notify(self, changed: Optional[tuple[float, float]] = None) -> None:
+        for cb in list(self._callbacks):
+            cb(changed)
+
+
+def _day_of(ts: float) -> int:
+    return datetime.date.fromtimestamp(ts).toordinal()
+
+
+def _day_bounds(day: int) -> tuple[float, float]:
+    start = datetime.datetime.combine(datetime.date.fromordinal(day), datetime.time.min)
+    end = start + datetime.timedelta(days=1)
+    return start.timestamp(), end.timestamp()
+
+
+class CalendarService:
+    """
+    Держит индекс событий по дням для скользящего окна [сегодня - days_back, сегодня + days_ahead].
+    Запросы внутри окна отвечаются из памяти; незагруженные дни догружаются одним fetch на
+    непрерывный отрезок. Уведомления об изменениях только инвалидируют дни — перечитываются они
+    лениво, при следующем запросе.
+    """
+
+    def __init__(self, source: EventSource, days_back: int = 7, days_ahead: int = 60):
+        self.source = source
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+
+        self._days: dict[int, list[CalendarEvent]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+        source.subscribe(self.invalidate)
+
+    def _window(self) -> tuple[int, int]:
+        today = datetime.date.today().toordinal()
+        return today - self.days_back, today + self.days_ahead
+
+    def _evict_outside(self, lo: int, hi: int) -> None:
+        for day in [d for d in self._days if d < lo or d > hi]:
+            del self._days[day]
+
+    def invalidate(self, changed: Optional[tuple[float, float]] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if changed is None:
+                self._days.clear()
+                return
+            first, last = _day_of(changed[0]), _day_of(max(changed[0], changed[1] - 1))
+            for day in range(first, last + 1):
+                self._days.pop(day, None)
+
+    def warm(self) -> None:
+        """Загружает всё окно одним запросом к источнику."""
+        lo, hi = self._window()
+        self._load_days(list(range(lo, hi + 1)))
+
+    def _load_days(self, days: list[int]) -> None:
+        if not days:
+            return
+        with self._lock:
+            generation = self._generation
+
+        runs: list[tuple[int, int]] = []
+        for day in sorted(days):
+            if runs and runs[-1][1] == day - 1:
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+
+        loaded: dict[int, list[CalendarEvent]] = {}
+        for first, last in runs:
+            start_ts = _day_bounds(first)[0]
+            end_ts = _day_bounds(last)[1]
+            buckets: dict[int, list[CalendarEvent]] = {d: [] for d in range(first, last + 1)}
+            for ev in self.source.fetch(start_ts, end_ts):
+                ev_first = max(first, _day_of(ev.start_epoch))
+                ev_last = min(last, _day_of(max(ev.start_epoch, ev.end_epoch - 1)))
+                for d in range(ev_first, ev_last + 1):
+                    buckets[d].append(ev)
+            for bucket in buckets.values():
+                bucket.sort(key=lambda e: e.start_epoch)
+            loaded.update(buckets)
+
+        with self._lock:
+            # за время fetch пришло уведомление — данные могли устареть, не кэшируем
+            if generation != self._generation:
+                return
+            lo, hi = self._window()
+            self._evict_outside(lo, hi)
+            for day, bucket in loaded.items():
+                if lo <= day <= hi:
+                    self._days[day] = bucket
+
+    def query(
+            self,
+            start_epoch: float,
+            end_epoch: float,
+            calendars: Optional[Iterable[str]] = None,
+    ) -> list[CalendarEvent]:
+        allow = set(calendars) if calendars is not None else None
+        lo, hi = self._window()
+        first, last = _day_of(start_epoch), _day_of(max(start_epoch, end_epoch - 1))
+
+        if first < lo or last > hi:
+            # вне окна — напрямую в источник, без кэширования
+            self.misses += 1
+            events = self.source.fetch(start_epoch, end_epoch)
+        else:
+            with self._lock:
+                missing = [d for d in range(first, last + 1) if d not in self._days]
+            if missing:
+                self.misses += 1
+                self._load_days(missing)
+            else:
+                self.hits += 1
+
+            with self._lock:
+                buckets = [self._days.get(d) for d in range(first, last + 1)]
+            if any(b is None for b in buckets):
+                # индекс инвалидирован во время загрузки — отвечаем напрямую
+                events = self.source.fetch(start_epoch, end_epoch)
+            else:
+                seen: set[tuple[str, int]] = set()
+                events = []
+                for bucket in buckets:
+                    for ev in bucket:
+                        if ev.key in seen:
+                            continue
+                        seen.add(ev.key)
+                        events.append(ev)
+
+        out = [
+            e for e in events
+            if e.start_epoch < end_epoch and e.end_epoch > start_epoch
+            and (allow is None or e.calendar in allow)
+        ]
+        out.sort(key=lambda e: e.start_epoch)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            days = len(self._days)
+        return {"hits": self.hits, "misses": self.misses, "indexed_days": days}
+
+
+def _bench(n_events: int = 5000, n_queries: int = 2000) -> None:
+    import random
+
+    now = time.time()
+    events = []
+    for i in range(n_events):
+        start = int(now + random.uniform(-7, 60) * 86400)
+        events.append(CalendarEvent(
+            uid=f"ev{i}", title=f"Событие {i}", calendar=random.choice(["Работа", "Учеба", "Дом"]),
+            start_epoch=start, end_epoch=start + random.choice([1800, 3600, 7200]),
+        ))
+    source = StaticEventSource(events)
+
+    t0 = time.perf_counter()
+    for _ in range(n_queries // 10):
+        day = now + random.uniform(-7, 50) * 86400
+        source.fetch(day, day + 7 * 86400)
+    direct = (time.perf_counter() - t0) / (n_queries // 10)
+
+    service = CalendarService(source)
+    t0 = time.perf_counter()
+    service.warm()
+    warm = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n_queries):
+        day = now + random.uniform(-7, 50) * 86400
+        service.query(day, day + 7 * 86400)
+    indexed = (time.perf_counter() - t0) / n_queries
+
+    print(f"events={n_events} warm={warm * 1000:.1f}ms "
+          f"week query: direct={direct * 1e6:.0f}us indexed={indexed * 1e6:.0f}us "
+          f"source fetches={source.fetch_calls} stats={service.stats()}")
+
+
+if __name__ == "__main__":
+    _bench()
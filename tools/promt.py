@@ -99,7 +99,7 @@ SYSTEM_PROMPT_SUPPORT = """
 
 ДОСТУПНЫЕ action (строго):
 open_app, play_media, pause_media, next_media, previous_media,
-set_volume, change_volume, mute, un_mute,
+get_volume, set_volume, change_volume, mute, un_mute,
 get_weather, get_local_weather, get_degrees,
 get_date, get_time, add_remind, set_timer, stopwatch,
 get_mac_state, list_running_apps, mac_power,
@@ -137,6 +137,7 @@ TODAY_DOW: "<пн|вт|ср|чт|пт|сб|вс>"
 ────────────────────────
 open_app: {"name":"<string>"}
 
+get_volume: {}
 set_volume: {"level":<int 0..100>}
 change_volume: {"delta":<int>}
 mute: {}
@@ -159,6 +160,7 @@ stopwatch: {"cmd":"start"|"stop"|"reset"}
 ────────────────────────
 ЗВУК/ГРОМКОСТЬ
 ────────────────────────
+- "какая громкость/сколько громкость" → get_volume {}
 - "громкость/звук на X" → set_volume {"level":X} (обрезать 0..100)
 - "громче" → change_volume {"delta":10}
 - "тише" → change_volume {"delta":-10}
@@ -2,14 +2,23 @@ import datetime
 import json
 import re
 import subprocess
+import threading
 from typing import Any, Literal, Union, Optional, Iterable
 
-import EventKit
-import Foundation
 import requests
 
+from core.executor import time_left
+from tools.app_index import AppIndex, DirectoryAppSource, load_aliases
+from tools.calendar_index import CalendarService, EventKitEventSource
 from tools.utilits import _resolve_weather_days, _do_shell, _safe_float, _safe_int, Section, _osascript, \
-    _nsdate_from_dt, parse_dt, _normalize_allowlist
+    parse_dt, _normalize_allowlist, PROC_TIMEOUT, HTTP_TIMEOUT, SHORTCUT_TIMEOUT, POWER_TIMEOUT
+
+_calendar: CalendarService | None = None
+_calendar_lock = threading.Lock()
+
+_apps: AppIndex | None = None
+_apps_lock = threading.Lock()
+APP_ALIASES_PATH = "app_aliases.json"
 
 
 def _cpu_state() -> dict[str, Any]:
@@ -124,7 +133,7 @@ def _wifi_state() -> dict[str, Any]:
 
 
 def _gpu_state() -> dict[str, Any]:
-    sp = _do_shell("system_profiler SPDisplaysDataType 2>/dev/null")
+    sp = _do_shell("system_profiler SPDisplaysDataType 2>/dev/null", timeout=20)
     chipset_models = re.findall(r"Chipset Model:\s*(.+)", sp)
     vram = re.findall(r"VRAM.*?:\s*(.+)", sp)
     return {
@@ -137,7 +146,7 @@ def _gpu_state() -> dict[str, Any]:
 
 
 def _hardware_state() -> dict[str, Any]:
-    sp = _do_shell("system_profiler SPHardwareDataType 2>/dev/null")
+    sp = _do_shell("system_profiler SPHardwareDataType 2>/dev/null", timeout=20)
 
     def find(label: str) -> str | None:
         m = re.search(rf"^{re.escape(label)}:\s*(.+)$", sp, re.MULTILINE)
@@ -183,6 +192,19 @@ def get_mac_state(section: Section = "all") -> dict[str, Any]:
     raise ValueError(f"Unknown section: {section}")
 
 
+def _app_index() -> AppIndex:
+    global _apps
+    with _apps_lock:
+        if _apps is None:
+            _apps = AppIndex(DirectoryAppSource(), aliases=load_aliases(APP_ALIASES_PATH))
+        return _apps
+
+
+def warm_app_index() -> None:
+    """Строит индекс приложений заранее (вызывается в фоне при старте)."""
+    _app_index().refresh(force=True)
+
+
 def list_running_apps(app_name: str | None = None) -> dict[str, Any]:
     script = r'''
 tell application "System Events"
@@ -196,13 +218,18 @@ return appList as string
     if app_name is None:
         return {"apps": apps}
 
-    q = app_name.strip().lower()
-    exact = any(a.lower() == q for a in apps)
-    contains = any(q in a.lower() for a in apps)
+    match = _app_index().resolve(app_name)
+    queries = [app_name.strip().lower()]
+    if match:
+        queries = [n.lower() for n in (match.entry.name, *match.entry.names)] + queries
+
+    exact = any(a.lower() == q for a in apps for q in queries)
+    contains = any(q in a.lower() for a in apps for q in queries)
     running = exact or contains
 
     return {
         "query": app_name,
+        "resolved": match.entry.name if match else None,
         "running": running,
         "match_type": "exact" if exact else ("contains" if contains else None),
         "apps": apps,
@@ -217,7 +244,7 @@ def mac_power(action: Literal["shutdown", "restart", "sleep", "hibernate"]) -> N
 
     if action == "hibernate":
         cmd = "sudo pmset -a hibernatemode 25 && sudo pmset sleepnow"
-        subprocess.run(cmd, shell=True, check=True, text=True)
+        subprocess.run(cmd, shell=True, check=True, text=True, timeout=time_left(POWER_TIMEOUT))
         return
 
     raise ValueError(f"Unknown power action: {action}")
@@ -225,50 +252,59 @@ def mac_power(action: Literal["shutdown", "restart", "sleep", "hibernate"]) -> N
 
 def open_app(name: str):
     name = name.strip()
+    index = _app_index()
+    match = index.resolve(name)
+    if match is None and len(index):
+        # индекс есть, а такого приложения нет — не гоняем open впустую
+        return f"Не нашла приложение {name}."
+
+    target = ["-a", match.entry.path] if match else ["-a", name]
     try:
-        subprocess.run(["open", "-a", name], check=True)
-        return name
-    except subprocess.CalledProcessError:
+        subprocess.run(["open", *target], check=True, timeout=time_left(PROC_TIMEOUT))
+        return match.entry.name if match else name
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return f"Не удалось открыть {name}."
 
 
 def set_volume(level: int):
     level = max(0, min(100, level))
-    subprocess.run(["osascript", "-e", f"set volume output volume {level}"])
+    subprocess.run(["osascript", "-e", f"set volume output volume {level}"], timeout=time_left(PROC_TIMEOUT))
     return level
 
 
 def mute_system(status: bool):
     try:
-        subprocess.run(["osascript", "-e", f"set volume output muted {str(status).lower()}"], check=True)
+        subprocess.run(["osascript", "-e", f"set volume output muted {str(status).lower()}"], check=True,
+                       timeout=time_left(PROC_TIMEOUT))
         return None  # info в args
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return None
 
 
 def play_media():
-    subprocess.run(["osascript", "-e", 'tell application "Music" to play'])
+    subprocess.run(["osascript", "-e", 'tell application "Music" to play'], timeout=time_left(PROC_TIMEOUT))
     return None
 
 
 def pause_media():
-    subprocess.run(["osascript", "-e", 'tell application "Music" to pause'])
+    subprocess.run(["osascript", "-e", 'tell application "Music" to pause'], timeout=time_left(PROC_TIMEOUT))
     return None
 
 
 def next_media():
-    subprocess.run(["osascript", "-e", 'tell application "Music" to next track'])
+    subprocess.run(["osascript", "-e", 'tell application "Music" to next track'], timeout=time_left(PROC_TIMEOUT))
     return None
 
 
 def previous_media():
-    subprocess.run(["osascript", "-e", 'tell application "Music" to previous track'])
+    subprocess.run(["osascript", "-e", 'tell application "Music" to previous track'], timeout=time_left(PROC_TIMEOUT))
     return None
 
 
 def get_volume():
     out = subprocess.check_output(
-        ["osascript", "-e", "output volume of (get volume settings)"]
+        ["osascript", "-e", "output volume of (get volume settings)"],
+        timeout=time_left(PROC_TIMEOUT),
     )
     return int(out.strip())
 
@@ -288,7 +324,8 @@ def get_local_weather(when: str | int | None = None):
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
-        encoding="utf-8"
+        encoding="utf-8",
+        timeout=time_left(PROC_TIMEOUT),
     )
 
     if p.returncode != 0:
@@ -313,7 +350,7 @@ def get_weather(city: str, when: str | int | None = None, location: bool = True)
             "name": city,
             "count": 1,
             "language": "ru"
-        }).json()
+        }, timeout=time_left(HTTP_TIMEOUT)).json()
 
         if "results" not in geo:
             return None
@@ -330,7 +367,7 @@ def get_weather(city: str, when: str | int | None = None, location: bool = True)
             "latitude": lat,
             "longitude": lon,
             "current_weather": True
-        }).json().get("current_weather")
+        }, timeout=time_left(HTTP_TIMEOUT)).json().get("current_weather")
         return weather
 
     days = max(1, min(days, 14))
@@ -340,7 +377,7 @@ def get_weather(city: str, when: str | int | None = None, location: bool = True)
         "daily": ["temperature_2m_max", "temperature_2m_min", "weathercode"],
         "timezone": "auto",
     }
-    forecast_resp = requests.get("https://api.open-meteo.com/v1/forecast", params=params).json()
+    forecast_resp = requests.get("https://api.open-meteo.com/v1/forecast", params=params, timeout=time_left(HTTP_TIMEOUT)).json()
     daily = forecast_resp.get("daily")
     if not daily:
         return None
@@ -361,15 +398,35 @@ def get_degrees(city: str):
     return (get_weather(city))["temperature"]
 
 
-def add_remind(title, notes=None, due_date=None):
-    script = f'''
-    tell application "Reminders"
+def _reminder_lines(title, notes=None, due_date=None) -> str:
+    return f'''
         set newReminder to make new reminder with properties {{name:"{title}"}}
         {f'set body of newReminder to "{notes}"' if notes else ''}
         {f'set due date of newReminder to date "{due_date}"' if due_date else ''}
+    '''
+
+
+def add_remind(title, notes=None, due_date=None):
+    script = f'''
+    tell application "Reminders"
+        {_reminder_lines(title, notes, due_date)}
     end tell
     '''
-    subprocess.run(["osascript", "-e", script])
+    subprocess.run(["osascript", "-e", script], timeout=time_left(PROC_TIMEOUT))
+    return None
+
+
+def add_reminds(items: list[dict]):
+    """Несколько напоминаний одним запуском osascript."""
+    body = "".join(
+        _reminder_lines(it.get("title"), it.get("notes"), it.get("due_date")) for it in items
+    )
+    script = f'''
+    tell application "Reminders"
+        {body}
+    end tell
+    '''
+    subprocess.run(["osascript", "-e", script], timeout=time_left(PROC_TIMEOUT))
     return None
 
 
@@ -378,7 +435,8 @@ def set_timer(second: int):
         ["shortcuts", "run", "Python Timer"],
         input=str(second),
         text=True,
-        check=True
+        check=True,
+        timeout=time_left(SHORTCUT_TIMEOUT),
     )
 
 
@@ -387,7 +445,8 @@ def stopwatch(cmd: str):
         ["shortcuts", "run", "Python Stopwatch"],
         input=cmd.strip(),
         text=True,
-        check=True
+        check=True,
+        timeout=time_left(SHORTCUT_TIMEOUT),
     )
 
 
@@ -406,7 +465,16 @@ def send_message(platform: str, to: str, text: str):
         keystroke return
     end tell
     """
-    s = subprocess.run(["osascript", "-e", script])
+    s = subprocess.run(["osascript", "-e", script], timeout=time_left(PROC_TIMEOUT))
+
+
+def _calendar_service() -> CalendarService:
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = CalendarService(EventKitEventSource())
+            threading.Thread(target=_calendar.warm, daemon=True).start()
+        return _calendar
 
 
 def get_events(
@@ -414,37 +482,12 @@ def get_events(
     end: Union[str, datetime.date, datetime.datetime],
     calendars_allowlist: Optional[Union[str, Iterable[str]]] = None,
 ):
-    store = EventKit.EKEventStore.alloc().init()
-
     start_dt = parse_dt(start, start=True)
     end_dt = parse_dt(end, start=False)
 
-    start_ns = _nsdate_from_dt(start_dt)
-    end_ns = _nsdate_from_dt(end_dt)
-
-    calendars = list(store.calendarsForEntityType_(EventKit.EKEntityTypeEvent))
-
-    allow = _normalize_allowlist(calendars_allowlist)
-    if allow is not None:
-        allow_set = set(allow)
-        calendars = [c for c in calendars if str(c.title()) in allow_set]
-
-    predicate = store.predicateForEventsWithStartDate_endDate_calendars_(
-        start_ns, end_ns, calendars
+    events = _calendar_service().query(
+        start_dt.timestamp(),
+        end_dt.timestamp(),
+        _normalize_allowlist(calendars_allowlist),
     )
-
-    events = list(store.eventsMatchingPredicate_(predicate))
-    events.sort(key=lambda e: e.startDate().timeIntervalSince1970())
-
-    events =  [
-        {
-            "title": str(e.title() or ""),
-            "calendar": str(e.calendar().title() if e.calendar() else ""),
-            "start_epoch": int(e.startDate().timeIntervalSince1970()),
-            "end_epoch": int(e.endDate().timeIntervalSince1970()),
-            "all_day": bool(e.isAllDay()),
-            "location": str(e.location() or ""),
-        }
-        for e in events
-    ]
-    return events
\ No newline at end of file
+    return [e.to_dict() for e in events]
@@ -7,6 +7,8 @@ from zoneinfo import ZoneInfo
 
 import Foundation
 
+from core.executor import time_left
+
 RU_DOW = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
 
 def _fmt_dt(ts: int, tz: ZoneInfo) -> datetime.datetime:
@@ -23,6 +25,9 @@ def normalize_execution_results(execution_results, tz_name="Europe/Moscow"):
         result = item.get("result")
 
         new_item = {"action": action, "args": args, "success": success, "result": result}
+        for flag in ("timed_out", "skipped", "coalesced_into"):
+            if item.get(flag):
+                new_item[flag] = item[flag]
 
         if action == "get_events" and isinstance(result, list):
             norm_events = []
@@ -92,18 +97,26 @@ def _resolve_weather_days(when: str | int | None) -> int:
 
 Section = Literal["all", "cpu", "memory", "disk", "battery", "wifi", "gpu", "hardware"]
 
+# чтобы зависший osascript/shell не держал ответ бесконечно; внутри действия таймаут
+# дополнительно обрезается его дедлайном (time_left)
+PROC_TIMEOUT = 10.0
+HTTP_TIMEOUT = 5.0
+# `shortcuts run` поднимает приложение Shortcuts, pmset под sudo — дольше обычного osascript
+SHORTCUT_TIMEOUT = 30.0
+POWER_TIMEOUT = 60.0
+
 
-def _run(cmd: list[str]) -> str:
-    return subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT).strip()
+def _run(cmd: list[str], timeout: float = PROC_TIMEOUT) -> str:
+    return subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT, timeout=time_left(timeout)).strip()
 
 
-def _osascript(script: str) -> str:
-    return _run(["osascript", "-e", script])
+def _osascript(script: str, timeout: float = PROC_TIMEOUT) -> str:
+    return _run(["osascript", "-e", script], timeout=timeout)
 
 
-def _do_shell(cmd: str) -> str:
+def _do_shell(cmd: str, timeout: float = PROC_TIMEOUT) -> str:
     cmd_escaped = cmd.replace("\\", "\\\\").replace('"', '\\"')
-    return _osascript(f'do shell script "{cmd_escaped}"')
+    return _osascript(f'do shell script "{cmd_escaped}"', timeout=timeout)
 
 
 def _safe_int(x: str) -> int | None: